@@ -0,0 +1,136 @@
+"""
+Finds every GET endpoint in drf_api/urls.py and times it through the
+test client, for the run_benchmarks command.
+"""
+import statistics
+import time
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver
+from django.urls.resolvers import RoutePattern
+from rest_framework.test import APIClient
+from drf_api.instrumentation import percentile
+
+# URL prefixes that aren't part of the API
+SKIPPED_PREFIXES = ('admin/',)
+
+
+def walk_patterns(patterns, prefix=''):
+    """
+    Yields (route, pattern, view class) for every URL pattern, following includes
+    """
+    for pattern in patterns:
+        route = prefix + str(pattern.pattern)
+        if isinstance(pattern, URLResolver):
+            if not route.startswith(SKIPPED_PREFIXES):
+                yield from walk_patterns(pattern.url_patterns, route)
+        elif isinstance(pattern, URLPattern):
+            view = getattr(pattern.callback, 'cls', None) or getattr(
+                pattern.callback, 'view_class', None)
+            yield route, pattern, view
+
+
+def discover_urls():
+    """
+    Returns [(route, path)] for every endpoint answering GET requests.
+    An <int:pk> in the route is filled with the first object of the view's
+    queryset. Routes with other arguments, or whose objects don't exist
+    yet, are left out with a reason in the second list returned.
+    """
+    urls, skipped = [], []
+    for route, pattern, view in walk_patterns(get_resolver().url_patterns):
+        if view is None or not hasattr(view, 'get'):
+            continue
+        if not isinstance(pattern.pattern, RoutePattern):
+            skipped.append((route, 'regular expression route'))
+            continue
+        kwargs = {}
+        for name in pattern.pattern.converters:
+            queryset = getattr(view, 'queryset', None)
+            if name != 'pk' or queryset is None:
+                skipped.append((route, f'no value for <{name}>'))
+                break
+            pk = queryset.model.objects.order_by('pk').values_list('pk', flat=True).first()
+            if pk is None:
+                skipped.append((route, f'no {queryset.model.__name__} objects'))
+                break
+            kwargs[name] = pk
+        else:
+            path = route
+            for name, value in kwargs.items():
+                path = path.replace(f'<int:{name}>', str(value))
+            urls.append((route, '/' + path))
+    return urls, skipped
+
+
+def default_user():
+    """
+    Returns the user following the most users, who has the fullest feed
+    """
+    return User.objects.annotate(
+        following_total=Count('following')).order_by('-following_total', 'id').first()
+
+
+def benchmark_url(client, path, requests):
+    """
+    Requests the path the given number of times after one warm up request,
+    returning the status code, latency percentiles in ms and query count.
+    """
+    client.get(path)
+    timings = []
+    queries = []
+    for _ in range(requests):
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            response = client.get(path)
+            timings.append((time.perf_counter() - start) * 1000)
+        queries.append(len(context.captured_queries))
+    timings.sort()
+    return {
+        'status': response.status_code,
+        'p50': round(statistics.median(timings), 2),
+        'p90': round(percentile(timings, 90), 2),
+        'p99': round(percentile(timings, 99), 2),
+        'queries': max(queries),
+    }
+
+
+def benchmark_urls(urls, requests, user=None):
+    """
+    Benchmarks each path logged out and, when a user is given,
+    logged in as that user. Returns {'<path> [anonymous|user]': result}.
+    """
+    results = {}
+    clients = [('anonymous', APIClient())]
+    if user is not None:
+        client = APIClient()
+        client.force_authenticate(user)
+        clients.append(('user', client))
+    for route, path in urls:
+        for role, client in clients:
+            results[f'{route} [{role}]'] = benchmark_url(client, path, requests)
+    return results
+
+
+def find_regressions(results, baseline, tolerance, min_slowdown):
+    """
+    Returns a list of messages for results that are worse than the baseline:
+    more queries, or a median that is more than tolerance (e.g. 0.5 for 50%)
+    and min_slowdown ms slower. The median is compared as it varies much
+    less between runs than the higher percentiles.
+    """
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if result['queries'] > before['queries']:
+            regressions.append(
+                f"{name}: {result['queries']} queries, was {before['queries']}")
+        slowdown = result['p50'] - before['p50']
+        if slowdown > min_slowdown and result['p50'] > before['p50'] * (1 + tolerance):
+            regressions.append(
+                f"{name}: p50 {result['p50']:.2f} ms, was {before['p50']:.2f} ms")
+    return regressions
@@ -0,0 +1,153 @@
+import asyncio
+import time
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment
+from rest_framework_simplejwt.tokens import RefreshToken
+from benchmarks.endpoints import default_user
+from benchmarks.seed import seed_dataset
+from benchmarks.utils import scratch_database
+from comments.models import Comment
+from drf_api.instrumentation import percentile
+from posts.models import Post
+from profiles.models import Profile
+
+
+def add_latency(seconds):
+    """
+    Makes every query of the process sleep for seconds first, as if the
+    database were across a network. Returns the function removing it.
+    """
+    def delay(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    def install(connection, **kwargs):
+        if delay not in connection.execute_wrappers:
+            connection.execute_wrappers.append(delay)
+
+    for connection in connections.all():
+        install(connection)
+    connection_created.connect(install, weak=False)
+
+    def remove():
+        connection_created.disconnect(install)
+        for connection in connections.all():
+            if delay in connection.execute_wrappers:
+                connection.execute_wrappers.remove(delay)
+    return remove
+
+
+async def request(application, path, cookie):
+    """
+    Makes a GET request to the ASGI application, as a server would,
+    returning the status code
+    """
+    path, _, query_string = path.partition('?')
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+        'root_path': '', 'query_string': query_string.encode(),
+        'headers': [(b'host', b'testserver'), (b'cookie', cookie.encode())],
+        'server': ('testserver', 80), 'client': ('127.0.0.1', 50000),
+    }
+    status = None
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+
+    await application(scope, receive, send)
+    return status
+
+
+async def load(application, path, cookie, concurrency, requests):
+    """
+    Makes requests to path from concurrency clients at once, each waiting
+    for its last response before the next request. Returns the statuses,
+    the latencies in ms and the total time in seconds.
+    """
+    statuses, latencies = [], []
+
+    async def client(count):
+        for _ in range(count):
+            start = time.perf_counter()
+            statuses.append(await request(application, path, cookie))
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        client(requests // concurrency + (index < requests % concurrency))
+        for index in range(concurrency)
+    ))
+    return statuses, sorted(latencies), time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    """
+    Compares the sync read views with their async versions under concurrent
+    load, sending requests straight to the project's ASGI application as
+    uvicorn would, with --concurrency requests in flight at once.
+    --db-latency makes each query wait, like a database on another server,
+    which is where the async views' concurrent queries help most.
+    Everything runs in a scratch database which is removed afterwards.
+    Run with: python manage.py bench_async_views --db-latency 2
+    """
+    help = 'Compares sync and async read views under concurrent ASGI requests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument(
+            '--db-latency', type=float, default=0.0,
+            help='Milliseconds added to every query',
+        )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        with override_settings(RESPONSE_CACHE_ENABLED=False), scratch_database():
+            seed_dataset(users=options['users'])
+            user = default_user()
+            # Signed in with a session in DEV and with the JWT cookie otherwise
+            client = Client()
+            client.force_login(user)
+            cookie = '; '.join([
+                f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}',
+                f'{settings.JWT_AUTH_COOKIE}={RefreshToken.for_user(user).access_token}',
+            ])
+            paths = [
+                '/posts/', f'/posts/{Post.objects.order_by("pk").first().pk}/',
+                '/profiles/', f'/profiles/{Profile.objects.order_by("pk").first().pk}/',
+                f'/comments/?post={Comment.objects.order_by("pk").first().post_id}',
+            ]
+            application = get_asgi_application()
+            remove_latency = add_latency(options['db_latency'] / 1000)
+            try:
+                self.stdout.write(
+                    f'{options["requests"]} requests, {options["concurrency"]} at once, '
+                    f'{options["db_latency"]}ms per query, '
+                    f'{settings.ASYNC_VIEW_THREADS} async view threads')
+                self.stdout.write(
+                    f"{'path':<28} {'view':<6} {'req/s':>8} {'p50 ms':>8} "
+                    f"{'p95 ms':>8} {'errors':>7}")
+                for path in paths:
+                    for name, prefix in [('sync', ''), ('async', '/async')]:
+                        statuses, latencies, seconds = asyncio.run(load(
+                            application, prefix + path, cookie,
+                            options['concurrency'], options['requests']))
+                        errors = sum(status != 200 for status in statuses)
+                        self.stdout.write(
+                            f'{path:<28} {name:<6} {len(statuses) / seconds:>8.1f} '
+                            f'{percentile(latencies, 50):>8.1f} '
+                            f'{percentile(latencies, 95):>8.1f} {errors:>7}')
+            finally:
+                remove_latency()
@@ -0,0 +1,99 @@
+import random
+import time
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from benchmarks.seed import weighted_picker
+from benchmarks.utils import create_users, scratch_database
+from drf_api.instrumentation import percentile
+from followers.graph import FollowGraph
+from followers.models import Follow, follow_edges
+
+
+def timings(function, arguments):
+    """
+    Calls function with each of the arguments, returning the sorted times in ms
+    """
+    results = []
+    for argument in arguments:
+        start = time.perf_counter()
+        function(argument)
+        results.append((time.perf_counter() - start) * 1000)
+    return sorted(results)
+
+
+def database_suggestions(user_id, limit=10):
+    """
+    The friends of friends of the user counted with a self join of Follow
+    """
+    following = Follow.objects.filter(owner_id=user_id).values('followed_id')
+    return list(Follow.objects.filter(owner_id__in=following).exclude(
+        followed_id__in=following).exclude(followed_id=user_id).order_by().values(
+        'followed_id').annotate(mutual=Count('id')).order_by('-mutual')[:limit])
+
+
+class Command(BaseCommand):
+    """
+    Builds a follow graph of --users users each following --follows users
+    on average, a million follows by default, with popularity following a
+    power law as in seed_dataset. Then times building the in-memory follow
+    graph, suggestions from it and from a self join in the database, and
+    single follows and unfollows.
+    Everything runs in a scratch database which is removed afterwards.
+    Run with: python manage.py bench_follow_graph
+    """
+    help = 'Times "who to follow" suggestions from the follow graph on a large graph'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50000)
+        parser.add_argument('--follows', type=int, default=21)
+        parser.add_argument('--samples', type=int, default=1000)
+        parser.add_argument('--database-samples', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with scratch_database():
+            users = create_users(options['users'], 'graph')
+            user_ids = [user.id for user in users]
+            by_popularity = user_ids[:]
+            rng.shuffle(by_popularity)
+            pick_users = weighted_picker(rng, by_popularity)
+            # Half the follows go to popular users and half to anyone,
+            # as the power law alone would pick the same few users again
+            pairs = set()
+            for user_id in user_ids:
+                count = rng.randint(0, options['follows'] * 2)
+                for followed_id in pick_users(count // 2) + rng.sample(user_ids, count - count // 2):
+                    if followed_id != user_id:
+                        pairs.add((user_id, followed_id))
+            Follow.objects.bulk_create(
+                [Follow(owner_id=owner_id, followed_id=followed_id)
+                 for owner_id, followed_id in sorted(pairs)],
+                batch_size=5000,
+            )
+            self.stdout.write(f'{len(users)} users, {len(pairs)} follows')
+
+            start = time.perf_counter()
+            graph = FollowGraph.from_edges(follow_edges())
+            seconds = time.perf_counter() - start
+            self.stdout.write(
+                f'Built the graph in {seconds:.2f}s, {graph.edges / seconds:,.0f} follows/s, '
+                f'{graph.nbytes() / 1024 / 1024:.1f}MB of arrays')
+
+            samples = rng.sample(user_ids, min(options['samples'], len(user_ids)))
+            self.stdout.write(f"{'suggestions':<22} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+            for name, function, arguments in [
+                    ('graph', lambda user_id: graph.suggestions(user_id, 10), samples),
+                    ('database self join', database_suggestions,
+                     samples[:options['database_samples']])]:
+                results = timings(function, arguments)
+                self.stdout.write(
+                    f'{name:<22} {percentile(results, 50):>8.3f} '
+                    f'{percentile(results, 95):>8.3f} {results[-1]:>8.3f}')
+
+            edges = [(user_id, rng.choice(user_ids)) for user_id in samples]
+            added = timings(lambda edge: graph.add(*edge), edges)
+            removed = timings(lambda edge: graph.remove(*edge), edges)
+            self.stdout.write(
+                f'Follow p50 {percentile(added, 50) * 1000:.1f}us, '
+                f'unfollow p50 {percentile(removed, 50) * 1000:.1f}us')
@@ -0,0 +1,72 @@
+from unittest import mock
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings, setup_test_environment
+from rest_framework.test import APIClient, APIRequestFactory
+from cloudinary_storage.storage import MediaCloudinaryStorage
+from benchmarks.endpoints import default_user
+from benchmarks.seed import seed_dataset
+from benchmarks.utils import scratch_database, time_call
+from comments.models import Comment
+from comments.serializers import CommentSerializer
+from comments.views import CommentList
+from drf_api.storage import CachedURLStorageMixin
+
+
+class Command(BaseCommand):
+    """
+    Times a 30 comment page with the storage's image URL cache on and off:
+    serializing the comment instances, serializing values() rows as
+    CommentList does, and the whole /comments/ request. Also counts how
+    many URLs the Cloudinary URL builder makes for the page.
+    Everything runs in a scratch database which is removed afterwards.
+    Run with: python manage.py bench_image_urls
+    """
+    help = 'Times image URLs on a page of comments with and without the URL cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        if not isinstance(default_storage, CachedURLStorageMixin):
+            raise CommandError('DEFAULT_FILE_STORAGE does not cache URLs')
+        setup_test_environment()
+        with override_settings(RESPONSE_CACHE_ENABLED=False), scratch_database():
+            seed_dataset(users=options['users'])
+            user = default_user()
+            request = APIRequestFactory().get('/comments/')
+            request.user = user
+            serializer = CommentSerializer(context={'request': request})
+            comments = list(CommentList.queryset.select_related(
+                'owner__profile')[:30])
+            rows = list(Comment.objects.filter(
+                pk__in=[comment.pk for comment in comments]
+            ).values(*CommentList.values_plan.keys))
+            client = APIClient()
+            client.force_authenticate(user)
+            cases = {
+                'instances': lambda: CommentSerializer(
+                    comments, many=True, context={'request': request}).data,
+                'values() rows': lambda: CommentList.values_plan.serialize(serializer, rows),
+                'GET /comments/': lambda: client.get('/comments/'),
+            }
+
+            self.stdout.write(
+                f"{'30 comments':<16} {'uncached ms':>12} {'cached ms':>10} {'speedup':>8}")
+            for name, function in cases.items():
+                with override_settings(IMAGE_URL_CACHE_SIZE=0):
+                    uncached = time_call(function, options['repeat'])
+                default_storage.url_cache.clear()
+                cached = time_call(function, options['repeat'])
+                self.stdout.write(
+                    f'{name:<16} {uncached:>12.3f} {cached:>10.3f} {uncached / cached:>7.2f}x')
+
+            default_storage.url_cache.clear()
+            for name, size in [('uncached', 0), ('cached', settings.IMAGE_URL_CACHE_SIZE)]:
+                with override_settings(IMAGE_URL_CACHE_SIZE=size), mock.patch.object(
+                        MediaCloudinaryStorage, 'url', autospec=True,
+                        side_effect=MediaCloudinaryStorage.url) as url:
+                    cases['instances']()
+                self.stdout.write(f'URLs built per page {name}: {url.call_count}')
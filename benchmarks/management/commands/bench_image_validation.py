@@ -0,0 +1,101 @@
+import os
+from io import BytesIO
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import (
+    MemoryFileUploadHandler, TemporaryFileUploadHandler,
+)
+from django.core.management.base import BaseCommand
+from django.http.multipartparser import MultiPartParser
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from PIL import Image
+from rest_framework import serializers
+from benchmarks.utils import time_call
+from drf_api.images import ProbedImageField, SizeLimitedUploadHandler, validate_image_upload
+
+
+def encode_image(width, height, image_format, noise=False, **kwargs):
+    if noise:
+        # Noise doesn't compress, giving files close to the 2MB limit
+        image = Image.effect_noise((width, height), 64)
+    else:
+        image = Image.linear_gradient('L').resize((width, height))
+    content = BytesIO()
+    image.convert('RGB').save(content, image_format, **kwargs)
+    return content.getvalue()
+
+
+class Command(BaseCommand):
+    """
+    Times validating uploaded images with DRF's ImageField, which has
+    Pillow verify the whole file, against ProbedImageField, which reads
+    only the header, for large, malformed and oversized uploads.
+    Then parses a large multipart upload with and without
+    SizeLimitedUploadHandler to show how much of it gets stored.
+    Run with: python manage.py bench_image_validation
+    """
+    help = 'Times image upload validation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument(
+            '--upload-mb', type=int, default=20, help='Size of the large multipart upload')
+
+    def handle(self, *args, **options):
+        large_png = encode_image(4096, 4096, 'PNG')
+        large_jpeg = encode_image(4096, 4096, 'JPEG', quality=95)
+        uploads = {
+            'large PNG': large_png,
+            'large JPEG': large_jpeg,
+            'noisy PNG': encode_image(800, 800, 'PNG', noise=True),
+            'noisy JPEG': encode_image(1400, 1400, 'JPEG', noise=True, quality=85),
+            'truncated PNG': large_png[:len(large_png) // 2],
+            'random bytes': b'\x89PNG\r\n\x1a\n' + os.urandom(1024 * 1024),
+            'oversized': os.urandom(3 * 1024 * 1024),
+        }
+
+        def validate(field, content):
+            upload = SimpleUploadedFile('image.png', content)
+            if len(content) > 1024 * 1024 * 2:
+                # What SizeLimitedUploadHandler hands over for this upload
+                upload.oversized = True
+            try:
+                validate_image_upload(field.to_internal_value(upload))
+                return 'valid'
+            except serializers.ValidationError as error:
+                return str(error.detail[0])[:24]
+            except ValidationError as error:
+                return error.messages[0][:24]
+
+        self.stdout.write(
+            f"{'upload':<14} {'KB':>6} {'ImageField ms':>14} {'probed ms':>10}  result")
+        for name, content in uploads.items():
+            drf_field, probed_field = serializers.ImageField(), ProbedImageField()
+            drf_ms = time_call(lambda: validate(drf_field, content), options['repeat'])
+            probed_ms = time_call(lambda: validate(probed_field, content), options['repeat'])
+            self.stdout.write(
+                f'{name:<14} {len(content) // 1024:>6} {drf_ms:>14.3f} {probed_ms:>10.3f}'
+                f'  {validate(probed_field, content)}')
+
+        body = encode_multipart(BOUNDARY, {
+            'image': SimpleUploadedFile('image.png', os.urandom(options['upload_mb'] * 1024 * 1024)),
+        })
+        meta = {'CONTENT_TYPE': MULTIPART_CONTENT, 'CONTENT_LENGTH': len(body)}
+
+        def parse(handler_classes):
+            handlers = [handler() for handler in handler_classes]
+            _, files = MultiPartParser(meta, BytesIO(body), handlers).parse()
+            upload = files['image']
+            stored = 0 if getattr(upload, 'oversized', False) else upload.size
+            upload.close()
+            return stored
+
+        default = [MemoryFileUploadHandler, TemporaryFileUploadHandler]
+        self.stdout.write(f"\n{options['upload_mb']}MB multipart upload")
+        for name, handler_classes in [
+            ('default handlers', default),
+            ('size limited', [SizeLimitedUploadHandler] + default),
+        ]:
+            parse_ms = time_call(lambda: parse(handler_classes), 5)
+            self.stdout.write(
+                f'{name:<18} {parse_ms:>9.3f} ms, {parse(handler_classes) // 1024} KB stored')
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings, setup_test_environment
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from benchmarks.endpoints import default_user
+from benchmarks.seed import seed_dataset
+from benchmarks.utils import scratch_database, time_call
+from drf_api import renderers
+
+
+class Command(BaseCommand):
+    """
+    Times DRF's JSONRenderer against FastJSONRenderer, with orjson and with
+    its stdlib fallback, on the data of real post, profile and comment pages
+    and on a large list made of many post pages joined together.
+    Everything runs in a scratch database which is removed afterwards.
+    Run with: python manage.py bench_json_renderer
+    """
+    help = 'Times the JSON renderers on post and profile pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument(
+            '--large', type=int, default=1000, help='Items in the large list')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        with override_settings(RESPONSE_CACHE_ENABLED=False), scratch_database():
+            seed_dataset(users=options['users'])
+            client = APIClient()
+            client.force_authenticate(default_user())
+            pages = {
+                url: client.get(url).data
+                for url in ['/posts/', '/profiles/', '/comments/']
+            }
+            posts = []
+            page = 1
+            while len(posts) < options['large']:
+                posts += client.get(f'/posts/?page={page}').data['results']
+                page += 1
+            pages[f"{options['large']} posts"] = {
+                'count': len(posts), 'next': None, 'previous': None, 'results': posts}
+
+        default = JSONRenderer()
+        fast = renderers.FastJSONRenderer()
+        self.stdout.write(
+            f"{'page':<14} {'JSONRenderer ms':>16} {'orjson ms':>10} {'stdlib ms':>10}")
+        for name, data in pages.items():
+            expected = default.render(data)
+            assert fast.render(data) == expected
+            default_ms = time_call(lambda: default.render(data), options['repeat'])
+            fast_ms = time_call(lambda: fast.render(data), options['repeat'])
+            orjson, renderers.orjson = renderers.orjson, None
+            try:
+                assert fast.render(data) == expected
+                stdlib_ms = time_call(lambda: fast.render(data), options['repeat'])
+            finally:
+                renderers.orjson = orjson
+            self.stdout.write(
+                f'{name:<14} {default_ms:>16.3f} {fast_ms:>10.3f} {stdlib_ms:>10.3f}')
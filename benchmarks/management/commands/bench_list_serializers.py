@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings, setup_test_environment
+from rest_framework.test import APIClient
+from benchmarks.endpoints import default_user
+from benchmarks.seed import seed_dataset
+from benchmarks.utils import scratch_database, time_call
+
+LIST_URLS = ['/posts/', '/profiles/', '/comments/', '/likes/', '/followers/']
+
+
+class Command(BaseCommand):
+    """
+    Compares the ModelSerializer list responses with the values() rows
+    of ValuesListMixin on 30 item pages, checking both give the same bytes.
+    Everything runs in a scratch database which is removed afterwards.
+    Run with: python manage.py bench_list_serializers --users 500
+    """
+    help = 'Times the list views with model serializers against values() rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        self.stdout.write(
+            f"{'endpoint':<32} {'serializer ms':>14} {'values ms':>10} {'speedup':>8}")
+        with override_settings(RESPONSE_CACHE_ENABLED=False), scratch_database():
+            seed_dataset(users=options['users'])
+            anonymous = APIClient()
+            logged_in = APIClient()
+            logged_in.force_authenticate(default_user())
+            for role, client in [('anonymous', anonymous), ('user', logged_in)]:
+                for url in LIST_URLS:
+                    self.compare(f'{url} [{role}]', client, url, options['repeat'])
+
+    def compare(self, name, client, url, repeat):
+        with override_settings(VALUES_SERIALIZER_ENABLED=False):
+            expected = client.get(url).content
+            serializer = time_call(lambda: client.get(url), repeat)
+        if client.get(url).content != expected:
+            raise CommandError(f'{name} responses differ')
+        values = time_call(lambda: client.get(url), repeat)
+        self.stdout.write(
+            f'{name:<32} {serializer:>14.2f} {values:>10.2f} {serializer / values:>7.2f}x')
@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from benchmarks.utils import create_users, scratch_database, time_call
+from followers.models import Follow
+from posts.models import Post
+from profiles.models import Profile
+from profiles.views import profile_counts
+
+
+class Command(BaseCommand):
+    """
+    Compares the old Count(distinct) profile annotations with the
+    subquery counts used by ProfileList as follower numbers grow.
+    Everything runs in a scratch database which is removed afterwards.
+    Run with: python manage.py bench_profile_counts --followers 10 50 100
+    """
+    help = 'Times the ProfileList count annotations against growing follower counts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--followers', type=int, nargs='+', default=[10, 50, 100],
+            help='Followers (and following) given to each profile on the page',
+        )
+        parser.add_argument(
+            '--profiles', type=int, default=30,
+            help='Number of popular profiles, one page by default',
+        )
+        parser.add_argument(
+            '--posts', type=int, default=20, help='Posts written by each popular profile',
+        )
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'followers':>10} {'count(distinct) ms':>20} {'subquery ms':>12}")
+        for followers in options['followers']:
+            with scratch_database():
+                self.seed(options['profiles'], followers, options['posts'])
+                distinct = time_call(
+                    lambda: list(self.distinct_queryset()[:30]), options['repeat'])
+                subquery = time_call(
+                    lambda: list(self.subquery_queryset()[:30]), options['repeat'])
+            self.stdout.write(f'{followers:>10} {distinct:>20.2f} {subquery:>12.2f}')
+
+    def seed(self, profiles, followers, posts):
+        """
+        Creates the popular users, each with posts, followed by and
+        following every user in a shared pool of the given size.
+        """
+        popular = create_users(profiles, 'popular')
+        pool = create_users(followers, 'pool')
+        Post.objects.bulk_create(
+            [Post(owner=user, title=f'post {index}')
+             for user in popular for index in range(posts)],
+            batch_size=500,
+        )
+        follows = []
+        for user in popular:
+            for other in pool:
+                follows.append(Follow(owner=other, followed=user))
+                follows.append(Follow(owner=user, followed=other))
+        Follow.objects.bulk_create(follows, batch_size=500)
+
+    def distinct_queryset(self):
+        return Profile.objects.annotate(
+            posts_count=Count('owner__post', distinct=True),
+            followers_count=Count('owner__followed', distinct=True),
+            following_count=Count('owner__following', distinct=True),
+        ).order_by('-posts_count')
+
+    def subquery_queryset(self):
+        return Profile.objects.annotate(**profile_counts()).order_by('-posts_count')
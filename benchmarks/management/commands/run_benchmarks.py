@@ -0,0 +1,94 @@
+import json
+import logging
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings, setup_test_environment
+from benchmarks.endpoints import (
+    benchmark_urls, default_user, discover_urls, find_regressions,
+)
+from benchmarks.seed import seed_dataset
+from benchmarks.utils import scratch_database
+
+
+class Command(BaseCommand):
+    """
+    Times every GET endpoint in drf_api/urls.py through the test client,
+    logged out and logged in, and prints latency percentiles and query counts.
+    Runs against the current database, e.g. after seed_dataset, or with
+    --scratch against a throwaway database seeded with --users users.
+    --save-baseline stores the results as JSON and --baseline fails the
+    command if any endpoint got slower or runs more queries than stored.
+    Run with: python manage.py run_benchmarks --scratch --baseline benchmarks.json
+    """
+    help = 'Benchmarks every API endpoint and compares the results with a baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=20, help='Timed requests per endpoint')
+        parser.add_argument(
+            '--scratch', action='store_true',
+            help='Seed and use a throwaway database instead of the current one')
+        parser.add_argument(
+            '--users', type=int, default=200, help='Users seeded with --scratch')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--username', help='User to log in as, by default the one following the most users')
+        parser.add_argument(
+            '--with-cache', action='store_true',
+            help='Keep the logged out response cache on, it is off by default')
+        parser.add_argument('--save-baseline', help='File to write the results to')
+        parser.add_argument('--baseline', help='File of results to compare with')
+        parser.add_argument(
+            '--tolerance', type=float, default=0.5,
+            help='Allowed median slowdown against the baseline, 0.5 is 50%%')
+        parser.add_argument(
+            '--min-slowdown', type=float, default=2.0,
+            help='Median slowdowns below this many ms are never regressions')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        # Keep the 403 and 405 warnings of endpoints that need a login or a POST quiet
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        with override_settings(RESPONSE_CACHE_ENABLED=options['with_cache']):
+            if options['scratch']:
+                with scratch_database():
+                    seed_dataset(users=options['users'], seed=options['seed'])
+                    results = self.run(options)
+            else:
+                results = self.run(options)
+
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w') as baseline_file:
+                json.dump(results, baseline_file, indent=2, sort_keys=True)
+            self.stdout.write(f"Saved baseline to {options['save_baseline']}")
+        if options['baseline']:
+            with open(options['baseline']) as baseline_file:
+                baseline = json.load(baseline_file)
+            regressions = find_regressions(
+                results, baseline, options['tolerance'], options['min_slowdown'])
+            if regressions:
+                raise CommandError(
+                    'Regressions against the baseline:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
+
+    def run(self, options):
+        urls, skipped = discover_urls()
+        for route, reason in skipped:
+            self.stdout.write(f'Skipped {route}: {reason}')
+        if options['username']:
+            try:
+                user = User.objects.get(username=options['username'])
+            except User.DoesNotExist:
+                raise CommandError(f"No user called {options['username']}")
+        else:
+            user = default_user()
+        results = benchmark_urls(urls, options['requests'], user)
+
+        self.stdout.write(
+            f"{'endpoint':<55} {'status':>6} {'p50 ms':>8} {'p90 ms':>8} "
+            f"{'p99 ms':>8} {'queries':>8}")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<55} {result['status']:>6} {result['p50']:>8.2f} "
+                f"{result['p90']:>8.2f} {result['p99']:>8.2f} {result['queries']:>8}")
+        return results
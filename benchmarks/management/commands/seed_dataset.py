@@ -0,0 +1,42 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from benchmarks.seed import seed_dataset
+
+
+class Command(BaseCommand):
+    """
+    Fills the database with a reproducible social graph for benchmarking.
+    The defaults make 1,000 users and about 10,000 posts, and
+    --users 10000 gives about 100,000 posts.
+    Run with: python manage.py seed_dataset --users 10000 --seed 1
+    """
+    help = 'Bulk creates users, profiles, posts, comments, likes and follows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument(
+            '--posts', type=int, default=10, help='Average posts per user')
+        parser.add_argument(
+            '--comments', type=int, default=3, help='Average comments per post')
+        parser.add_argument(
+            '--likes', type=int, default=5, help='Average likes per post')
+        parser.add_argument(
+            '--follows', type=int, default=20, help='Average follows per user')
+        parser.add_argument(
+            '--seed', type=int, default=0, help='Random seed, the same seed gives the same data')
+        parser.add_argument(
+            '--prefix', default='seed', help='Start of the seeded usernames')
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username__startswith=options['prefix']).exists():
+            raise CommandError(
+                f"Users starting with '{options['prefix']}' already exist, "
+                'use another --prefix')
+        counts = seed_dataset(
+            users=options['users'], posts=options['posts'],
+            comments=options['comments'], likes=options['likes'],
+            follows=options['follows'], seed=options['seed'],
+            prefix=options['prefix'], log=self.stdout.write,
+        )
+        summary = ', '.join(f'{count} {name}' for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Seeded {summary}'))
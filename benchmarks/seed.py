@@ -0,0 +1,125 @@
+"""
+Generates a reproducible social graph of users, profiles, posts,
+comments, likes and follows for benchmarking.
+
+Popularity follows a power law: user number n gets a weight of 1 / (n + 1),
+so a few users are followed by most others and their posts get most
+of the likes and comments, as on a real social network.
+The same seed and scale always give the same rows in an empty database.
+"""
+import itertools
+import random
+from io import StringIO
+from django.core.management import call_command
+from django.db import transaction
+from comments.models import Comment
+from drf_api import cache as response_cache
+from followers.models import Follow
+from likes.models import Like
+from posts.models import Post
+from .utils import create_users
+
+BATCH_SIZE = 1000
+
+WORDS = (
+    'sunset beach mountain coffee city night street morning garden river '
+    'forest snow autumn market bridge harbour light train travel friends '
+    'weekend dinner festival island lake walk view music portrait colour'
+).split()
+
+
+def sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def weighted_picker(rng, population):
+    """
+    Returns a function picking k items of the population with the
+    power law weights, most popular first in the population.
+    """
+    cum_weights = list(itertools.accumulate(
+        1 / (rank + 1) for rank in range(len(population))
+    ))
+    return lambda k: rng.choices(population, cum_weights=cum_weights, k=k)
+
+
+def seed_dataset(users=1000, posts=10, comments=3, likes=5, follows=20,
+                 seed=0, prefix='seed', log=None):
+    """
+    Bulk creates the dataset and returns the number of rows made of each model.
+    posts is the average number of posts per user, comments and likes the
+    average per post and follows the average number of users each user follows.
+
+    bulk_create skips the signals, so the post counters, search index,
+    trending scores and home feeds are rebuilt afterwards and the cached
+    list responses dropped.
+    """
+    log = log or (lambda message: None)
+    rng = random.Random(seed)
+    with transaction.atomic():
+        people = create_users(users, prefix)
+        # Shuffled so that popularity isn't tied to the order of the ids
+        by_popularity = people[:]
+        rng.shuffle(by_popularity)
+        pick_users = weighted_picker(rng, by_popularity)
+        log(f'Created {len(people)} users and profiles')
+
+        Post.objects.bulk_create(
+            [Post(owner=owner, title=sentence(rng, 3), content=sentence(rng, 12))
+             for owner in pick_users(users * posts)],
+            batch_size=BATCH_SIZE,
+        )
+        post_rows = list(Post.objects.filter(
+            owner__username__startswith=prefix).values_list('id', 'owner_id'))
+        popularity = {user.id: rank for rank, user in enumerate(by_popularity)}
+        post_ids = [pk for pk, owner_id in sorted(
+            post_rows, key=lambda row: popularity[row[1]])]
+        pick_posts = weighted_picker(rng, post_ids)
+        log(f'Created {len(post_ids)} posts')
+
+        follow_pairs = set()
+        for user in people:
+            for followed in pick_users(rng.randint(0, follows * 2)):
+                if followed.id != user.id:
+                    follow_pairs.add((user.id, followed.id))
+        Follow.objects.bulk_create(
+            [Follow(owner_id=owner_id, followed_id=followed_id)
+             for owner_id, followed_id in sorted(follow_pairs)],
+            batch_size=BATCH_SIZE,
+        )
+        log(f'Created {len(follow_pairs)} follows')
+
+        user_ids = [user.id for user in people]
+        like_pairs = {
+            (rng.choice(user_ids), post_id)
+            for post_id in pick_posts(len(post_ids) * likes)
+        }
+        Like.objects.bulk_create(
+            [Like(owner_id=owner_id, post_id=post_id)
+             for owner_id, post_id in sorted(like_pairs)],
+            batch_size=BATCH_SIZE,
+        )
+        log(f'Created {len(like_pairs)} likes')
+
+        comment_posts = pick_posts(len(post_ids) * comments)
+        Comment.objects.bulk_create(
+            [Comment(owner_id=rng.choice(user_ids), post_id=post_id,
+                     content=sentence(rng, 8))
+             for post_id in comment_posts],
+            batch_size=BATCH_SIZE,
+        )
+        log(f'Created {len(comment_posts)} comments')
+
+        call_command('rebuild_post_counts', verbosity=0, stdout=StringIO())
+        call_command('rebuild_search_index', verbosity=0, stdout=StringIO())
+        call_command('rescale_trending', '--rebuild', verbosity=0, stdout=StringIO())
+        call_command('rebuild_feed', verbosity=0, stdout=StringIO())
+    response_cache.invalidate('posts', 'profiles')
+    return {
+        'users': len(people),
+        'posts': len(post_ids),
+        'follows': len(follow_pairs),
+        'likes': len(like_pairs),
+        'comments': len(comment_posts),
+    }
+
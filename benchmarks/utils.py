@@ -0,0 +1,58 @@
+"""
+Helpers shared by the benchmark management commands
+"""
+import statistics
+import time
+from contextlib import contextmanager
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connections
+from profiles.models import Profile
+
+
+@contextmanager
+def scratch_database(verbosity=0):
+    """
+    Runs the benchmark against a throwaway copy of the database,
+    created the same way as the test database, so seeded rows
+    never end up in the real one.
+    """
+    connection = connections['default']
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(
+        verbosity=verbosity, autoclobber=True, serialize=False
+    )
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+
+
+def create_users(count, prefix):
+    """
+    Bulk creates users named <prefix><number> along with their profiles.
+    bulk_create doesn't send post_save so the profiles are made here too.
+    Every user gets the password 'pass', hashed once and shared.
+    """
+    password = make_password('pass')
+    User.objects.bulk_create(
+        [User(username=f'{prefix}{index}', password=password) for index in range(count)],
+        batch_size=500,
+    )
+    users = list(User.objects.filter(username__startswith=prefix).order_by('id'))
+    Profile.objects.bulk_create(
+        [Profile(owner=user) for user in users], batch_size=500
+    )
+    return users
+
+
+def time_call(function, repeat=5):
+    """
+    Calls function repeat times and returns the median time in milliseconds
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
@@ -1,6 +1,10 @@
+from django.conf import settings
 from django.db import models
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
 from django.contrib.auth.models import User
-from posts.models import Post
+from drf_api import cache as response_cache
+from posts.models import Post, TrendingEpoch
 
 
 class Comment(models.Model):
@@ -15,6 +19,60 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [models.Index(fields=['-created_at', '-id'])]
 
     def __str__(self):
         return self.content
+
+
+def increase_comments_count(sender, instance, created, **kwargs):
+    """
+    Called by post_save after a comment is saved.
+    Adds one to the post's stored comments_count when the comment is new,
+    and the comment's weight to its trending_score.
+    F() makes the database do the sum so that simultaneous comments aren't lost.
+    """
+    if created:
+        Post.objects.filter(pk=instance.post_id).update(
+            comments_count=F('comments_count') + 1,
+            trending_score=TrendingEpoch.score_change(
+                settings.TRENDING_COMMENT_WEIGHT, instance.created_at),
+        )
+
+
+def decrease_comments_count(sender, instance, **kwargs):
+    """
+    Called by post_delete after a comment is deleted.
+    Takes one off the post's stored comments_count and the comment's
+    weight, as of when it was made, off its trending_score.
+    """
+    Post.objects.filter(pk=instance.post_id).update(
+        comments_count=F('comments_count') - 1,
+        trending_score=TrendingEpoch.score_change(
+            -settings.TRENDING_COMMENT_WEIGHT, instance.created_at),
+    )
+
+
+post_save.connect(increase_comments_count, sender=Comment)
+post_delete.connect(decrease_comments_count, sender=Comment)
+
+
+def invalidate_saved_comment(sender, instance, created, **kwargs):
+    """
+    Called by post_save after a comment is saved.
+    A new comment changes the post's comments_count in the cached post
+    responses. The comments lists aren't cached, see CommentList.
+    """
+    if created:
+        response_cache.invalidate('posts', f'post:{instance.post_id}')
+
+
+def invalidate_deleted_comment(sender, instance, **kwargs):
+    """
+    Called by post_delete after a comment is deleted.
+    """
+    response_cache.invalidate('posts', f'post:{instance.post_id}')
+
+
+post_save.connect(invalidate_saved_comment, sender=Comment)
+post_delete.connect(invalidate_deleted_comment, sender=Comment)
@@ -1,3 +1,60 @@
-from django.test import TestCase
+from datetime import datetime, timedelta
+from unittest import mock
+from django.contrib.auth.models import User
+from rest_framework import status
+from rest_framework.test import APITestCase
+from posts.models import Post
+from .models import Comment
 
-# Create your tests here.
+
+class CommentDetailViewTests(APITestCase):
+    """
+    Class to contain all the tests associated with the CommentDetail view
+    """
+    def setUp(self):
+        adam = User.objects.create_user(username='adam', password='pass')
+        post = Post.objects.create(owner=adam, title='a title')
+        self.comment = Comment.objects.create(owner=adam, post=post, content='a comment')
+        self.url = f'/comments/{self.comment.id}'
+
+    def test_unchanged_comment_answered_with_304(self):
+        """
+        Context: The comment has been fetched once
+        When: HTTP get request sending the ETag back in If-None-Match
+        Then: Response status 304
+        """
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_edited_comment_returned_in_full(self):
+        """
+        Context: The comment has been fetched once and is then edited
+        When: HTTP get request sending the old ETag back in If-None-Match
+        Then: The edited comment is returned
+        """
+        etag = self.client.get(self.url)['ETag']
+        self.comment.content = 'an edited comment'
+        self.comment.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['content'], 'an edited comment')
+
+    def test_etag_changes_as_time_passes(self):
+        """
+        Context: The comment has been fetched when it was just created
+        When: An hour later, HTTP get request sending the ETag back in If-None-Match
+        Then: The comment is returned with its new created_at, "an hour ago"
+        """
+        etag = self.client.get(self.url)['ETag']
+
+        class Later(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return datetime.now(tz) + timedelta(hours=1)
+
+        with mock.patch('django.contrib.humanize.templatetags.humanize.datetime', Later):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created_at'], 'an hour ago')
+        self.assertNotIn('Last-Modified', response)
@@ -3,5 +3,6 @@ from comments import views
 
 urlpatterns = [
     path('comments/', views.CommentList.as_view()),
-    path('comments/<int:pk>', views.CommentDetail.as_view())
+    path('comments/<int:pk>', views.CommentDetail.as_view()),
+    path('async/comments/', views.AsyncCommentList.as_view()),
 ]
\ No newline at end of file
@@ -1,17 +1,26 @@
-from rest_framework import generics, permissions
+from django.contrib.humanize.templatetags.humanize import naturaltime
+from rest_framework import permissions
 from django_filters.rest_framework import DjangoFilterBackend
+from drf_api import generics
+from drf_api.async_views import AsyncListView
+from drf_api.conditional import ConditionalGetMixin
+from drf_api.pagination import CreatedAtCursorPagination
 from drf_api.permissions import IsOwnerOrReadOnly
+from drf_api.values import ValuesListMixin
 from .models import Comment
 from .serializers import CommentSerializer, CommentDetailSerializer
 
 
-class CommentList(generics.ListCreateAPIView):
+class CommentList(ValuesListMixin, generics.ListCreateAPIView):
     """
     ListCreateAPIView: Provides get and post method handlers.
     It also automatically sends the request through to the serializer as part of the context.
+    Not in the response cache, as created_at and updated_at are shown as
+    e.g. "2 minutes ago", which a cached response would keep showing.
     """
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = CreatedAtCursorPagination
     queryset = Comment.objects.all()
     # Above queryset is used to define which records need pulling from the DB
     filter_backends = [
@@ -31,11 +40,23 @@ class CommentList(generics.ListCreateAPIView):
         serializer.save(owner=self.request.user)
 
 
-class CommentDetail(generics.RetrieveUpdateDestroyAPIView):
+class CommentDetail(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     RetrieveUpdateDestroyAPIView: Used for read-write-delete endpoints to represent a single model instance.
     Provides get, put, patch and delete method handlers.
     """
     permission_classes = [IsOwnerOrReadOnly]
     serializer_class = CommentDetailSerializer
-    queryset = Comment.objects.all()
\ No newline at end of file
+    queryset = Comment.objects.all()
+    validator_fields = [
+        'created_at', 'updated_at', 'owner__username', 'owner__profile__image',
+    ]
+    rendered_validator_fields = {'created_at': naturaltime, 'updated_at': naturaltime}
+    # Above are shown as e.g. "2 minutes ago", which changes without the comment changing
+
+
+class AsyncCommentList(AsyncListView):
+    """
+    Async view for GET requests to the comments list, see drf_api/async_views.py
+    """
+    view_class = CommentList
@@ -0,0 +1,19 @@
+"""
+File used to create reusable aggregate expressions
+"""
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def related_count(model, field, outer_ref='pk'):
+    """
+    Returns a correlated subquery counting the rows of model whose field
+    matches outer_ref on the row being annotated or updated.
+    Unlike Count() across a join, each count is worked out on its own,
+    so counting several relationships at once doesn't multiply the rows.
+    Rows with nothing related are given 0 rather than None.
+    """
+    counts = model.objects.filter(
+        **{field: OuterRef(outer_ref)}
+    ).order_by().values(field).annotate(count=Count('pk')).values('count')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
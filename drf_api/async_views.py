@@ -0,0 +1,255 @@
+"""
+File used to create async versions of the read only views.
+
+Under ASGI every sync view runs on one shared thread, so a request waiting
+on the database holds up the others. The async views answer GET, HEAD and
+OPTIONS requests for an existing DRF view class from a coroutine, running
+the database work in a pool of settings.ASYNC_VIEW_THREADS threads.
+Django 3.2 has no async ORM, so each query runs through sync_to_async,
+and the queries that don't depend on each other run at the same time:
+
+- lists: the page of rows, the COUNT(*) for the page links and the logged
+  in user's relations (like_id / following_id) for the page's rows
+- details: the row, each of the count annotations and the user's relation
+
+Rows are serialized by the view's compiled values() serializer, see
+values.py, so the responses are the same as the sync views'.
+Cursor pages and anything not handled here run the sync view's whole get()
+in a pool thread, so they still don't block the event loop.
+The response cache and ETags of the sync views aren't used.
+
+With ASYNC_VIEW_THREADS = 0 the queries run one at a time in the thread
+handling the request, as the tests do.
+
+Pool threads outlive requests, so Django's request_started and
+request_finished signals never close their database connections. Each
+call in the pool closes the thread's expired or broken connections before
+and after it runs instead, as Channels' database_sync_to_async does.
+"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.paginator import InvalidPage
+from django.db import close_old_connections
+from django.http import Http404
+from rest_framework.exceptions import MethodNotAllowed, NotFound
+from rest_framework.response import Response
+from .mixins import ViewerRelationMixin
+from .pagination import CreatedAtCursorPagination
+from .values import ValuesSerializerPlan
+
+_executor = None
+_executor_threads = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Returns the pool, made again when settings.ASYNC_VIEW_THREADS has
+    changed since it was made
+    """
+    global _executor, _executor_threads
+    with _executor_lock:
+        if _executor is None or _executor_threads != settings.ASYNC_VIEW_THREADS:
+            if _executor is not None:
+                # Calls already given to the old pool still run
+                _executor.shutdown(wait=False)
+            _executor_threads = settings.ASYNC_VIEW_THREADS
+            _executor = ThreadPoolExecutor(
+                max_workers=_executor_threads,
+                thread_name_prefix='async-view',
+            )
+        return _executor
+
+
+def closing_old_connections(function):
+    """
+    Wraps function to close the thread's expired or broken database
+    connections before and after it runs, for functions run in threads
+    that outlive requests
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        close_old_connections()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return wrapper
+
+
+async def run_in_thread(function, *args, **kwargs):
+    """
+    Runs a blocking function, e.g. one making queries, in the pool
+    """
+    if not settings.ASYNC_VIEW_THREADS:
+        return await sync_to_async(function)(*args, **kwargs)
+    return await sync_to_async(
+        closing_old_connections(function), thread_sensitive=False, executor=get_executor()
+    )(*args, **kwargs)
+
+
+async def run_concurrently(*functions):
+    """
+    Runs the functions in the pool at the same time and returns their results
+    """
+    return await asyncio.gather(*(run_in_thread(function) for function in functions))
+
+
+class AsyncReadView:
+    """
+    Serves the safe methods of view_class, a DRF view, from an async view.
+    Authentication, permissions, content negotiation, exceptions and
+    finalize_response are the view's own.
+
+    Subclasses set:
+    view_class - the sync view, e.g. PostList
+    and override get to make its queries concurrently.
+    """
+    view_class = None
+    http_method_names = ['get', 'head', 'options']
+
+    @classmethod
+    def as_view(cls):
+        async def view(request, *args, **kwargs):
+            return await cls().dispatch(request, *args, **kwargs)
+        # Only safe methods are served, which CSRF doesn't check anyway
+        view.csrf_exempt = True
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        view = self.view_class()
+        view.setup(request, *args, **kwargs)
+        request = view.initialize_request(request, *args, **kwargs)
+        view.request = request
+        view.headers = view.default_response_headers
+        try:
+            method = request.method.lower()
+            if method not in self.http_method_names:
+                raise MethodNotAllowed(request.method)
+            await run_in_thread(view.initial, request, *args, **kwargs)
+            if method == 'options':
+                response = await run_in_thread(view.options, request, *args, **kwargs)
+            else:
+                response = await self.get(view, request, *args, **kwargs)
+        except Exception as exc:
+            response = view.handle_exception(exc)
+        return view.finalize_response(request, response, *args, **kwargs)
+
+    async def get(self, view, request, *args, **kwargs):
+        return await run_in_thread(view.get, request, *args, **kwargs)
+
+    def relation_query(self, view, keys):
+        """
+        Returns a function fetching the logged in user's relations of the
+        view, e.g. likes, for the objects whose viewer_relation_key is in
+        keys, a values() queryset. Returns None for logged out users.
+        """
+        user = view.request.user
+        if not user.is_authenticated:
+            return None
+        relations = view.viewer_relation_model.objects.filter(
+            owner=user, **{f'{view.viewer_relation_field}__in': keys}
+        ).values_list(f'{view.viewer_relation_field}_id', 'id')
+        return lambda: dict(relations)
+
+    def serialize(self, view, plan, rows, relations):
+        context = view.get_serializer_context()
+        if isinstance(view, ViewerRelationMixin):
+            context[view.viewer_relation_context] = relations or {}
+        return plan.serialize(view.get_serializer(context=context), rows)
+
+
+class AsyncListView(AsyncReadView):
+    """
+    Async list view for sync views using ValuesListMixin and page numbers
+    """
+    async def get(self, view, request, *args, **kwargs):
+        paginator = view.paginator
+        if (paginator is None or not settings.VALUES_SERIALIZER_ENABLED
+                or self.uses_cursor(paginator, request)):
+            return await super().get(view, request, *args, **kwargs)
+        page_size = paginator.get_page_size(request)
+        try:
+            number = int(request.query_params.get(paginator.page_query_param, 1))
+        except ValueError:
+            # e.g. ?page=last, which needs the count first
+            return await super().get(view, request, *args, **kwargs)
+
+        # Filters may query the database, e.g. to check an id exists
+        queryset = await run_in_thread(
+            lambda: view.filter_queryset(view.get_queryset()).values(*view.values_plan.keys))
+        offset = max(number - 1, 0) * page_size
+        page_rows = queryset[offset:offset + page_size]
+        queries = [queryset.count, lambda: list(page_rows)]
+        relation_query = self.relation_query(
+            view, page_rows.values(view.viewer_relation_key)
+        ) if isinstance(view, ViewerRelationMixin) else None
+        if relation_query is not None:
+            queries.append(relation_query)
+        count, rows, *relations = await run_concurrently(*queries)
+
+        django_paginator = paginator.django_paginator_class(queryset, page_size)
+        django_paginator.count = count
+        try:
+            page = django_paginator.page(number)
+        except InvalidPage as exc:
+            raise NotFound(paginator.invalid_page_message.format(
+                page_number=number, message=str(exc)))
+        page.object_list = rows
+        paginator.page, paginator.request = page, request
+        if paginator.template is not None and django_paginator.num_pages > 1:
+            paginator.display_page_controls = True
+        if isinstance(paginator, CreatedAtCursorPagination):
+            paginator.use_cursor = False
+        data = self.serialize(view, view.values_plan, rows, relations[0] if relations else None)
+        return paginator.get_paginated_response(data)
+
+    def uses_cursor(self, paginator, request):
+        return isinstance(paginator, CreatedAtCursorPagination) and (
+            paginator.always_use_cursor
+            or paginator.cursor_query_param in request.query_params
+        )
+
+
+class AsyncDetailView(AsyncReadView):
+    """
+    Async detail view reading the object's row, each annotation of the
+    view's queryset and the logged in user's relation at the same time.
+    The object permissions of the views this is used with allow
+    every safe request.
+    """
+    values_plan = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.view_class is not None:
+            serializer_class = cls.view_class.serializer_class
+            cls.values_plan = ValuesSerializerPlan(serializer_class, serializer_class.Meta.model)
+
+    async def get(self, view, request, *args, **kwargs):
+        lookup_url_kwarg = view.lookup_url_kwarg or view.lookup_field
+        queryset = view.get_queryset().filter(
+            **{view.lookup_field: kwargs[lookup_url_kwarg]})
+        # values() only selects the annotations it is given, so each
+        # annotation is left out of the row and read by its own query
+        annotations = list(queryset.query.annotations)
+        keys = [key for key in self.values_plan.keys if key not in annotations]
+        queries = [lambda: list(queryset.values(*keys))] + [
+            lambda name=name: queryset.values_list(name, flat=True).first()
+            for name in annotations
+        ]
+        relation_query = self.relation_query(
+            view, queryset.values(view.viewer_relation_key)
+        ) if isinstance(view, ViewerRelationMixin) else None
+        if relation_query is not None:
+            queries.append(relation_query)
+        rows, *values = await run_concurrently(*queries)
+        if not rows:
+            raise Http404
+        row = {**rows[0], **dict(zip(annotations, values))}
+        relations = values[len(annotations)] if relation_query is not None else None
+        return Response(self.serialize(view, self.values_plan, [row], relations)[0])
@@ -0,0 +1,40 @@
+"""
+File used to create custom authentication classes
+"""
+import copy
+from django.core.exceptions import ObjectDoesNotExist
+from dj_rest_auth.jwt_auth import JWTCookieAuthentication
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from .user_cache import user_cache
+
+
+class CachedJWTCookieAuthentication(JWTCookieAuthentication):
+    """
+    JWTCookieAuthentication which keeps the user of each token, along with
+    their profile, in user_cache so requests made with the same token
+    skip the user and profile queries.
+    The token itself is still checked on every request.
+    Each request gets its own copy of the cached user, so changes made to
+    request.user during one request aren't seen by others.
+    """
+    def get_cache_key(self, validated_token):
+        return (
+            validated_token.get(jwt_settings.USER_ID_CLAIM),
+            validated_token.get(jwt_settings.JTI_CLAIM),
+        )
+
+    def get_user(self, validated_token):
+        key = self.get_cache_key(validated_token)
+        if None in key:
+            # Tokens without a user id or jti are checked without the cache
+            return super().get_user(validated_token)
+        user = user_cache.get(key)
+        if user is None:
+            user = super().get_user(validated_token)
+            try:
+                # Loaded now so it is cached along with the user
+                user.profile
+            except ObjectDoesNotExist:
+                pass
+            user_cache.set(key, user)
+        return copy.copy(user)
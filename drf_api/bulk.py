@@ -0,0 +1,115 @@
+"""
+File used to create the base view for bulk like / follow endpoints
+"""
+from django.db import transaction
+from django.db.models.signals import post_save
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+BULK_MAX_ITEMS = 100
+
+
+class BulkRelationView(APIView):
+    """
+    View to create (POST) or delete (DELETE) many of the logged in user's
+    relationship objects, e.g. likes or follows, in one request and one transaction.
+    The request body holds a list of target ids, e.g. {"posts": [1, 2, 3]},
+    and the response has an outcome for each id in the same order:
+    {"results": [{"posts": 1, "status": "created", "id": 10}, ...]}
+
+    POST outcomes are 'created', 'duplicate' (with the same 'possible duplicate'
+    detail as the single create endpoint) or 'not_found'.
+    DELETE outcomes are 'deleted' or 'not_found'.
+
+    Subclasses set:
+    serializer_class - serializer validating the list of ids under bulk_field
+    bulk_field - the request key holding the ids, e.g. 'posts'
+    relation_model - the model created or deleted, e.g. Like
+    relation_field - the field on relation_model pointing at the target, e.g. 'post'
+    target_model - the model the ids belong to, e.g. Post
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = None
+    bulk_field = None
+    relation_model = None
+    relation_field = None
+    target_model = None
+
+    def get_target_ids(self, request):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        # dict.fromkeys drops repeated ids but keeps the order they were sent in
+        return list(dict.fromkeys(serializer.validated_data[self.bulk_field]))
+
+    def get_relations(self, target_ids):
+        """
+        Returns the logged in user's relationship objects for the target ids
+        """
+        return self.relation_model.objects.filter(
+            owner=self.request.user,
+            **{f'{self.relation_field}_id__in': target_ids}
+        )
+
+    def post(self, request):
+        target_ids = self.get_target_ids(request)
+        target_attname = f'{self.relation_field}_id'
+        with transaction.atomic():
+            found = set(self.target_model.objects.filter(
+                pk__in=target_ids).values_list('pk', flat=True))
+            existing = set(self.get_relations(target_ids).values_list(
+                target_attname, flat=True))
+            new_objects = [
+                self.relation_model(owner=request.user, **{target_attname: target_id})
+                for target_id in target_ids
+                if target_id in found and target_id not in existing
+            ]
+            self.relation_model.objects.bulk_create(new_objects, ignore_conflicts=True)
+            # bulk_create doesn't set ids when ignoring conflicts, so the new rows
+            # are read back and matched on created_at in case another request
+            # made the same relationship in the meantime
+            created_at = {
+                getattr(obj, target_attname): obj.created_at for obj in new_objects
+            }
+            created = {
+                getattr(obj, target_attname): obj
+                for obj in self.get_relations(list(created_at))
+                if obj.created_at == created_at[getattr(obj, target_attname)]
+            }
+            # bulk_create skips post_save, which keeps the counters, feeds and
+            # cached responses up to date, so it is sent for each new row
+            for obj in created.values():
+                post_save.send(
+                    sender=self.relation_model, instance=obj, created=True,
+                    update_fields=None, raw=False, using=obj._state.db,
+                )
+
+        results = []
+        for target_id in target_ids:
+            result = {self.bulk_field: target_id}
+            if target_id not in found:
+                result['status'] = 'not_found'
+            elif target_id in created:
+                result.update(status='created', id=created[target_id].id)
+            else:
+                result.update(status='duplicate', detail='possible duplicate')
+            results.append(result)
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    def delete(self, request):
+        target_ids = self.get_target_ids(request)
+        target_attname = f'{self.relation_field}_id'
+        with transaction.atomic():
+            relations = self.get_relations(target_ids)
+            deleted = dict(relations.values_list(target_attname, 'id'))
+            relations.delete()
+
+        results = []
+        for target_id in target_ids:
+            result = {self.bulk_field: target_id}
+            if target_id in deleted:
+                result.update(status='deleted', id=deleted[target_id])
+            else:
+                result['status'] = 'not_found'
+            results.append(result)
+        return Response({'results': results}, status=status.HTTP_200_OK)
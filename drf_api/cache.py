@@ -0,0 +1,176 @@
+"""
+File used to create the shared response cache for logged out GET requests.
+
+Cached responses are stored with the tags of everything they show,
+e.g. 'posts' for the posts list, 'post:3' for post 3 and 'profile:5' for
+the profile of its owner. Each tag has a version in the cache, and the signals
+in each app's models.py give a tag a new version when its data changes.
+A cached response is only used while all its tags still have the versions
+they had when it was stored.
+
+A change made in a transaction gives its tags new versions straight away
+and again once the transaction commits, as a response built in between
+may have read the data from before the commit. Each version holds the time
+it was made, and a response isn't stored if any of its tags got a new
+version after the response started being built, as it may show data from
+before the change.
+
+Responses which may be stored are read from the primary database, never
+from a read replica which may be behind, see replicas.py.
+
+Any Django cache backend can be used through settings.RESPONSE_CACHE_ALIAS.
+Use one shared between processes, e.g. the file based backend, when running
+more than one worker so that every worker sees the new tag versions;
+check_shared_cache fails the system check otherwise.
+"""
+import hashlib
+import time
+import uuid
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.utils.http import urlencode
+from rest_framework.response import Response
+from .replicas import read_from_primary
+
+
+def get_cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Fails when the response cache is on with a cache kept in each process
+    and more than one worker process
+    """
+    if (settings.RESPONSE_CACHE_ENABLED and settings.WEB_CONCURRENCY > 1
+            and isinstance(get_cache(), LocMemCache)):
+        return [checks.Error(
+            f'The response cache is on with {settings.WEB_CONCURRENCY} workers '
+            'each keeping their own LocMemCache, so changes made through one '
+            "worker don't drop the responses cached by the others.",
+            hint='Set CACHE_BACKEND to a cache shared between processes, '
+                 'or RESPONSE_CACHE_ENABLED to False.',
+            id='drf_api.E001',
+        )]
+    return []
+
+
+def tag_key(tag):
+    return f'response-tag:{tag}'
+
+
+def response_key(request):
+    """
+    Returns the cache key for the request's path and query string.
+    The query parameters are sorted so that ?a=1&b=2 and ?b=2&a=1 share a key.
+    """
+    query = urlencode(sorted(request.query_params.lists()), doseq=True)
+    url = f'{request.path}?{query}'
+    return f'response:{hashlib.md5(url.encode()).hexdigest()}'
+
+
+def new_version(changed_at):
+    return f'{changed_at:.6f}-{uuid.uuid4().hex}'
+
+
+def version_time(version):
+    """
+    Returns the time the version was made, 0 for versions made for
+    tags which weren't in the cache yet
+    """
+    try:
+        return float(version.partition('-')[0])
+    except ValueError:
+        # A version stored before versions held their time
+        return 0.0
+
+
+def invalidate(*tags):
+    """
+    Gives each tag a new version, which makes every cached response
+    carrying one of the tags stale. Inside a transaction the tags get
+    another new version once it commits.
+    """
+    def bump():
+        now = time.time()
+        get_cache().set_many({tag_key(tag): new_version(now) for tag in tags}, timeout=None)
+
+    bump()
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(bump)
+
+
+def tag_versions(tags):
+    """
+    Returns {tag: version} for the given tags, giving a version to
+    any tag that doesn't have one yet.
+    """
+    cache = get_cache()
+    keys = {tag_key(tag): tag for tag in tags}
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            # add() doesn't replace a version set by another request in the meantime
+            cache.add(key, new_version(0), timeout=None)
+        versions.update(cache.get_many(missing))
+    return {keys[key]: version for key, version in versions.items()}
+
+
+class ResponseCacheMixin:
+    """
+    Caches the data of successful GET responses for logged out users.
+    Logged in users always get a fresh response as it includes
+    their own is_owner, like_id and following_id values.
+
+    Subclasses set:
+    cache_view_tags - tags for the view as a whole, formatted with the url kwargs,
+        e.g. ['posts'] for a list or ['post:{pk}'] for a detail view
+    cache_item_tags - tags for each object in the response, formatted with its data,
+        e.g. ['post:{id}', 'profile:{profile_id}']
+    """
+    cache_view_tags = []
+    cache_item_tags = []
+
+    def get_cache_view_tags(self):
+        return [tag.format(**self.kwargs) for tag in self.cache_view_tags]
+
+    def get_cache_item_tags(self, data):
+        if isinstance(data, dict) and 'results' in data:
+            items = data['results']
+        elif isinstance(data, list):
+            items = data
+        else:
+            items = [data]
+        return {tag.format(**item) for item in items for tag in self.cache_item_tags}
+
+    def get(self, request, *args, **kwargs):
+        if not settings.RESPONSE_CACHE_ENABLED or request.user.is_authenticated:
+            return super().get(request, *args, **kwargs)
+
+        cache = get_cache()
+        key = response_key(request)
+        cached = cache.get(key)
+        if cached is not None and tag_versions(cached['tags']) == cached['tags']:
+            return Response(cached['data'])
+
+        # The view's tag versions are read before the data so that a change
+        # made while this response is being built leaves it stale. The item
+        # tags are only known from the data, so the response isn't stored
+        # if any of them changed since it started being built.
+        started_at = time.time()
+        tags = tag_versions(self.get_cache_view_tags())
+        read_from_primary()
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            tags = {**tag_versions(self.get_cache_item_tags(response.data)), **tags}
+            if all(version_time(version) < started_at for version in tags.values()):
+                cache.set(
+                    key, {'data': response.data, 'tags': tags},
+                    settings.RESPONSE_CACHE_TIMEOUT
+                )
+        return response
@@ -0,0 +1,13 @@
+"""
+File holding the Cloudinary media storage. Importing cloudinary_storage
+requires Cloudinary credentials, so only DEFAULT_FILE_STORAGE refers to
+this module, see drf_api/storage.py.
+"""
+from cloudinary_storage.storage import MediaCloudinaryStorage
+from .storage import CachedURLStorageMixin
+
+
+class CachedMediaCloudinaryStorage(CachedURLStorageMixin, MediaCloudinaryStorage):
+    """
+    The media storage, see DEFAULT_FILE_STORAGE in settings.py
+    """
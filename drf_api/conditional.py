@@ -0,0 +1,112 @@
+"""
+File used to create conditional GET handling for detail views
+"""
+import hashlib
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from . import cache as response_cache
+
+
+class ConditionalGetMixin:
+    """
+    Answers If-None-Match and If-Modified-Since requests with a 304
+    before the object is fetched and serialized.
+
+    The ETag is worked out from the validator_fields of the object, which
+    are read in one small query, along with the id of the user making the
+    request and their like or follow id, as is_owner, like_id and
+    following_id differ between users.
+    Last-Modified is the object's updated_at, only sent when updated_at is
+    the only validator field. Counters such as likes_count, the owner's
+    username or the user's like change without updated_at changing, so a
+    client sending If-Modified-Since alone would get a 304 for a changed
+    object. Clients should send If-None-Match.
+
+    Subclasses may also set:
+    rendered_validator_fields - {field: function} for validator fields shown
+        through a function whose result changes as time passes, e.g.
+        naturaltime's "2 minutes ago". The results are part of the ETag.
+    validator_cache_tags - response cache tags, formatted with the url kwargs,
+        whose versions are part of the ETag, see cache.py. Counts whose
+        changes give the tags new versions can then be left out of
+        validator_fields, along with the queryset annotations counting them.
+    validator_tag_fields - those counts. The tag versions are only shared
+        between processes while settings.RESPONSE_CACHE_ENABLED is on, see
+        settings.py, so when it is off the counts are read from the view's
+        queryset instead of the tags.
+    validator_queryset - the queryset the validator_fields are read from
+        while the tags are used, the view's queryset by default
+    """
+    validator_fields = ['updated_at']
+    rendered_validator_fields = {}
+    validator_cache_tags = []
+    validator_tag_fields = []
+    validator_queryset = None
+
+    def use_validator_cache_tags(self):
+        return bool(self.validator_cache_tags) and settings.RESPONSE_CACHE_ENABLED
+
+    def get_validator_row(self):
+        """
+        Returns a dict of the validator_fields for the requested object,
+        or None if it doesn't exist.
+        """
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        fields = list(self.validator_fields)
+        if self.use_validator_cache_tags() and self.validator_queryset is not None:
+            queryset = self.validator_queryset.all()
+        else:
+            queryset = self.get_queryset()
+        if not self.use_validator_cache_tags():
+            fields += self.validator_tag_fields
+        queryset = queryset.filter(
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        # Views using ViewerRelationMixin also include the user's like or follow id
+        relation = getattr(self, 'get_viewer_relation_subquery', lambda: None)()
+        if relation is not None:
+            queryset = queryset.annotate(viewer_relation=relation)
+            fields.append('viewer_relation')
+        return queryset.values(*fields).first()
+
+    def get_validators(self, row):
+        """
+        Returns the ETag and Last-Modified timestamp for the row
+        """
+        values = [self.request.user.pk] + list(row.values())
+        values += [function(row[field]) for field, function in self.rendered_validator_fields.items()]
+        if self.use_validator_cache_tags():
+            tags = [tag.format(**self.kwargs) for tag in self.validator_cache_tags]
+            values.append(sorted(response_cache.tag_versions(tags).items()))
+        digest = hashlib.md5(repr(values).encode()).hexdigest()
+        if (list(row) != ['updated_at'] or self.rendered_validator_fields
+                or self.use_validator_cache_tags()):
+            # Something in the ETag can change without updated_at changing
+            return f'"{digest}"', None
+        return f'"{digest}"', int(row['updated_at'].timestamp())
+
+    def set_validator_headers(self, response, etag, last_modified):
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ['Cookie', 'Authorization'])
+        return response
+
+    def get(self, request, *args, **kwargs):
+        row = self.get_validator_row()
+        if row is None:
+            # Let the view return its usual 404 response
+            return super().get(request, *args, **kwargs)
+
+        etag, last_modified = self.get_validators(row)
+        not_modified = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if not_modified is not None:
+            return self.set_validator_headers(not_modified, etag, last_modified)
+
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            self.set_validator_headers(response, etag, last_modified)
+        return response
@@ -0,0 +1,54 @@
+"""
+The project's generic views, used instead of rest_framework.generics:
+
+    from drf_api import generics
+
+    class PostList(generics.ListCreateAPIView):
+        ...
+
+Each is DRF's view of the same name with AutoSelectRelatedMixin, so every
+generic view joins in the relations its serializer_class reads without
+having to list the mixin, see drf_api/mixins.py.
+"""
+from rest_framework import generics
+from .mixins import AutoSelectRelatedMixin
+
+
+class GenericAPIView(AutoSelectRelatedMixin, generics.GenericAPIView):
+    pass
+
+
+class CreateAPIView(AutoSelectRelatedMixin, generics.CreateAPIView):
+    pass
+
+
+class ListAPIView(AutoSelectRelatedMixin, generics.ListAPIView):
+    pass
+
+
+class RetrieveAPIView(AutoSelectRelatedMixin, generics.RetrieveAPIView):
+    pass
+
+
+class DestroyAPIView(AutoSelectRelatedMixin, generics.DestroyAPIView):
+    pass
+
+
+class UpdateAPIView(AutoSelectRelatedMixin, generics.UpdateAPIView):
+    pass
+
+
+class ListCreateAPIView(AutoSelectRelatedMixin, generics.ListCreateAPIView):
+    pass
+
+
+class RetrieveUpdateAPIView(AutoSelectRelatedMixin, generics.RetrieveUpdateAPIView):
+    pass
+
+
+class RetrieveDestroyAPIView(AutoSelectRelatedMixin, generics.RetrieveDestroyAPIView):
+    pass
+
+
+class RetrieveUpdateDestroyAPIView(AutoSelectRelatedMixin, generics.RetrieveUpdateDestroyAPIView):
+    pass
@@ -0,0 +1,124 @@
+"""
+File used to validate uploaded images without decoding them.
+
+DRF's ImageField hands uploads to Django's, which copies the whole file
+into memory and runs Pillow's verify() over it before the serializer's
+own validation sees it. ProbedImageField instead opens the upload with
+Image.open, which only reads the header, so the format, width and height
+are known without touching the pixel data. Pillow still refuses files it
+doesn't recognise and images too large to be decoded safely.
+
+SizeLimitedUploadHandler is the first upload handler, see
+FILE_UPLOAD_HANDLERS in settings.py. Once an upload grows past
+settings.IMAGE_UPLOAD_MAX_SIZE the rest of it is read but no longer
+stored, and the serializer gets an OversizedUploadedFile in its place,
+which validate_image_upload rejects on its size.
+"""
+from io import BytesIO
+from django.conf import settings
+from django.core import validators
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from django.db import models
+from PIL import Image
+from rest_framework import serializers
+
+IMAGE_MAX_WIDTH = 4096
+IMAGE_MAX_HEIGHT = 4096
+
+
+class OversizedUploadedFile(UploadedFile):
+    """
+    Stands in for an upload larger than settings.IMAGE_UPLOAD_MAX_SIZE,
+    keeping its name and size but none of its content
+    """
+    oversized = True
+
+    def __init__(self, name, content_type, size, charset, content_type_extra=None):
+        super().__init__(BytesIO(), name, content_type, size, charset, content_type_extra)
+
+
+class SizeLimitedUploadHandler(FileUploadHandler):
+    """
+    Stops passing an upload on to the handlers storing it once it is
+    larger than settings.IMAGE_UPLOAD_MAX_SIZE
+    """
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.IMAGE_UPLOAD_MAX_SIZE:
+            return None
+        return raw_data
+
+    def file_complete(self, file_size):
+        if file_size <= settings.IMAGE_UPLOAD_MAX_SIZE:
+            # Left to the next handler, which has the whole file
+            return None
+        return OversizedUploadedFile(
+            self.file_name, self.content_type, file_size,
+            self.charset, self.content_type_extra,
+        )
+
+
+def probe_image(file):
+    """
+    Opens the image's header and returns the lazily loaded PIL Image,
+    which has the format, width and height of the image.
+    Raises an exception when Pillow doesn't recognise the file.
+    """
+    file.seek(0)
+    image = Image.open(file)
+    file.seek(0)
+    return image
+
+
+class ProbedImageField(serializers.ImageField):
+    """
+    ImageField checking only the header of the upload.
+    Like DRF's, it sets the upload's image and content_type.
+    """
+    def to_internal_value(self, data):
+        file_object = serializers.FileField.to_internal_value(self, data)
+        # The same extension check as Django's ImageField
+        validators.validate_image_file_extension(file_object)
+        if getattr(file_object, 'oversized', False):
+            # There is no content to probe, validate_image_upload rejects it
+            return file_object
+        try:
+            image = probe_image(file_object)
+        except Exception:
+            self.fail('invalid_image')
+        file_object.image = image
+        file_object.content_type = Image.MIME.get(image.format)
+        return file_object
+
+
+# serializer_field_mapping of serializers with image fields
+PROBED_IMAGE_FIELD_MAPPING = {
+    **serializers.ModelSerializer.serializer_field_mapping,
+    models.ImageField: ProbedImageField,
+}
+
+
+def validate_image_upload(value):
+    """
+    Checks the size of an upload from ProbedImageField
+    and the width and height read from its header
+    """
+    max_size = settings.IMAGE_UPLOAD_MAX_SIZE
+    if value.size > max_size:
+        raise serializers.ValidationError(
+            f'Image size larger than {max_size // (1024 * 1024)}MB!'
+        )
+    if value.image.width > IMAGE_MAX_WIDTH:
+        raise serializers.ValidationError(
+            f'Image width larger tahn {IMAGE_MAX_WIDTH}px'
+        )
+    if value.image.height > IMAGE_MAX_HEIGHT:
+        raise serializers.ValidationError(
+            f'Image height larger tahn {IMAGE_MAX_HEIGHT}px'
+        )
+    return value
@@ -0,0 +1,236 @@
+"""
+File used to create the per-request instrumentation middleware.
+
+For every request the middleware records:
+- queries - the number of SQL queries run
+- db - the time spent running them
+- serialize - the time spent in the view outside the database,
+    which for this API is mostly serializers building response.data
+- render - the time spent rendering response.data, e.g. to JSON
+- total - the time spent in the middleware and everything below it
+
+These are sent back in a Server-Timing header, which browser dev tools
+show under the request's timing tab, and added to in-memory per-route
+samples. The stats view in views.py returns percentiles for each route.
+The samples are kept per process, so each worker has its own.
+
+Queries are counted by record_query, an execute wrapper on every database
+connection, for the request whose recorder is in the current context.
+The context is carried into the threads running the queries of async
+views, so they are counted too.
+"""
+import asyncio
+import threading
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+
+def percentile(values, percent):
+    """
+    Returns the nearest-rank percentile of a sorted list of values
+    """
+    if not values:
+        return None
+    index = max(0, int(round(percent / 100 * len(values))) - 1)
+    return values[min(index, len(values) - 1)]
+
+
+class RouteStats:
+    """
+    Holds the most recent samples of each route, e.g. 'GET posts/<int:pk>/',
+    up to settings.INSTRUMENTATION_SAMPLE_SIZE samples per route.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(
+            lambda: deque(maxlen=settings.INSTRUMENTATION_SAMPLE_SIZE)
+        )
+
+    def add(self, route, timings):
+        with self.lock:
+            self.samples[route].append(timings)
+
+    def reset(self):
+        with self.lock:
+            self.samples.clear()
+
+    def summary(self):
+        """
+        Returns {route: stats} with the p50, p90 and p99 of each timing
+        and the average and maximum query counts.
+        """
+        with self.lock:
+            samples = {route: list(values) for route, values in self.samples.items()}
+        summary = {}
+        for route, values in sorted(samples.items()):
+            stats = {'count': len(values)}
+            for name in ['total', 'db', 'serialize', 'render']:
+                timings = sorted(sample[name] for sample in values)
+                stats[name] = {
+                    f'p{percent}': round(percentile(timings, percent), 2)
+                    for percent in [50, 90, 99]
+                }
+            queries = [sample['queries'] for sample in values]
+            stats['queries'] = {
+                'avg': round(sum(queries) / len(queries), 2),
+                'max': max(queries),
+            }
+            summary[route] = stats
+        return summary
+
+
+route_stats = RouteStats()
+
+
+class QueryRecorder:
+    """
+    Database execute wrapper counting the queries and adding up their time
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queries = 0
+        self.time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            with self.lock:
+                self.time += duration
+                self.queries += 1
+
+
+# The QueryRecorder of the request being handled
+current_recorder = ContextVar('current_recorder', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    recorder = current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install_query_recorder(sender=None, connection=None, **kwargs):
+    """
+    Adds record_query to the connection, called by connection_created
+    for connections made in any thread
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+connection_created.connect(install_query_recorder)
+
+
+class InstrumentationMiddleware:
+    """
+    Records the query count and timings of each request, adds the
+    Server-Timing header and stores the timings in route_stats.
+    Turned off with settings.INSTRUMENTATION_ENABLED = False.
+    Works with sync and async views, see drf_api/async_views.py.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Marks the middleware as async, the same as Django's MiddlewareMixin
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+        # Connections opened before this module was loaded
+        for connection in connections.all():
+            install_query_recorder(connection=connection)
+
+    def __call__(self, request):
+        if hasattr(self, '_is_coroutine'):
+            return self.__acall__(request)
+        if not settings.INSTRUMENTATION_ENABLED:
+            return self.get_response(request)
+
+        recorder = self.start(request)
+        start = time.perf_counter()
+        token = current_recorder.set(recorder)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        return self.finish(request, response, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        if not settings.INSTRUMENTATION_ENABLED:
+            return await self.get_response(request)
+
+        recorder = self.start(request)
+        start = time.perf_counter()
+        token = current_recorder.set(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        return self.finish(request, response, time.perf_counter() - start)
+
+    def start(self, request):
+        recorder = QueryRecorder()
+        request._instrumentation = {'recorder': recorder}
+        return recorder
+
+    def finish(self, request, response, total):
+        recorder = request._instrumentation['recorder']
+        timings = self.get_timings(request, recorder, total)
+        response['Server-Timing'] = self.server_timing(timings)
+        match = request.resolver_match
+        if match is not None and match.route:
+            route_stats.add(f'{request.method} {match.route}', timings)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        marks = getattr(request, '_instrumentation', None)
+        if marks is not None:
+            marks['view_start'] = time.perf_counter()
+            marks['view_db'] = marks['recorder'].time
+
+    def process_template_response(self, request, response):
+        """
+        Called after the view returns a DRF Response and before it is rendered,
+        which splits the view's time from the render time.
+        """
+        marks = getattr(request, '_instrumentation', None)
+        if marks is not None and 'view_start' in marks:
+            marks['view_end'] = time.perf_counter()
+            marks['view_db'] = marks['recorder'].time - marks['view_db']
+            response.add_post_render_callback(
+                lambda rendered: marks.update(render_end=time.perf_counter())
+            )
+        return response
+
+    def get_timings(self, request, recorder, total):
+        """
+        Returns the request's timings in milliseconds along with its query count
+        """
+        marks = request._instrumentation
+        serialize = render = 0.0
+        if 'view_end' in marks:
+            serialize = marks['view_end'] - marks['view_start'] - marks['view_db']
+            render = marks.get('render_end', marks['view_end']) - marks['view_end']
+        return {
+            'queries': recorder.queries,
+            'db': recorder.time * 1000,
+            'serialize': max(serialize, 0) * 1000,
+            'render': render * 1000,
+            'total': total * 1000,
+        }
+
+    def server_timing(self, timings):
+        return ', '.join([
+            f'db;dur={timings["db"]:.2f};desc="{timings["queries"]} queries"',
+            f'serialize;dur={timings["serialize"]:.2f}',
+            f'render;dur={timings["render"]:.2f}',
+            f'total;dur={timings["total"]:.2f}',
+        ])
@@ -0,0 +1,180 @@
+"""
+File used to upload post and profile images in the background.
+
+Saving an ImageField uploads the file to DEFAULT_FILE_STORAGE, Cloudinary,
+while the request waits. StagedImageSerializerMixin instead writes a new
+image to local staging storage, saves the model with image_state
+'pending' and its image unchanged, and once the transaction commits hands
+the upload to a pool of settings.MEDIA_UPLOAD_WORKERS threads. When the
+upload completes the model's image is swapped to the uploaded file and its
+image_state set to 'ready', or 'failed' if the upload raised.
+
+Models using it have the image_state and image_upload fields, the latter
+holding the staged name of the upload in progress. A newer upload replaces
+it, so an older upload finishing late doesn't overwrite the newer image.
+
+With MEDIA_UPLOAD_WORKERS = 0 uploads run straight after the commit in the
+request thread instead, as the tests do. LocalRemoteStorage stands in for
+Cloudinary when set as DEFAULT_FILE_STORAGE, so everything runs offline.
+Uploads left pending by a stopped process are restarted with
+python manage.py finish_image_uploads
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import connections, transaction
+from django.db.models.signals import post_save
+from django.utils import timezone
+from .storage import CachedURLStorageMixin
+
+logger = logging.getLogger(__name__)
+
+IMAGE_READY = 'ready'
+IMAGE_PENDING = 'pending'
+IMAGE_FAILED = 'failed'
+IMAGE_STATES = [
+    (IMAGE_READY, 'Ready'),
+    (IMAGE_PENDING, 'Pending'),
+    (IMAGE_FAILED, 'Failed'),
+]
+
+
+class LocalRemoteStorage(CachedURLStorageMixin, FileSystemStorage):
+    """
+    A filesystem stand-in for the remote image store, keeping files in
+    settings.MEDIA_REMOTE_ROOT and waiting settings.MEDIA_REMOTE_LATENCY
+    seconds on each save to act like a network upload.
+    Like the Cloudinary storage, it caches the URLs of stored names.
+    """
+    def __init__(self, **kwargs):
+        kwargs.setdefault('location', settings.MEDIA_REMOTE_ROOT)
+        super().__init__(**kwargs)
+
+    def _save(self, name, content):
+        time.sleep(settings.MEDIA_REMOTE_LATENCY)
+        return super()._save(name, content)
+
+
+def staging_storage():
+    return FileSystemStorage(location=settings.MEDIA_STAGING_ROOT)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.MEDIA_UPLOAD_WORKERS,
+                thread_name_prefix='media-upload',
+            )
+        return _executor
+
+
+def stage_image(model, upload):
+    """
+    Writes the upload to staging storage and returns the field values
+    marking the model's image as pending
+    """
+    staged_name = staging_storage().save(
+        f'{model._meta.label_lower}/{os.path.basename(upload.name)}', upload)
+    return {'image_state': IMAGE_PENDING, 'image_upload': staged_name}
+
+
+def upload_on_commit(instance):
+    """
+    Starts the upload of the instance's staged image once the current
+    transaction commits
+    """
+    model, pk, staged_name = type(instance), instance.pk, instance.image_upload
+    transaction.on_commit(lambda: start_upload(model, pk, staged_name))
+
+
+def start_upload(model, pk, staged_name):
+    if settings.MEDIA_UPLOAD_WORKERS:
+        get_executor().submit(run_upload, model, pk, staged_name)
+    else:
+        finish_upload(model, pk, staged_name)
+
+
+def run_upload(model, pk, staged_name):
+    """
+    finish_upload as run by the worker threads, which close their
+    database connections once done
+    """
+    try:
+        finish_upload(model, pk, staged_name)
+    finally:
+        connections.close_all()
+
+
+def finish_upload(model, pk, staged_name):
+    """
+    Uploads the staged file to the image field's storage and points the
+    instance at it, unless a newer upload has replaced it in the meantime.
+    post_save is sent for the instance so cached responses showing the
+    old image are dropped. updated_at is set as save() would, which
+    changes the instance's ETag and Last-Modified, see conditional.py.
+    """
+    field = model._meta.get_field('image')
+    staging = staging_storage()
+    pending = model._default_manager.filter(pk=pk, image_upload=staged_name)
+    try:
+        if not pending.exists():
+            # Replaced by a newer upload before this one started
+            return
+        with staging.open(staged_name) as staged:
+            name = field.generate_filename(None, os.path.basename(staged_name))
+            name = field.storage.save(name, File(staged), max_length=field.max_length)
+    except Exception:
+        logger.exception('Upload of %s failed', staged_name)
+        pending.update(image_state=IMAGE_FAILED, image_upload='', updated_at=timezone.now())
+        return
+    finally:
+        if staging.exists(staged_name):
+            staging.delete(staged_name)
+
+    if not pending.update(
+            image=name, image_state=IMAGE_READY, image_upload='', updated_at=timezone.now()):
+        # Replaced by a newer upload, or the instance was deleted
+        field.storage.delete(name)
+        return
+    instance = model._default_manager.get(pk=pk)
+    post_save.send(
+        sender=model, instance=instance, created=False,
+        update_fields=frozenset(['image', 'image_state', 'image_upload', 'updated_at']),
+        raw=False, using=instance._state.db,
+    )
+
+
+class StagedImageSerializerMixin:
+    """
+    ModelSerializer mixin staging a new image rather than uploading it
+    during the request. Until the upload completes the instance keeps its
+    previous image, or the default for a new one.
+    """
+    def create(self, validated_data):
+        upload = validated_data.pop('image', None)
+        if upload:
+            validated_data.update(stage_image(self.Meta.model, upload))
+        instance = super().create(validated_data)
+        if upload:
+            upload_on_commit(instance)
+        return instance
+
+    def update(self, instance, validated_data):
+        upload = validated_data.pop('image', None)
+        if upload:
+            validated_data.update(stage_image(self.Meta.model, upload))
+        instance = super().update(instance, validated_data)
+        if upload:
+            upload_on_commit(instance)
+        return instance
@@ -0,0 +1,172 @@
+"""
+File used to create reusable view mixins
+"""
+import warnings
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import OuterRef, Subquery
+from rest_framework import serializers
+
+
+class ViewerRelationMixin:
+    """
+    Resolves the logged in user's relationship objects (e.g. their likes or
+    follows) for every object being serialized in a single query.
+
+    Subclasses set:
+    viewer_relation_model - the model holding the relationship, e.g. Like
+    viewer_relation_field - the field on that model pointing at the serialized
+        object, e.g. 'post'
+    viewer_relation_key - the attribute on the serialized object that the
+        relation field stores, e.g. 'id' for a post or 'owner_id' for a profile
+    viewer_relation_context - the serializer context key the lookup is stored under
+
+    The serializer then reads {key: relation id} from its context
+    instead of running one query per object.
+    """
+    viewer_relation_model = None
+    viewer_relation_field = None
+    viewer_relation_key = 'id'
+    viewer_relation_context = None
+
+    def get_viewer_relation_map(self, instance):
+        """
+        Returns a dict mapping each object's key to the id of the logged in
+        user's relationship object. Objects without one are left out of the dict.
+        """
+        user = self.request.user
+        if not user.is_authenticated:
+            return {}
+        objects = instance if isinstance(instance, (list, tuple)) else [instance]
+        key = self.viewer_relation_key
+        # Objects are model instances, or dicts for views using ValuesListMixin
+        keys = [obj[key] if isinstance(obj, dict) else getattr(obj, key) for obj in objects]
+        if not keys:
+            return {}
+        relations = self.viewer_relation_model.objects.filter(
+            owner=user,
+            **{f'{self.viewer_relation_field}__in': keys}
+        ).values_list(f'{self.viewer_relation_field}_id', 'id')
+        return dict(relations)
+
+    def get_viewer_relation_subquery(self):
+        """
+        Returns a subquery giving the id of the logged in user's relationship
+        object for each row of the view's queryset, or None if logged out.
+        """
+        user = self.request.user
+        if not user.is_authenticated:
+            return None
+        relations = self.viewer_relation_model.objects.filter(
+            owner=user,
+            **{self.viewer_relation_field: OuterRef(self.viewer_relation_key)}
+        )
+        return Subquery(relations.values('id')[:1])
+
+    def get_serializer(self, *args, **kwargs):
+        """
+        Adds the relationship lookup to the serializer context whenever
+        the serializer is given existing objects (a page or a single object).
+        """
+        instance = args[0] if args else kwargs.get('instance')
+        context = kwargs.setdefault('context', self.get_serializer_context())
+        if instance is not None:
+            context[self.viewer_relation_context] = self.get_viewer_relation_map(instance)
+        return super().get_serializer(*args, **kwargs)
+
+
+def join_path(*parts):
+    return '__'.join(part for part in parts if part)
+
+
+def serializer_relations(serializer, model, prefix=''):
+    """
+    Works out the relations a serializer reads through its fields' sources.
+    Returns (select_related paths, prefetch_related paths, lazy sources),
+    where lazy sources are (field name, source) pairs that go through an
+    attribute that isn't a model field, so can't be joined in.
+
+    e.g. source='owner.profile.image.url' on a Post serializer gives 'owner__profile'
+    """
+    select, prefetch, lazy = set(), set(), []
+    for name, field in serializer.fields.items():
+        if isinstance(field, serializers.SerializerMethodField) or field.source == '*':
+            continue
+        attrs = field.source.split('.')
+        if (isinstance(field, serializers.RelatedField) and len(attrs) == 1
+                and field.use_pk_only_optimization()):
+            # Primary key fields read the foreign key column without a join
+            continue
+        current, path = model, []
+        for position, attr in enumerate(attrs):
+            try:
+                model_field = current._meta.get_field(attr)
+            except FieldDoesNotExist:
+                if position < len(attrs) - 1:
+                    lazy.append((name, field.source))
+                break
+            if not model_field.is_relation:
+                break
+            if model_field.many_to_many or model_field.one_to_many:
+                prefetch.add(join_path(prefix, *path, attr))
+                break
+            path.append(attr)
+            current = model_field.related_model
+        else:
+            child = getattr(field, 'child', field)
+            if isinstance(child, serializers.BaseSerializer):
+                nested = serializer_relations(child, current, join_path(prefix, *path))
+                select.update(nested[0])
+                prefetch.update(nested[1])
+                lazy.extend(nested[2])
+        if path:
+            select.add(join_path(prefix, *path))
+    return select, prefetch, lazy
+
+
+class AutoSelectRelatedMixin:
+    """
+    Joins in the relations read by the view's serializer_class, worked out
+    from the fields' dotted sources when the view class is created.
+    e.g. source='owner.profile.image.url' adds select_related('owner__profile'),
+    so each row doesn't load its owner and profile with separate queries.
+    A warning is given for sources that would still load lazily.
+    Every view from drf_api.generics has it, see generics.py.
+
+    Views serializing objects related to the queryset's rows, like the feed
+    serializing each item's post, set select_related_prefix, e.g. 'post'.
+    """
+    select_related_prefix = ''
+    serializer_select_related = ()
+    serializer_prefetch_related = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        serializer_class = getattr(cls, 'serializer_class', None)
+        model = getattr(getattr(serializer_class, 'Meta', None), 'model', None)
+        if model is None:
+            return
+        prefix = cls.select_related_prefix
+        select, prefetch, lazy = serializer_relations(serializer_class(), model, prefix)
+        if prefix:
+            select.add(prefix)
+        # 'owner' is already joined by 'owner__profile'
+        cls.serializer_select_related = tuple(sorted(
+            path for path in select
+            if not any(other.startswith(path + '__') for other in select)
+        ))
+        cls.serializer_prefetch_related = tuple(sorted(prefetch))
+        for name, source in lazy:
+            warnings.warn(
+                f'{cls.__name__}: {serializer_class.__name__}.{name} '
+                f"source '{source}' goes through an attribute that isn't a model "
+                'field and will be loaded separately for each object',
+                RuntimeWarning, stacklevel=2,
+            )
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.serializer_select_related:
+            queryset = queryset.select_related(*self.serializer_select_related)
+        if self.serializer_prefetch_related:
+            queryset = queryset.prefetch_related(*self.serializer_prefetch_related)
+        return queryset
@@ -0,0 +1,105 @@
+"""
+File used to create custom pagination classes
+"""
+import base64
+import binascii
+from collections import OrderedDict
+from datetime import datetime
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class CreatedAtCursorPagination(PageNumberPagination):
+    """
+    Pagination that keeps the usual page number behaviour unless the request
+    includes the cursor query parameter, e.g. /posts/?cursor=
+
+    In cursor mode the results are ordered newest first on (created_at, id)
+    and each page starts after the last row of the previous one, so there is
+    no COUNT(*) and no OFFSET scan. The response only has a next link:
+    {"next": "...?cursor=<position>", "results": [...]}
+    Any ?ordering= is ignored in this mode as the position depends on the order.
+    """
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+    always_use_cursor = False
+    # Above can be set to True for endpoints that only offer cursor pages
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.use_cursor = (
+            self.always_use_cursor or self.cursor_query_param in request.query_params
+        )
+        if not self.use_cursor:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.display_page_controls = False
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by('-created_at', '-id')
+        position = self.decode_cursor(request.query_params.get(self.cursor_query_param))
+        if position is not None:
+            created_at, pk = position
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+            )
+        # One extra row is fetched to find out if there is a next page
+        rows = list(queryset[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        self.page_rows = rows[:page_size]
+        return self.page_rows
+
+    def get_paginated_response(self, data):
+        if not self.use_cursor:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_next_link(self):
+        if not self.use_cursor:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        last = self.page_rows[-1]
+        # Rows are model instances, or dicts for views using ValuesListMixin
+        if isinstance(last, dict):
+            created_at, pk = last['created_at'], last['id']
+        else:
+            created_at, pk = last.created_at, last.id
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(created_at, pk)
+        )
+
+    def encode_cursor(self, created_at, pk):
+        position = f'{created_at.isoformat()}|{pk}'
+        return base64.urlsafe_b64encode(position.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        """
+        Returns the (created_at, id) position held in the cursor,
+        or None for an empty cursor which starts from the newest row.
+        """
+        if not cursor:
+            return None
+        try:
+            position = base64.urlsafe_b64decode(cursor.encode()).decode()
+            created_at, pk = position.split('|')
+            return datetime.fromisoformat(created_at), int(pk)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        parameters.append({
+            'name': self.cursor_query_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Switches to cursor pagination, starting after the given position.',
+            'schema': {'type': 'string'},
+        })
+        return parameters
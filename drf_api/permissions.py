@@ -20,4 +20,12 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
         """
         if request.method in permissions.SAFE_METHODS:
             return True
-        return obj.owner == request.user
\ No newline at end of file
+        return obj.owner == request.user
+
+class IsOwnerOrStaff(permissions.BasePermission):
+    """
+    Only lets the owner of the object, or a staff user, make the request,
+    including for safe methods such as GET
+    """
+    def has_object_permission(self, request, view, obj):
+        return request.user.is_staff or obj.owner == request.user
@@ -0,0 +1,117 @@
+"""
+File used to create the project's JSON renderer.
+
+FastJSONRenderer gives the same output as DRF's JSONRenderer but encodes
+with orjson when it is installed, falling back to the stdlib json module.
+Values orjson doesn't know, e.g. Decimals, lazy translation strings or
+datetimes that a serializer field hasn't already formatted with
+REST_FRAMEWORK['DATETIME_FORMAT'], are handed to DRF's JSONEncoder so they
+come out exactly as before.
+
+StreamingJSONMixin sends the responses of list views without pagination
+as a stream, reading, serializing and encoding a chunk of rows at a time
+so the whole list is never held in memory.
+"""
+import json
+from itertools import islice
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.compat import SHORT_SEPARATORS
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer using orjson for compact responses, the default.
+    Indented responses, e.g. for the browsable API, use JSONRenderer.
+    """
+    def use_default_render(self, accepted_media_type, renderer_context):
+        return (
+            self.ensure_ascii or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        )
+
+    def encode(self, data):
+        """
+        Returns data as compact JSON bytes, the same as JSONRenderer.render
+        """
+        if orjson is not None:
+            content = orjson.dumps(
+                data, default=self.encoder_class().default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+            )
+        else:
+            content = json.dumps(
+                data, cls=self.encoder_class, ensure_ascii=False,
+                allow_nan=not self.strict, separators=SHORT_SEPARATORS,
+            ).encode()
+        # Same as JSONRenderer, the U+2028 and U+2029 line separators are escaped
+        # so the JSON is also valid javascript
+        if b'\xe2\x80\xa8' in content or b'\xe2\x80\xa9' in content:
+            content = content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(
+                b'\xe2\x80\xa9', b'\\u2029')
+        return content
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.use_default_render(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+        return self.encode(data)
+
+    def render_items(self, chunks):
+        """
+        Yields the JSON list of the items in chunks, an iterable of lists
+        of items, a chunk at a time
+        """
+        yield b'['
+        first = True
+        for items in chunks:
+            if items:
+                yield (b'' if first else b',') + b','.join(self.encode(item) for item in items)
+                first = False
+        yield b']'
+
+
+class StreamingJSONMixin:
+    """
+    Streams the GET responses of a list view without pagination which uses
+    ValuesListMixin, when FastJSONRenderer was picked for the response.
+    The queryset's values() rows are read with iterator(),
+    settings.JSON_STREAMING_CHUNK_ITEMS at a time, and each chunk is
+    serialized and encoded before the next is read, as profiles/export.py
+    does. Paginated views gain nothing from it, as each page is small and
+    is serialized whole before it could be streamed.
+    Set JSON_STREAMING_ENABLED to False to always send whole responses.
+    """
+    def streams(self, request):
+        renderer = request.accepted_renderer
+        return (
+            settings.JSON_STREAMING_ENABLED and self.paginator is None
+            and isinstance(renderer, FastJSONRenderer)
+            and not renderer.use_default_render(
+                request.accepted_media_type, self.get_renderer_context())
+        )
+
+    def list(self, request, *args, **kwargs):
+        if not settings.VALUES_SERIALIZER_ENABLED or not self.streams(request):
+            return super().list(request, *args, **kwargs)
+
+        chunk_items = settings.JSON_STREAMING_CHUNK_ITEMS
+        rows = self.filter_queryset(self.get_queryset()).values(
+            *self.values_plan.keys).iterator(chunk_size=chunk_items)
+
+        def chunks():
+            chunk = list(islice(rows, chunk_items))
+            while chunk:
+                yield self.serialize_rows(chunk)
+                chunk = list(islice(rows, chunk_items))
+
+        renderer = request.accepted_renderer
+        return StreamingHttpResponse(
+            renderer.render_items(chunks()), content_type=renderer.media_type)
@@ -0,0 +1,227 @@
+"""
+File used to create the database router sending the reads of safe
+requests to read replicas, see DATABASE_ROUTERS in settings.py.
+
+The replicas are the databases of settings.REPLICA_DATABASES, made from
+the comma separated REPLICA_DATABASE_URLS environment variable. They are
+copies of the primary database kept up to date outside of Django, so they
+may be a little behind it.
+
+- ReplicaMiddleware picks a healthy replica for each GET, HEAD and OPTIONS
+  request and ReplicaRouter sends the request's reads to it. Everything
+  else, writes and the reads of other requests, use the primary.
+- A request which writes, or makes a write during a safe request, reads
+  from the primary for the rest of the request. Its response sets the
+  settings.REPLICA_STICKY_COOKIE cookie, which keeps the client's reads on
+  the primary for settings.REPLICA_STICKY_SECONDS, so users see their own
+  writes before they reach the replicas.
+- Reads inside a transaction on the primary stay on the primary.
+- Responses which may be stored in the response cache are read from the
+  primary, see read_from_primary. A response read from a replica that is
+  behind could be stored with tag versions newer than its data, and then
+  be served until the next change.
+- replica_health checks each replica is reachable, at most once every
+  settings.REPLICA_HEALTH_CHECK_INTERVAL seconds, and a replica failing
+  the check or a query isn't used until it passes the next check. Without
+  any healthy replica, reads use the primary.
+- When a query fails on the replica, the view is run once more reading
+  from the primary, so the request doesn't fail.
+
+To try it locally with SQLite, copy db.sqlite3 to e.g. replica.sqlite3
+and set REPLICA_DATABASE_URLS=sqlite:////full/path/to/replica.sqlite3.
+"""
+import asyncio
+import random
+import threading
+import time
+from contextvars import ContextVar
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from .async_views import closing_old_connections
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class RequestRouting:
+    """
+    The database a request reads from, None being the primary
+    """
+    def __init__(self, alias):
+        self.alias = alias
+        self.wrote = False
+
+
+# The RequestRouting of the request being handled
+current_routing = ContextVar('current_routing', default=None)
+
+
+class ReplicaHealth:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # alias -> (time of the last check, healthy)
+        self.checks = {}
+
+    def is_healthy(self, alias):
+        with self.lock:
+            checked, healthy = self.checks.get(alias, (None, False))
+        if checked is None or time.monotonic() - checked >= settings.REPLICA_HEALTH_CHECK_INTERVAL:
+            healthy = self.check(alias)
+        return healthy
+
+    def check(self, alias):
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute('SELECT 1')
+            healthy = True
+        except DatabaseError:
+            connections[alias].close()
+            healthy = False
+        with self.lock:
+            self.checks[alias] = (time.monotonic(), healthy)
+        return healthy
+
+    def mark_down(self, alias):
+        """
+        Stops using the replica until its next check
+        """
+        with self.lock:
+            self.checks[alias] = (time.monotonic(), False)
+
+    def reset(self):
+        with self.lock:
+            self.checks.clear()
+
+
+replica_health = ReplicaHealth()
+
+
+def choose_replica():
+    """
+    Returns a random healthy replica's alias, or None if there isn't one
+    """
+    replicas = list(settings.REPLICA_DATABASES)
+    random.shuffle(replicas)
+    for alias in replicas:
+        if replica_health.is_healthy(alias):
+            return alias
+    return None
+
+
+def read_from_primary():
+    """
+    Sends the rest of the request's reads to the primary, without the
+    sticky cookie of a write
+    """
+    routing = current_routing.get()
+    if routing is not None:
+        routing.alias = None
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        routing = current_routing.get()
+        if routing is None or routing.alias is None:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return routing.alias
+
+    def db_for_write(self, model, **hints):
+        routing = current_routing.get()
+        if routing is not None:
+            routing.alias = None
+            routing.wrote = True
+        # Instances read from a replica are saved to the primary too
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.REPLICA_DATABASES}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.REPLICA_DATABASES:
+            return False
+        return None
+
+
+class ReplicaMiddleware:
+    """
+    Routes the reads of safe requests to a replica and sets the sticky
+    cookie on the responses of requests which wrote.
+    Works with sync and async views, see drf_api/async_views.py.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Marks the middleware as async, the same as Django's MiddlewareMixin
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if hasattr(self, '_is_coroutine'):
+            return self.__acall__(request)
+        routing = self.start(request)
+        token = current_routing.set(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_routing.reset(token)
+        return self.finish(request, routing, response)
+
+    async def __acall__(self, request):
+        # Choosing a replica may connect to it, so it runs in a thread
+        routing = await sync_to_async(
+            closing_old_connections(self.start), thread_sensitive=False)(request)
+        token = current_routing.set(routing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_routing.reset(token)
+        return self.finish(request, routing, response)
+
+    def start(self, request):
+        alias = None
+        if (request.method in SAFE_METHODS
+                and settings.REPLICA_STICKY_COOKIE not in request.COOKIES
+                and not connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            alias = choose_replica()
+        request.read_database = alias or DEFAULT_DB_ALIAS
+        return RequestRouting(alias)
+
+    def finish(self, request, routing, response):
+        if routing.wrote or request.method not in SAFE_METHODS:
+            response.set_cookie(
+                settings.REPLICA_STICKY_COOKIE, '1',
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                secure=settings.JWT_AUTH_SECURE,
+                httponly=True,
+                samesite=settings.JWT_AUTH_SAMESITE,
+            )
+        return response
+
+    def process_exception(self, request, exception):
+        routing = current_routing.get()
+        if (isinstance(exception, DatabaseError) and routing is not None
+                and routing.alias is not None):
+            replica_health.mark_down(routing.alias)
+            # Only safe requests which haven't written read from a replica,
+            # so the view can be run again on the primary
+            routing.alias = None
+            request.read_database = DEFAULT_DB_ALIAS
+            return self.run_view(request)
+        return None
+
+    def run_view(self, request):
+        """
+        Runs the request's view again. Django calls process_exception
+        in a thread for async views, so they're run with async_to_sync.
+        """
+        callback, args, kwargs = request.resolver_match
+        if asyncio.iscoroutinefunction(callback):
+            return async_to_sync(callback)(request, *args, **kwargs)
+        return callback(request, *args, **kwargs)
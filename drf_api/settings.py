@@ -22,7 +22,7 @@ CLOUDINARY_STORAGE = {
 }
 
 MEDIA_URL = '/media/'
-DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
+DEFAULT_FILE_STORAGE = 'drf_api.cloudinary_media.CachedMediaCloudinaryStorage'
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -31,16 +31,105 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [(
         'rest_framework.authentication.SessionAuthentication'
         if 'DEV' in os.environ
-        else 'dj_rest_auth.jwt_auth.JWTCookieAuthentication'
+        else 'drf_api.authentication.CachedJWTCookieAuthentication'
     )],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 30,
     'DATETIME_FORMAT': '%d %b %Y',
 }
-if 'DEV' not in os.environ:
-    REST_FRAMEWORK['DEFAULT_RENDERE_CLASSES'] = [
-        'rest_framework.rendererd.JSONRenderer',
-    ]
+# The browsable API is only offered in development
+REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = ['drf_api.renderers.FastJSONRenderer']
+if 'DEV' in os.environ:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append(
+        'rest_framework.renderers.BrowsableAPIRenderer'
+    )
+
+# List views without pagination using StreamingJSONMixin stream their
+# responses, JSON_STREAMING_CHUNK_ITEMS rows at a time, see drf_api/renderers.py
+JSON_STREAMING_ENABLED = True
+JSON_STREAMING_CHUNK_ITEMS = 100
+
+# Number of a followed user's recent posts copied into a feed when following them
+FEED_BACKFILL_LIMIT = 100
+
+# /posts/trending/ ranks posts by a score made of the post itself, its likes
+# and its comments, each weighing half as much every TRENDING_HALF_LIFE
+# seconds after it was made, see posts/trending.py
+TRENDING_HALF_LIFE = 60 * 60 * 12
+TRENDING_POST_WEIGHT = 1
+TRENDING_LIKE_WEIGHT = 1
+TRENDING_COMMENT_WEIGHT = 2
+
+# "Who to follow" suggestions come from an index of who follows who kept
+# in each process, see followers/graph.py. It is built again in the
+# background once it is FOLLOW_GRAPH_MAX_AGE seconds old, picking up follows
+# made through other processes. None keeps it until the process stops.
+FOLLOW_GRAPH_MAX_AGE = 300
+
+# Most posts returned for a ?search= on the posts list, best matches first
+POST_SEARCH_MAX_RESULTS = 500
+
+# Cache used for logged out GET responses, see drf_api/cache.py.
+# Set CACHE_BACKEND and CACHE_LOCATION to use a cache shared between processes,
+# e.g. django.core.cache.backends.filebased.FileBasedCache and a directory.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+# Number of gunicorn worker processes, which gunicorn reads from WEB_CONCURRENCY
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', 1))
+# Each process has its own LocMemCache, where a change made through one
+# worker wouldn't drop the responses cached by the others. So with more
+# than one worker the response cache is only on with a shared CACHE_BACKEND,
+# and the system check fails if it is turned on without one.
+RESPONSE_CACHE_ENABLED = (
+    WEB_CONCURRENCY == 1 or not CACHES['default']['BACKEND'].endswith('LocMemCache')
+)
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = 300
+
+# Query count and timing instrumentation, see drf_api/instrumentation.py.
+# Each process keeps up to INSTRUMENTATION_SAMPLE_SIZE recent requests per route.
+INSTRUMENTATION_ENABLED = True
+INSTRUMENTATION_SAMPLE_SIZE = 1000
+
+# Users of JWT tokens are cached in each process, see drf_api/user_cache.py
+AUTH_USER_CACHE_SIZE = 1000
+AUTH_USER_CACHE_TIMEOUT = 60
+
+# Uploads larger than IMAGE_UPLOAD_MAX_SIZE bytes stop being stored as they
+# arrive and are rejected by validation, see drf_api/images.py
+IMAGE_UPLOAD_MAX_SIZE = 1024 * 1024 * 2
+FILE_UPLOAD_HANDLERS = [
+    'drf_api.images.SizeLimitedUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+# New post and profile images are written to MEDIA_STAGING_ROOT and uploaded
+# by MEDIA_UPLOAD_WORKERS background threads, or straight after the request's
+# transaction commits when it is 0, see drf_api/media.py.
+# Setting DEFAULT_FILE_STORAGE to drf_api.media.LocalRemoteStorage keeps
+# uploads in MEDIA_REMOTE_ROOT instead of Cloudinary, taking
+# MEDIA_REMOTE_LATENCY seconds each.
+MEDIA_STAGING_ROOT = os.environ.get('MEDIA_STAGING_ROOT', BASE_DIR / 'media_staging')
+MEDIA_UPLOAD_WORKERS = 4
+MEDIA_REMOTE_ROOT = os.environ.get('MEDIA_REMOTE_ROOT', BASE_DIR / 'media_remote')
+MEDIA_REMOTE_LATENCY = 0
+
+# URLs of up to this many stored images are kept by the media storage,
+# see drf_api/storage.py. 0 builds every URL again.
+IMAGE_URL_CACHE_SIZE = 10000
+
+# Threads running the queries of the async views under async/,
+# see drf_api/async_views.py. 0 runs them one at a time in the request's thread.
+ASYNC_VIEW_THREADS = 8
+
+# List views serialize values() rows instead of model instances, see drf_api/values.py
+VALUES_SERIALIZER_ENABLED = True
 
 REST_USE_JWT = True
 JWT_AUTH_SECURE = True
@@ -92,11 +181,15 @@ INSTALLED_APPS = [
     'comments',
     'likes',
     'followers',
+    'feed',
+    'benchmarks',
 ]
 
 SITE_ID = 1
 
 MIDDLEWARE = [
+    'drf_api.instrumentation.InstrumentationMiddleware',
+    'drf_api.replicas.ReplicaMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -155,6 +248,30 @@ else:
         'default': dj_database_url.parse(os.environ.get("DATABASE_URL"))
     }
 
+# Reads of GET, HEAD and OPTIONS requests go to the read replicas at the
+# comma separated REPLICA_DATABASE_URLS, see drf_api/replicas.py.
+# A client which wrote reads from the primary for REPLICA_STICKY_SECONDS
+# afterwards, and each replica is checked to be reachable at most once
+# every REPLICA_HEALTH_CHECK_INTERVAL seconds. A request whose query fails
+# on its replica is run again on the primary.
+# With RESPONSE_CACHE_ENABLED, a response which may be cached and isn't is
+# read from the primary, so a replica which is behind can't be cached as
+# current. That sends every cache miss of the logged out lists to the
+# primary: the replicas take the reads of logged in users, while the
+# primary's share of reads grows as writes invalidate the cached lists.
+REPLICA_DATABASES = []
+for index, url in enumerate(filter(None, os.environ.get('REPLICA_DATABASE_URLS', '').split(','))):
+    DATABASES[f'replica_{index}'] = {
+        **dj_database_url.parse(url.strip()),
+        # Tests read the test database through the replicas
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(f'replica_{index}')
+DATABASE_ROUTERS = ['drf_api.replicas.ReplicaRouter']
+REPLICA_STICKY_SECONDS = 10
+REPLICA_STICKY_COOKIE = 'read-primary'
+REPLICA_HEALTH_CHECK_INTERVAL = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -0,0 +1,72 @@
+"""
+File used to create the project's media storages, which remember the URLs
+of stored images.
+
+Every post, profile and comment shows an image URL, and with Cloudinary
+each image.url is built by the SDK's URL builder. The same avatar appears
+on every comment its owner wrote, so a storage using CachedURLStorageMixin
+keeps the URL of each stored name, the least recently used being dropped
+once there are settings.IMAGE_URL_CACHE_SIZE of them.
+An image's URL only depends on its stored name, but the entry is still
+dropped by forget_image_url when a post or profile's image is saved or
+deleted, in case a file is stored again under the same name.
+Nothing here imports cloudinary_storage, which needs Cloudinary credentials
+once imported, so the models and drf_api.media.LocalRemoteStorage can be
+loaded without them. The Cloudinary storage is in drf_api/cloudinary_media.py.
+"""
+import threading
+from collections import OrderedDict
+from django.conf import settings
+
+
+class URLCache:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # name -> url, least recently used first
+        self.urls = OrderedDict()
+
+    def get_or_set(self, name, build_url):
+        with self.lock:
+            url = self.urls.get(name)
+            if url is not None:
+                self.urls.move_to_end(name)
+                return url
+        url = build_url(name)
+        with self.lock:
+            self.urls[name] = url
+            while len(self.urls) > settings.IMAGE_URL_CACHE_SIZE:
+                self.urls.popitem(last=False)
+        return url
+
+    def forget(self, name):
+        with self.lock:
+            self.urls.pop(name, None)
+
+    def clear(self):
+        with self.lock:
+            self.urls.clear()
+
+
+class CachedURLStorageMixin:
+    """
+    Storage mixin caching url() for each stored name.
+    Each storage instance has its own cache.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.url_cache = URLCache()
+
+    def url(self, name):
+        if not settings.IMAGE_URL_CACHE_SIZE:
+            return super().url(name)
+        return self.url_cache.get_or_set(name, super().url)
+
+
+def forget_image_url(sender, instance, **kwargs):
+    """
+    Called by post_save and post_delete after a post or profile is saved
+    or deleted. Drops the cached URL of its image.
+    """
+    storage = instance.image.storage
+    if isinstance(storage, CachedURLStorageMixin):
+        storage.url_cache.forget(instance.image.name)
@@ -0,0 +1,680 @@
+import datetime
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from decimal import Decimal
+from unittest import mock
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.contrib.humanize.templatetags.humanize import naturaltime
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import F
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from comments.models import Comment
+from followers.models import Follow
+from likes.models import Like
+from comments.serializers import CommentDetailSerializer
+from posts.models import Post
+from posts.serializers import PostSerializer
+from rest_framework import serializers, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+from cloudinary_storage.storage import MediaCloudinaryStorage
+from rest_framework.test import APITestCase, APITransactionTestCase
+from .instrumentation import route_stats
+from . import cache as response_cache, generics, renderers
+from .authentication import CachedJWTCookieAuthentication
+from .async_views import get_executor, run_in_thread
+from .mixins import serializer_relations
+from .values import ValuesListMixin, ValuesSerializerPlan
+from .user_cache import user_cache
+from .cloudinary_media import CachedMediaCloudinaryStorage
+from .replicas import ReplicaRouter, RequestRouting, current_routing, replica_health
+
+
+class InstrumentationTests(APITestCase):
+    """
+    Class to contain the tests for the instrumentation middleware
+    and the instrumentation stats view
+    """
+    def setUp(self):
+        route_stats.reset()
+        self.adam = User.objects.create_user(username='adam', password='pass')
+        User.objects.create_superuser(username='admin', password='pass')
+        Post.objects.create(owner=self.adam, title='a title')
+
+    def test_response_has_server_timing_header(self):
+        """
+        The context: One post in the database
+        The when: The posts list is requested
+        The then: The Server-Timing header has each timing and the query count
+        """
+        response = self.client.get('/posts/')
+        timing = response['Server-Timing']
+        for name in ['db', 'serialize', 'render', 'total']:
+            self.assertIn(f'{name};dur=', timing)
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+
+    def test_admin_can_read_route_stats(self):
+        """
+        The context: Two requests to the post detail route
+        The when: An admin requests the stats
+        The then: The route's samples are summarised
+        """
+        post = Post.objects.get()
+        self.client.get(f'/posts/{post.id}/')
+        self.client.get(f'/posts/{post.id}/')
+        self.client.login(username='admin', password='pass')
+        response = self.client.get('/instrumentation/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        stats = response.data['GET posts/<int:pk>/']
+        self.assertEqual(stats['count'], 2)
+        self.assertIn('p99', stats['total'])
+        self.assertGreater(stats['queries']['max'], 0)
+
+    def test_non_admin_can_not_read_route_stats(self):
+        self.client.login(username='adam', password='pass')
+        response = self.client.get('/instrumentation/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class SharedCacheCheckTests(APITestCase):
+    """
+    Class to contain the tests for the system check of the response cache's backend
+    """
+    @override_settings(RESPONSE_CACHE_ENABLED=True, WEB_CONCURRENCY=4)
+    def test_local_cache_with_workers_fails(self):
+        """
+        The context: The response cache is on with 4 workers and LocMemCache
+        The when: The system check runs
+        The then: It fails, naming the workers
+        """
+        errors = response_cache.check_shared_cache(None)
+        self.assertEqual([error.id for error in errors], ['drf_api.E001'])
+        self.assertIn('4 workers', errors[0].msg)
+
+    def test_local_cache_with_one_worker_passes(self):
+        with override_settings(RESPONSE_CACHE_ENABLED=True, WEB_CONCURRENCY=1):
+            self.assertEqual(response_cache.check_shared_cache(None), [])
+        with override_settings(RESPONSE_CACHE_ENABLED=False, WEB_CONCURRENCY=4):
+            self.assertEqual(response_cache.check_shared_cache(None), [])
+
+
+class AutoSelectRelatedTests(APITestCase):
+    """
+    Class to contain the tests for AutoSelectRelatedMixin, which every
+    view from drf_api.generics has
+    """
+    def test_relations_derived_from_sources(self):
+        """
+        The context: CommentDetailSerializer reads owner.username,
+            owner.profile.image.url and post.id
+        The when: Its relations are worked out
+        The then: owner, owner__profile and post are joined and nothing is lazy
+        """
+        select, prefetch, lazy = serializer_relations(CommentDetailSerializer(), Comment)
+        self.assertEqual(select, {'owner', 'owner__profile', 'post'})
+        self.assertEqual(prefetch, set())
+        self.assertEqual(lazy, [])
+
+    def test_warns_about_lazy_sources(self):
+        """
+        The context: A serializer source goes through a method, not a field
+        The when: A view using the serializer is created
+        The then: A warning names the field
+        """
+        class ShoutSerializer(serializers.ModelSerializer):
+            shout = serializers.ReadOnlyField(source='get_deferred_fields.pop')
+
+            class Meta:
+                model = Post
+                fields = ['shout']
+
+        with self.assertWarnsRegex(RuntimeWarning, 'ShoutSerializer.shout'):
+            class ShoutList(generics.ListAPIView):
+                serializer_class = ShoutSerializer
+                queryset = Post.objects.all()
+
+    def test_comment_list_queries_do_not_grow_with_comments(self):
+        """
+        The context: Ten comments by different users
+        The when: The comments list is requested
+        The then: The owners and profiles are joined in, not loaded per comment
+        """
+        post = Post.objects.create(
+            owner=User.objects.create_user(username='adam'), title='a title')
+        for number in range(10):
+            owner = User.objects.create_user(username=f'user{number}')
+            Comment.objects.create(owner=owner, post=post, content='a comment')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/comments/')
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertLessEqual(len(queries), 2)
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class ValuesListTests(APITestCase):
+    """
+    Class to contain the tests for the values() based list views
+    """
+    urls = [
+        '/posts/', '/posts/?cursor=', '/posts/?ordering=-likes_count',
+        '/profiles/', '/profiles/?ordering=-followers_count',
+        '/comments/', '/likes/', '/followers/?cursor=',
+    ]
+
+    def setUp(self):
+        self.adam = User.objects.create_user(username='adam', password='pass')
+        james = User.objects.create_user(username='james', password='pass')
+        for owner in [self.adam, james]:
+            post = Post.objects.create(owner=owner, title='a title', content='words')
+            Comment.objects.create(owner=james, post=post, content='a comment')
+        Like.objects.create(owner=self.adam, post=post)
+        Follow.objects.create(owner=self.adam, followed=james)
+
+    def assert_same_responses(self):
+        for url in self.urls:
+            with override_settings(VALUES_SERIALIZER_ENABLED=False):
+                expected = self.client.get(url)
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.content, expected.content, url)
+
+    def test_logged_out_responses_match_model_serializers(self):
+        """
+        The context: Posts, comments, likes and follows by two users
+        The when: Each list is requested with and without values() rows
+        The then: The response bodies are byte for byte the same
+        """
+        self.assert_same_responses()
+
+    def test_logged_in_responses_match_model_serializers(self):
+        """
+        The context: Adam, who liked and followed, is logged in
+        The when: Each list is requested with and without values() rows
+        The then: The response bodies, including is_owner, like_id and
+            following_id, are byte for byte the same
+        """
+        self.client.login(username='adam', password='pass')
+        self.assert_same_responses()
+        response = self.client.get('/posts/')
+        self.assertIsNotNone(response.data['results'][0]['like_id'])
+
+    def test_list_is_one_query_per_page(self):
+        self.client.login(username='adam', password='pass')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/posts/?cursor=')
+        # Session, user, posts page and the user's likes
+        self.assertEqual(len(queries), 4)
+
+    def test_method_fields_read_rows_through_their_getters(self):
+        """
+        The context: A serializer whose get_<name> methods read obj.owner_id
+            and obj.owner
+        The when: values() rows are serialized with its plan
+        The then: owner_id is read from the row and owner, which isn't a
+            column, fails with the column's name
+        """
+        class ShoutSerializer(serializers.ModelSerializer):
+            owner_shout = serializers.SerializerMethodField()
+
+            class Meta:
+                model = Post
+                fields = ['owner_shout']
+
+            def get_owner_shout(self, obj):
+                return f'user {obj.owner_id}!'
+
+        plan = ValuesSerializerPlan(ShoutSerializer, Post)
+        rows = Post.objects.filter(owner=self.adam).values(*plan.keys)
+        self.assertEqual(
+            plan.serialize(ShoutSerializer(), rows), [{'owner_shout': f'user {self.adam.pk}!'}])
+
+        ShoutSerializer.get_owner_shout = lambda serializer, obj: obj.owner.username
+        with self.assertRaisesRegex(AttributeError, "no column 'owner'"):
+            plan.serialize(ShoutSerializer(), rows)
+
+
+class FastJSONRendererTests(APITestCase):
+    """
+    Class to contain the tests for FastJSONRenderer and StreamingJSONMixin
+    """
+    data = {
+        'count': 1,
+        'results': [{
+            'created_at': naturaltime(timezone.now() - datetime.timedelta(minutes=2)),
+            'updated_at': timezone.now(),
+            'day': datetime.date(2024, 1, 31),
+            'price': Decimal('1.50'),
+            'detail': gettext_lazy('Not found.'),
+            'content': 'caf\u00e9 line\u2028break',
+            1: None,
+        }],
+    }
+
+    def test_output_matches_json_renderer(self):
+        """
+        The context: Data with humanized and raw datetimes, a Decimal,
+            a lazy string, unicode and a non string key
+        The when: It is rendered with and without orjson
+        The then: The bytes are the same as DRF's JSONRenderer
+        """
+        expected = JSONRenderer().render(self.data)
+        self.assertEqual(renderers.FastJSONRenderer().render(self.data), expected)
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertEqual(renderers.FastJSONRenderer().render(self.data), expected)
+
+    def test_chunks_join_to_whole_response(self):
+        renderer = renderers.FastJSONRenderer()
+        items = [{'id': number} for number in range(5)]
+        chunks = list(renderer.render_items([items[:2], items[2:4], items[4:], []]))
+        self.assertEqual(len(chunks), 5)
+        self.assertEqual(b''.join(chunks), renderer.render(items))
+        self.assertEqual(b''.join(renderer.render_items([])), b'[]')
+
+    @override_settings(JSON_STREAMING_CHUNK_ITEMS=2)
+    def test_unpaginated_list_streamed_from_rows(self):
+        """
+        The context: Three posts and a list view without pagination,
+            streaming two rows at a time
+        The when: The list is requested
+        The then: The response is streamed with the same body as a whole
+            response, and the rows are read in one query
+        """
+        class PostStream(renderers.StreamingJSONMixin, ValuesListMixin, generics.ListAPIView):
+            serializer_class = PostSerializer
+            queryset = Post.objects.order_by('-created_at')
+            pagination_class = None
+
+        adam = User.objects.create_user(username='adam', password='pass')
+        for number in range(3):
+            Post.objects.create(owner=adam, title=f'post {number}')
+        view = PostStream.as_view()
+        with CaptureQueriesContext(connection) as queries:
+            response = view(APIRequestFactory().get('/'))
+            self.assertTrue(response.streaming)
+            content = b''.join(response.streaming_content)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        with override_settings(JSON_STREAMING_ENABLED=False):
+            expected = view(APIRequestFactory().get('/')).render()
+        self.assertEqual(content, expected.content)
+        self.assertEqual(len(json.loads(content)), 3)
+
+
+class CachedJWTCookieAuthenticationTests(APITestCase):
+    """
+    Class to contain the tests for CachedJWTCookieAuthentication
+    """
+    def setUp(self):
+        user_cache.clear()
+        self.adam = User.objects.create_user(username='adam', password='pass')
+        self.token = str(RefreshToken.for_user(self.adam).access_token)
+
+    def authenticate(self):
+        request = APIRequestFactory().get(
+            '/', HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        user, _ = CachedJWTCookieAuthentication().authenticate(Request(request))
+        return user
+
+    def test_user_and_profile_cached_per_token(self):
+        """
+        The context: Adam's token has been used once
+        The when: It is used again
+        The then: No queries are needed for the user or their profile,
+            and each request gets its own user object
+        """
+        first = self.authenticate()
+        with self.assertNumQueries(0):
+            second = self.authenticate()
+            self.assertEqual(second.profile.id, self.adam.profile.id)
+        self.assertEqual(second, first)
+        self.assertIsNot(second, first)
+
+    def test_saving_user_or_profile_drops_cached_user(self):
+        self.authenticate()
+        self.adam.profile.save()
+        with self.assertNumQueries(2):
+            self.authenticate()
+        self.adam.set_password('new pass')
+        self.adam.save()
+        with self.assertNumQueries(2):
+            self.authenticate()
+
+    def test_logout_drops_cached_user(self):
+        # Logging in saves last_login, so it happens before the user is cached
+        self.client.login(username='adam', password='pass')
+        self.authenticate()
+        with self.assertNumQueries(0):
+            self.authenticate()
+        self.client.post('/dj-rest-auth/logout/')
+        with self.assertNumQueries(2):
+            self.authenticate()
+
+
+class CachedImageURLTests(APITestCase):
+    """
+    Class to contain the tests for the media storage's URL cache
+    """
+    def setUp(self):
+        default_storage.url_cache.clear()
+        self.adam = User.objects.create_user(username='adam', password='pass')
+        post = Post.objects.create(owner=self.adam, title='a title')
+        for _ in range(5):
+            Comment.objects.create(owner=self.adam, post=post, content='a comment')
+
+    def test_avatar_url_built_once_per_page(self):
+        """
+        Context: Adam wrote 5 comments
+        When: HTTP get request for the comments list
+        Then: The URL of adam's profile image is built once
+        """
+        with mock.patch.object(
+                MediaCloudinaryStorage, 'url', autospec=True,
+                side_effect=lambda storage, name: f'https://images/{name}') as url:
+            response = self.client.get('/comments/')
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertEqual(url.call_count, 1)
+        self.assertEqual(
+            response.data['results'][0]['profile_image'], 'https://images/../default_profile_yzfpjq')
+
+    def test_saving_profile_forgets_url(self):
+        """
+        Context: The URL of adam's profile image is cached
+        When: Adam's profile is saved
+        Then: The URL is dropped from the cache
+        """
+        name = self.adam.profile.image.name
+        default_storage.url(name)
+        self.assertIn(name, default_storage.url_cache.urls)
+        self.adam.profile.save()
+        self.assertNotIn(name, default_storage.url_cache.urls)
+
+    @override_settings(IMAGE_URL_CACHE_SIZE=2)
+    def test_cache_size_bounded(self):
+        """
+        Context: The cache holds up to 2 URLs
+        When: 3 URLs are built, the first being used again before the third
+        Then: The second, least recently used, is dropped
+        """
+        storage = CachedMediaCloudinaryStorage()
+        for name in ['one', 'two', 'one', 'three']:
+            storage.url(name)
+        self.assertEqual(list(storage.url_cache.urls), ['one', 'three'])
+
+
+class AsyncReadViewTests(APITestCase):
+    """
+    Class to contain the tests comparing the async views with the sync views
+    """
+    def setUp(self):
+        self.adam = User.objects.create_user(username='adam', password='pass')
+        self.james = User.objects.create_user(username='james', password='pass')
+        for index in range(35):
+            post = Post.objects.create(owner=self.james, title=f'post {index}')
+            Comment.objects.create(owner=self.adam, post=post, content='a comment')
+        # Written hours ago, so the comments' natural times ('3 hours ago')
+        # stay the same between the sync and async requests
+        Comment.objects.update(
+            created_at=F('created_at') - datetime.timedelta(hours=3),
+            updated_at=F('updated_at') - datetime.timedelta(hours=3),
+        )
+        self.post = post
+        Like.objects.create(owner=self.adam, post=post)
+        Follow.objects.create(owner=self.adam, followed=self.james)
+        self.urls = [
+            'posts/', 'posts/?page=2', f'posts/{self.post.id}/',
+            'profiles/', '?'.join(['profiles/', 'ordering=-posts_count']),
+            f'profiles/{self.james.profile.id}/', 'comments/', 'comments/?cursor=',
+            f'posts/?owner__profile={self.james.profile.id}',
+        ]
+
+    @override_settings(ASYNC_VIEW_THREADS=0, RESPONSE_CACHE_ENABLED=False)
+    def test_same_responses_as_sync_views(self):
+        """
+        Context: Posts, comments, a like and a follow
+        When: HTTP get requests to the sync and async views, logged out and in
+        Then: The responses are the same
+        """
+        for logged_in in [False, True]:
+            if logged_in:
+                self.client.login(username='adam', password='pass')
+            for url in self.urls:
+                with self.subTest(url=url, logged_in=logged_in):
+                    expected = self.client.get(f'/{url}')
+                    response = self.client.get(f'/async/{url}')
+                    self.assertEqual(response.status_code, status.HTTP_200_OK)
+                    # Page links point at the async views
+                    self.assertEqual(
+                        response.content.replace(b'/async/', b'/'), expected.content)
+
+    @override_settings(ASYNC_VIEW_THREADS=0)
+    def test_errors_match_sync_views(self):
+        """
+        Context: As set-up
+        When: Requests for a missing post, a page past the end and a post request
+        Then: The same status codes as the sync views
+        """
+        self.client.login(username='adam', password='pass')
+        for url in ['posts/999/', 'profiles/?page=9']:
+            self.assertEqual(
+                self.client.get(f'/async/{url}').status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.post('/async/posts/', {'title': 'a title'})
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    @override_settings(ASYNC_VIEW_THREADS=0)
+    def test_detail_queries_split(self):
+        """
+        Context: As set-up
+        When: Adam gets a profile from the async view
+        Then: The row, the three counts and the follow are separate queries
+        and the Server-Timing header counts them all
+        """
+        self.client.login(username='adam', password='pass')
+        response = self.client.get(f'/async/profiles/{self.james.profile.id}/')
+        self.assertEqual(response.data['posts_count'], 35)
+        self.assertIsNotNone(response.data['following_id'])
+        # The five plus the session's user and profile looked up by authentication
+        self.assertIn('desc="7 queries"', response['Server-Timing'])
+
+
+class AsyncReadViewThreadTests(APITransactionTestCase):
+    """
+    Class to contain the tests of the async views running queries in threads
+    """
+    # Includes any read replicas, which safe requests may read from
+    databases = '__all__'
+
+    @override_settings(ASYNC_VIEW_THREADS=4, RESPONSE_CACHE_ENABLED=False)
+    def test_queries_run_in_pool(self):
+        """
+        Context: A committed post and like
+        When: Adam gets the posts list and the post from the async views
+        Then: The responses are the same as the sync views' and the queries
+        ran in the pool's threads
+        """
+        adam = User.objects.create_user(username='adam', password='pass')
+        post = Post.objects.create(owner=adam, title='a title')
+        Like.objects.create(owner=adam, post=post)
+        self.client.login(username='adam', password='pass')
+        for url in ['posts/', f'posts/{post.id}/']:
+            expected = self.client.get(f'/{url}').content
+            response = self.client.get(f'/async/{url}')
+            self.assertEqual(response.content.replace(b'/async/', b'/'), expected)
+        self.assertIsNotNone(response.data['like_id'])
+        # The row and the like, counted from the pool's threads, plus the
+        # user and profile looked up by authentication
+        self.assertIn('desc="4 queries"', response['Server-Timing'])
+        self.assertTrue(any(
+            thread.name.startswith('async-view') for thread in threading.enumerate()))
+
+    def test_pool_follows_setting_and_closes_connections(self):
+        """
+        Context: The pool has been made with 2 threads
+        When: ASYNC_VIEW_THREADS changes to 3 and a query runs in the pool
+        Then: A pool of 3 threads is made and the thread's old connections
+        are closed before and after the query
+        """
+        with override_settings(ASYNC_VIEW_THREADS=2):
+            self.assertEqual(get_executor()._max_workers, 2)
+        calls = []
+
+        def query():
+            calls.append('query')
+            return User.objects.exists()
+
+        with override_settings(ASYNC_VIEW_THREADS=3):
+            self.assertEqual(get_executor()._max_workers, 3)
+            with mock.patch('drf_api.async_views.close_old_connections',
+                            side_effect=lambda: calls.append('close')):
+                async_to_sync(run_in_thread)(query)
+        self.assertEqual(calls, ['close', 'query', 'close'])
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False, REPLICA_DATABASES=['replica_test'])
+class ReplicaRoutingTests(APITransactionTestCase):
+    """
+    Class to contain the tests of the read replica router and middleware.
+    The replica is an SQLite file copied from the test database.
+    """
+    def setUp(self):
+        replica_health.reset()
+        self.adam = User.objects.create_user(username='adam', password='pass')
+        self.client.login(username='adam', password='pass')
+        self.copied = Post.objects.create(owner=self.adam, title='copied')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.add_replica(os.path.join(directory.name, 'replica.sqlite3'), copy=True)
+        self.primary_only = Post.objects.create(owner=self.adam, title='primary only')
+
+    def add_replica(self, path, copy=False):
+        if copy:
+            connection.ensure_connection()
+            replica = sqlite3.connect(path)
+            connection.connection.backup(replica)
+            replica.close()
+        connections.settings['replica_test'] = {
+            'ENGINE': 'django.db.backends.sqlite3', 'NAME': path}
+        self.addCleanup(self.remove_replica)
+
+    def remove_replica(self):
+        if 'replica_test' in connections.settings:
+            connections['replica_test'].close()
+            del connections['replica_test']
+            del connections.settings['replica_test']
+
+    def titles(self):
+        return [post['title'] for post in self.client.get('/posts/').data['results']]
+
+    def test_safe_requests_read_replica(self):
+        """
+        Context: A post made after the replica was copied
+        When: Adam gets the posts list and the new post
+        Then: Neither finds the new post, read from the replica
+        """
+        self.assertEqual(self.titles(), ['copied'])
+        response = self.client.get(f'/posts/{self.primary_only.id}/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn(settings.REPLICA_STICKY_COOKIE, response.cookies)
+
+    def test_reads_stick_to_primary_after_write(self):
+        """
+        Context: Adam makes a post
+        When: He gets the posts list before and after the sticky cookie expires
+        Then: The list is read from the primary until it expires
+        """
+        response = self.client.post('/posts/', {'title': 'a title'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        cookie = response.cookies[settings.REPLICA_STICKY_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.REPLICA_STICKY_SECONDS)
+        self.assertEqual(self.titles(), ['a title', 'primary only', 'copied'])
+        del self.client.cookies[settings.REPLICA_STICKY_COOKIE]
+        self.assertEqual(self.titles(), ['copied'])
+
+    def test_write_during_safe_request_uses_primary(self):
+        """
+        Context: A safe request routed to the replica
+        When: It makes a write
+        Then: The write and the reads after it use the primary
+        """
+        router = ReplicaRouter()
+        routing = RequestRouting('replica_test')
+        token = current_routing.set(routing)
+        try:
+            self.assertEqual(router.db_for_read(Post), 'replica_test')
+            with transaction.atomic():
+                self.assertEqual(router.db_for_read(Post), 'default')
+            self.assertEqual(router.db_for_write(Post), 'default')
+            self.assertIsNone(router.db_for_read(Post))
+        finally:
+            current_routing.reset(token)
+        self.assertTrue(routing.wrote)
+        self.assertFalse(router.allow_migrate('replica_test', 'posts'))
+
+    @override_settings(RESPONSE_CACHE_ENABLED=True)
+    def test_cached_responses_read_primary(self):
+        """
+        Context: The response cache is on and the replica is behind
+        When: A logged out user gets the posts list, which may be cached
+        Then: It is read from the primary, without the sticky cookie,
+        while a logged in user's list is still read from the replica
+        """
+        response_cache.get_cache().clear()
+        response = self.client_class().get('/posts/')
+        self.assertEqual(
+            [post['title'] for post in response.data['results']], ['primary only', 'copied'])
+        self.assertNotIn(settings.REPLICA_STICKY_COOKIE, response.cookies)
+        self.assertEqual(self.titles(), ['copied'])
+
+    def test_unreachable_replica_falls_back_to_primary(self):
+        """
+        Context: A replica whose file can't be opened
+        When: Adam gets the posts list
+        Then: It is read from the primary and the replica is marked unhealthy
+        """
+        self.remove_replica()
+        self.add_replica('/nonexistent/replica.sqlite3')
+        self.assertEqual(self.titles(), ['primary only', 'copied'])
+        self.assertFalse(replica_health.is_healthy('replica_test'))
+
+    @override_settings(ASYNC_VIEW_THREADS=0)
+    def test_failed_query_retried_on_primary(self):
+        """
+        Context: A replica passing its check but missing the posts table
+        When: Adam gets the sync and async posts lists
+        Then: Both are read from the primary instead of failing,
+        and the replica is marked down
+        """
+        replica = sqlite3.connect(connections.settings['replica_test']['NAME'])
+        replica.execute('DROP TABLE posts_post')
+        replica.close()
+        for url in ['/posts/', '/async/posts/']:
+            with self.subTest(url=url):
+                replica_health.reset()
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(
+                    [post['title'] for post in response.data['results']],
+                    ['primary only', 'copied'])
+                self.assertNotIn(settings.REPLICA_STICKY_COOKIE, response.cookies)
+                self.assertFalse(replica_health.checks['replica_test'][1])
+
+    def test_replica_used_again_after_check(self):
+        """
+        Context: A replica marked down after a failed query
+        When: Adam gets the posts list before and after its next check
+        Then: The replica is only used again once the check passes
+        """
+        replica_health.mark_down('replica_test')
+        self.assertEqual(self.titles(), ['primary only', 'copied'])
+        with override_settings(REPLICA_HEALTH_CHECK_INTERVAL=0):
+            self.assertEqual(self.titles(), ['copied'])
@@ -15,11 +15,14 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from .views import root_route, logout_route, CustomUserDetailsView
+from .views import (
+    root_route, logout_route, instrumentation_route, CustomUserDetailsView,
+)
 
 urlpatterns = [
     path('', root_route),
     path('admin/', admin.site.urls),
+    path('instrumentation/', instrumentation_route),
     path('api-auth/', include('rest_framework.urls')),
     path('dj-rest-auth/logout/', logout_route),
     path('dj-rest-auth/user/', CustomUserDetailsView.as_view(), name='custom_user_details'),
@@ -30,4 +33,5 @@ urlpatterns = [
     path('', include('comments.urls')),
     path('', include('likes.urls')),
     path('', include('followers.urls')),
+    path('', include('feed.urls')),
 ]
@@ -0,0 +1,69 @@
+"""
+File used to create the in-process cache of authenticated users,
+used by CachedJWTCookieAuthentication in authentication.py.
+
+Entries are kept per token for settings.AUTH_USER_CACHE_TIMEOUT seconds,
+and the least recently used are dropped once there are
+settings.AUTH_USER_CACHE_SIZE of them. Saving or deleting a user or
+their profile, and logging out, drop every entry of that user.
+
+The cache is kept per process, so a change made through one worker
+reaches the others once their entries time out.
+"""
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from django.conf import settings
+
+
+class UserCache:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # key -> (expires, user_id, user), least recently used first
+        self.entries = OrderedDict()
+        self.keys_by_user = defaultdict(set)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, user_id, user = entry
+            if expires < time.monotonic():
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return user
+
+    def set(self, key, user):
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            expires = time.monotonic() + settings.AUTH_USER_CACHE_TIMEOUT
+            self.entries[key] = (expires, user.pk, user)
+            self.keys_by_user[user.pk].add(key)
+            while len(self.entries) > settings.AUTH_USER_CACHE_SIZE:
+                self._remove(next(iter(self.entries)))
+
+    def invalidate_user(self, user_id):
+        """
+        Drops the entries of every token of the user
+        """
+        with self.lock:
+            for key in list(self.keys_by_user.get(user_id, ())):
+                self._remove(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.keys_by_user.clear()
+
+    def _remove(self, key):
+        _, user_id, _ = self.entries.pop(key)
+        keys = self.keys_by_user[user_id]
+        keys.discard(key)
+        if not keys:
+            del self.keys_by_user[user_id]
+
+
+user_cache = UserCache()
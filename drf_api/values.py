@@ -0,0 +1,185 @@
+"""
+File used to create the values() based read path for list views.
+
+A ModelSerializer builds a model instance for every row and then looks
+each field up through its source, e.g. obj.owner.profile.image.url.
+For the list views the serializer's fields are instead compiled, once per
+view class, into the columns of a single .values() query and one
+function per field turning a row into the field's value. Every value still
+goes through the field's own to_representation, so the output is the same
+as the serializer's.
+
+SerializerMethodFields call the serializer's usual get_<name>(obj) with
+the row wrapped in a ValuesRow, which reads the row's columns as
+attributes. Each row has every concrete column of the model, e.g.
+owner_id and created_at, along with the columns of the serializer's
+fields, so the getters read obj.owner_id rather than obj.owner.
+"""
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db.models import FileField
+from rest_framework import serializers
+from rest_framework.relations import PKOnlyObject
+from rest_framework.response import Response
+
+
+class ValuesRow:
+    """
+    A values() row read through attributes, e.g. row.owner_id, for the
+    SerializerMethodField getters written for model instances
+    """
+    __slots__ = ('row',)
+
+    def __init__(self, row):
+        self.row = row
+
+    def __getattr__(self, name):
+        try:
+            return self.row[name]
+        except KeyError:
+            raise AttributeError(
+                f"values() row has no column '{name}'") from None
+
+
+class ValuesField:
+    """
+    A serializer field compiled to read its value from a values() row
+    """
+    def __init__(self, name, key=None, model_field=None, attrs=(), method=None):
+        self.name = name
+        self.key = key
+        self.model_field = model_field
+        self.attrs = attrs
+        self.method = method
+
+    def bind(self, serializer):
+        """
+        Returns a function taking a row and returning the field's value,
+        using the field as bound to the serializer and its context.
+        """
+        if self.method:
+            method = getattr(serializer, self.method)
+            return lambda row: method(ValuesRow(row))
+
+        field = serializer.fields[self.name]
+        key, attrs, to_representation = self.key, self.attrs, field.to_representation
+        if isinstance(field, serializers.RelatedField):
+            def convert(row):
+                value = row[key]
+                return None if value is None else to_representation(PKOnlyObject(value))
+            return convert
+
+        if isinstance(self.model_field, FileField):
+            model_field = self.model_field
+
+            def convert(row):
+                value = row[key]
+                if value is None:
+                    return None
+                value = model_field.attr_class(None, model_field, value)
+                for attr in attrs:
+                    value = getattr(value, attr)
+                return to_representation(value)
+            return convert
+
+        def convert(row):
+            value = row[key]
+            return None if value is None else to_representation(value)
+        return convert
+
+
+class ValuesSerializerPlan:
+    """
+    The compiled form of a serializer: the columns to select and
+    a ValuesField for each of the serializer's readable fields.
+    """
+    def __init__(self, serializer_class, model):
+        self.serializer_class = serializer_class
+        self.model = model
+        self.fields = []
+        keys = [field.attname for field in model._meta.concrete_fields]
+        for name, field in serializer_class().fields.items():
+            if field.write_only:
+                continue
+            values_field = self.compile_field(name, field)
+            self.fields.append(values_field)
+            if values_field.key and values_field.key not in keys:
+                keys.append(values_field.key)
+        self.keys = keys
+
+    def compile_field(self, name, field):
+        serializer_name = self.serializer_class.__name__
+        if isinstance(field, serializers.SerializerMethodField):
+            return ValuesField(name, method=field.method_name)
+
+        attrs = field.source.split('.')
+        if isinstance(field, serializers.RelatedField) and len(attrs) == 1:
+            # Primary key fields read the foreign key column
+            model_field = self.model._meta.get_field(attrs[0])
+            return ValuesField(name, key=model_field.attname)
+
+        current, path = self.model, []
+        for position, attr in enumerate(attrs):
+            try:
+                model_field = current._meta.get_field(attr)
+            except FieldDoesNotExist:
+                if position == 0 and len(attrs) == 1:
+                    # An annotation of the view's queryset, e.g. posts_count
+                    return ValuesField(name, key=attr)
+                break
+            if model_field.many_to_many or model_field.one_to_many:
+                break
+            if model_field.is_relation:
+                path.append(attr)
+                current = model_field.related_model
+                continue
+            rest = tuple(attrs[position + 1:])
+            if not rest or (isinstance(model_field, FileField) and rest == ('url',)):
+                return ValuesField(
+                    name, key='__'.join(path + [attr]),
+                    model_field=model_field, attrs=rest,
+                )
+            break
+        raise ImproperlyConfigured(
+            f"{serializer_name}.{name} source '{field.source}' can't be "
+            'read from a values() row')
+
+    def serialize(self, serializer, rows):
+        """
+        Returns the list of dicts for the rows, the same as serializer.data
+        for the matching model instances
+        """
+        converters = [(field.name, field.bind(serializer)) for field in self.fields]
+        return [{name: convert(row) for name, convert in converters} for row in rows]
+
+
+class ValuesListMixin:
+    """
+    Serves the list view's GET requests from a single .values() query,
+    with rows turned into dicts by the compiled serializer_class rather
+    than by building and serializing model instances.
+    Turned off with settings.VALUES_SERIALIZER_ENABLED = False.
+    """
+    values_plan = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        serializer_class = getattr(cls, 'serializer_class', None)
+        model = getattr(getattr(serializer_class, 'Meta', None), 'model', None)
+        if model is not None:
+            cls.values_plan = ValuesSerializerPlan(serializer_class, model)
+
+    def serialize_rows(self, rows):
+        serializer = self.get_serializer(rows, many=True)
+        return self.values_plan.serialize(serializer.child, rows)
+
+    def list(self, request, *args, **kwargs):
+        if not settings.VALUES_SERIALIZER_ENABLED:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = queryset.values(*self.values_plan.keys)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(self.serialize_rows(list(page)))
+        return Response(self.serialize_rows(list(rows)))
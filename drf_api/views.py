@@ -1,7 +1,10 @@
-from rest_framework.decorators import api_view
+from rest_framework import permissions, status
+from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from dj_rest_auth.views import UserDetailsView
+from .instrumentation import route_stats
 from .serializers import CurrentUserSerializer
+from .user_cache import user_cache
 from .settings import (
     JWT_AUTH_COOKIE, JWT_AUTH_REFRESH_COOKIE, JWT_AUTH_SAMESITE, JWT_AUTH_SECURE,
 )
@@ -16,9 +19,26 @@ def root_route(request):
     })
 
 
+@api_view(['GET', 'DELETE'])
+@permission_classes([permissions.IsAdminUser])
+def instrumentation_route(request):
+    """
+    Admin only view returning the per-route timing percentiles and query
+    counts recorded by the instrumentation middleware in this process.
+    DELETE clears the recorded samples.
+    """
+    if request.method == 'DELETE':
+        route_stats.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    return Response(route_stats.summary())
+
+
 # dj-rest-auth logout view fix
 @api_view(['POST'])
 def logout_route(request):
+    if request.user.is_authenticated:
+        # Forget the user's tokens in the authentication cache of this process
+        user_cache.invalidate_user(request.user.pk)
     response = Response()
     response.set_cookie(
         key=JWT_AUTH_COOKIE,
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from feed.models import FeedItem
+from followers.models import Follow
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    """
+    Empties every feed and fills them again from the Follow table.
+    Needed once after adding the feed app to a database with existing follows,
+    and after follows or posts are loaded with bulk_create.
+    Every feed is filled by a single INSERT ... SELECT, which ranks each
+    user's posts once and keeps the settings.FEED_BACKFILL_LIMIT most recent,
+    the same posts backfill_feed adds when a user is followed.
+    Run with: python manage.py rebuild_feed
+    """
+    help = 'Rebuilds every home feed from the existing follows'
+
+    def handle(self, *args, **options):
+        sql = (
+            f'INSERT INTO {FeedItem._meta.db_table} (owner_id, post_id, created_at) '
+            'SELECT follow.owner_id, ranked.id, ranked.created_at '
+            f'FROM {Follow._meta.db_table} AS follow '
+            'INNER JOIN (SELECT id, owner_id, created_at, ROW_NUMBER() OVER ('
+            'PARTITION BY owner_id ORDER BY created_at DESC, id DESC) AS position '
+            f'FROM {Post._meta.db_table}) AS ranked '
+            'ON ranked.owner_id = follow.followed_id '
+            'WHERE ranked.position <= %s'
+        )
+        with transaction.atomic():
+            FeedItem.objects.all().delete()
+            with connection.cursor() as cursor:
+                cursor.execute(sql, [settings.FEED_BACKFILL_LIMIT])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt feeds with {FeedItem.objects.count()} items'))
@@ -0,0 +1,91 @@
+from django.conf import settings
+from django.db import models
+from django.db.models.signals import post_save, post_delete
+from django.contrib.auth.models import User
+from followers.models import Follow
+from posts.models import Post
+
+FEED_BATCH_SIZE = 1000
+
+
+class FeedItem(models.Model):
+    """
+    FeedItem model, a post from a followed user in the owner's home feed.
+    Rows are written when posts and follows are made, so reading a feed
+    is a single indexed lookup on owner instead of joining follows to posts.
+    created_at is copied from the post so the feed is ordered by when
+    the posts were made.
+    """
+    owner = models.ForeignKey(User, related_name='feed_items', on_delete=models.CASCADE)
+    post = models.ForeignKey(Post, related_name='feed_items', on_delete=models.CASCADE)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-created_at']
+        unique_together = ['owner', 'post']
+        indexes = [models.Index(fields=['owner', '-created_at', '-id'])]
+
+    def __str__(self):
+        return f"{self.post} in {self.owner}'s feed"
+
+
+def backfill_feed(owner_id, followed_id):
+    """
+    Adds the followed user's most recent posts to the owner's feed.
+    The number of posts is limited by settings.FEED_BACKFILL_LIMIT.
+    """
+    posts = Post.objects.filter(owner_id=followed_id).order_by(
+        '-created_at'
+    ).values_list('id', 'created_at')[:settings.FEED_BACKFILL_LIMIT]
+    FeedItem.objects.bulk_create(
+        [FeedItem(owner_id=owner_id, post_id=post_id, created_at=created_at)
+         for post_id, created_at in posts],
+        batch_size=FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def add_post_to_feeds(sender, instance, created, **kwargs):
+    """
+    Called by post_save after a post is saved.
+    A new post is written into the feed of everyone following its owner,
+    a batch of followers at a time.
+    """
+    if not created:
+        return
+    follower_ids = Follow.objects.filter(
+        followed_id=instance.owner_id
+    ).values_list('owner_id', flat=True)
+    batch = []
+    for follower_id in follower_ids.iterator(chunk_size=FEED_BATCH_SIZE):
+        batch.append(FeedItem(
+            owner_id=follower_id, post_id=instance.id, created_at=instance.created_at
+        ))
+        if len(batch) == FEED_BATCH_SIZE:
+            FeedItem.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    FeedItem.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def add_followed_posts_to_feed(sender, instance, created, **kwargs):
+    """
+    Called by post_save after a follow is saved.
+    The followed user's recent posts are added to the new follower's feed.
+    """
+    if created:
+        backfill_feed(instance.owner_id, instance.followed_id)
+
+
+def remove_followed_posts_from_feed(sender, instance, **kwargs):
+    """
+    Called by post_delete after a follow is deleted.
+    The unfollowed user's posts are removed from the owner's feed.
+    """
+    FeedItem.objects.filter(
+        owner_id=instance.owner_id, post__owner_id=instance.followed_id
+    ).delete()
+
+
+post_save.connect(add_post_to_feeds, sender=Post)
+post_save.connect(add_followed_posts_to_feed, sender=Follow)
+post_delete.connect(remove_followed_posts_from_feed, sender=Follow)
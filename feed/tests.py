@@ -0,0 +1,110 @@
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+from followers.models import Follow
+from posts.models import Post
+from .models import FeedItem
+
+
+class FeedTests(APITestCase):
+    """
+    Class to contain all the tests associated with the home feed
+    """
+    def setUp(self):
+        self.adam = User.objects.create_user(username='adam', password='pass')
+        self.james = User.objects.create_user(username='james', password='pass')
+        self.lucy = User.objects.create_user(username='lucy', password='pass')
+
+    def feed_titles(self):
+        response = self.client.get('/feed/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [post['title'] for post in response.data['results']]
+
+    @override_settings(FEED_BACKFILL_LIMIT=2)
+    def test_rebuild_feed_matches_backfill(self):
+        """
+        Context: Adam follows james and lucy, who have three posts each
+        When: The feeds are emptied and rebuilt
+        Then: Adam's feed has the two latest posts of each, as before
+        """
+        Follow.objects.create(owner=self.adam, followed=self.james)
+        Follow.objects.create(owner=self.adam, followed=self.lucy)
+        for number in range(3):
+            Post.objects.create(owner=self.james, title=f'james {number}')
+            Post.objects.create(owner=self.lucy, title=f'lucy {number}')
+        FeedItem.objects.filter(post__title__in=['james 0', 'lucy 0']).delete()
+        before = set(FeedItem.objects.values_list('owner_id', 'post_id', 'created_at'))
+        FeedItem.objects.all().delete()
+        call_command('rebuild_feed', stdout=StringIO())
+        after = set(FeedItem.objects.values_list('owner_id', 'post_id', 'created_at'))
+        self.assertEqual(after, before)
+        self.assertEqual(len(after), 4)
+
+    def test_new_posts_added_to_followers_feeds(self):
+        """
+        Context: Adam follows james, then james and lucy post
+        When: HTTP get request to adams feed
+        Then: Only james post is in the feed
+        """
+        Follow.objects.create(owner=self.adam, followed=self.james)
+        Post.objects.create(owner=self.james, title='james post')
+        Post.objects.create(owner=self.lucy, title='lucy post')
+        self.client.login(username='adam', password='pass')
+        self.assertEqual(self.feed_titles(), ['james post'])
+
+    @override_settings(FEED_BACKFILL_LIMIT=2)
+    def test_follow_backfills_recent_posts(self):
+        """
+        Context: James has three posts, FEED_BACKFILL_LIMIT is 2
+        When: Adam follows james
+        Then: James two newest posts are added to adams feed
+        """
+        for index in range(3):
+            Post.objects.create(owner=self.james, title=f'post {index}')
+        Follow.objects.create(owner=self.adam, followed=self.james)
+        self.client.login(username='adam', password='pass')
+        self.assertEqual(self.feed_titles(), ['post 2', 'post 1'])
+
+    def test_unfollow_removes_posts(self):
+        """
+        Context: Adam follows james and lucy who have both posted
+        When: Adam unfollows james
+        Then: Only lucys post is left in adams feed
+        """
+        follow = Follow.objects.create(owner=self.adam, followed=self.james)
+        Follow.objects.create(owner=self.adam, followed=self.lucy)
+        Post.objects.create(owner=self.james, title='james post')
+        Post.objects.create(owner=self.lucy, title='lucy post')
+        follow.delete()
+        self.assertEqual(FeedItem.objects.filter(owner=self.adam).count(), 1)
+        self.client.login(username='adam', password='pass')
+        self.assertEqual(self.feed_titles(), ['lucy post'])
+
+    def test_feed_pages_with_cursor(self):
+        """
+        Context: Adam follows james who has 31 posts
+        When: HTTP get requests to adams feed following the next link
+        Then: 30 posts then 1 post are returned
+        """
+        Follow.objects.create(owner=self.adam, followed=self.james)
+        for index in range(31):
+            Post.objects.create(owner=self.james, title=f'post {index}')
+        self.client.login(username='adam', password='pass')
+        response = self.client.get('/feed/')
+        self.assertEqual(len(response.data['results']), 30)
+        response = self.client.get(response.data['next'])
+        self.assertEqual(
+            [post['title'] for post in response.data['results']], ['post 0'])
+        self.assertIsNone(response.data['next'])
+
+    def test_logged_out_user_can_not_read_feed(self):
+        """
+        Context: No logged in user
+        When: HTTP get request to the feed
+        Then: Error status code 403
+        """
+        response = self.client.get('/feed/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
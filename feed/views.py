@@ -0,0 +1,35 @@
+from rest_framework import permissions
+from drf_api import generics
+from drf_api.pagination import CreatedAtCursorPagination
+from posts.serializers import PostSerializer
+from posts.views import LikeIdMixin
+from .models import FeedItem
+
+
+class FeedPagination(CreatedAtCursorPagination):
+    """
+    The feed is only read newest first, a page at a time, so it always uses cursors
+    """
+    always_use_cursor = True
+
+
+class Feed(LikeIdMixin, generics.ListAPIView):
+    """
+    View to return the posts from users the logged in user follows, newest first.
+    Reads the logged in user's FeedItem rows a page at a time
+    and returns the posts they point at.
+    """
+    serializer_class = PostSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = FeedPagination
+    queryset = FeedItem.objects.all()
+    select_related_prefix = 'post'
+
+    def get_queryset(self):
+        return super().get_queryset().filter(owner=self.request.user)
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset())
+        posts = [item.post for item in page]
+        serializer = self.get_serializer(posts, many=True)
+        return self.get_paginated_response(serializer.data)
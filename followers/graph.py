@@ -0,0 +1,205 @@
+"""
+In-memory index of who follows who, for the "who to follow" suggestions.
+
+Finding friends of friends in the database joins Follow to itself twice,
+which gets slow as the graph grows. The index instead keeps, for each user,
+the ids of the users they follow and of their followers in sorted
+array('i') integer arrays, 4 bytes an edge, so a suggestion is a count over
+the arrays of the users someone follows.
+
+The index is built from Follow in one pass over the (owner, followed)
+index and then kept up to date by the Follow signals in models.py as each
+transaction commits. Each process has its own index, so it only sees
+follows made through other processes once it's built again: when it is
+settings.FOLLOW_GRAPH_MAX_AGE seconds old, it is rebuilt by a background
+thread, the old one answering meanwhile.
+"""
+import heapq
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from django.conf import settings
+from django.db import connections
+
+EMPTY = array('i')
+
+
+def insert(adjacency, key, value):
+    """
+    Adds value to the sorted array of key, unless it is there already
+    """
+    values = adjacency.get(key)
+    if values is None:
+        adjacency[key] = array('i', [value])
+        return True
+    index = bisect_left(values, value)
+    if index < len(values) and values[index] == value:
+        return False
+    values.insert(index, value)
+    return True
+
+
+def remove(adjacency, key, value):
+    """
+    Takes value out of the sorted array of key, if it is there
+    """
+    values = adjacency.get(key, EMPTY)
+    index = bisect_left(values, value)
+    if index == len(values) or values[index] != value:
+        return False
+    del values[index]
+    if not values:
+        del adjacency[key]
+    return True
+
+
+class FollowGraph:
+    """
+    The users each user follows and is followed by, as sorted arrays of ids
+    """
+    def __init__(self):
+        self.following = {}
+        self.followers = {}
+        self.edges = 0
+        self.built_at = time.monotonic()
+
+    @classmethod
+    def from_edges(cls, edges):
+        """
+        Builds the graph from (owner id, followed id) pairs sorted by
+        owner id then followed id, so every array is made in order
+        """
+        graph = cls()
+        following, followers = graph.following, graph.followers
+        for owner_id, followed_id in edges:
+            values = following.get(owner_id)
+            if values is None:
+                values = following[owner_id] = array('i')
+            values.append(followed_id)
+            values = followers.get(followed_id)
+            if values is None:
+                values = followers[followed_id] = array('i')
+            values.append(owner_id)
+            graph.edges += 1
+        graph.built_at = time.monotonic()
+        return graph
+
+    def add(self, owner_id, followed_id):
+        if insert(self.following, owner_id, followed_id):
+            insert(self.followers, followed_id, owner_id)
+            self.edges += 1
+
+    def remove(self, owner_id, followed_id):
+        if remove(self.following, owner_id, followed_id):
+            remove(self.followers, followed_id, owner_id)
+            self.edges -= 1
+
+    def followers_count(self, user_id):
+        return len(self.followers.get(user_id, EMPTY))
+
+    def suggestions(self, user_id, limit, exclude=()):
+        """
+        Returns up to limit (user id, mutual count) pairs of the users
+        followed by the most of the users user_id follows, who user_id
+        doesn't follow yet and who aren't in exclude.
+        Ties go to the users with the most followers.
+        """
+        following = self.following.get(user_id, EMPTY)
+        mutual = Counter()
+        for followed_id in following:
+            mutual.update(self.following.get(followed_id, EMPTY))
+        for followed_id in following:
+            mutual.pop(followed_id, None)
+        for excluded_id in exclude:
+            mutual.pop(excluded_id, None)
+        mutual.pop(user_id, None)
+        return heapq.nlargest(limit, mutual.items(), key=lambda item: (
+            item[1], self.followers_count(item[0]), -item[0]))
+
+    def nbytes(self):
+        """
+        Returns the bytes used by the arrays of ids
+        """
+        return sum(
+            values.buffer_info()[1] * values.itemsize
+            for adjacency in (self.following, self.followers)
+            for values in adjacency.values()
+        )
+
+
+class FollowGraphIndex:
+    """
+    Holds the process's FollowGraph, building it on first use from the
+    edges returned by load_edges and again in the background once it is
+    settings.FOLLOW_GRAPH_MAX_AGE seconds old. Follows and unfollows made
+    while it is being built are applied to the new graph afterwards.
+    """
+    def __init__(self, load_edges):
+        self.load_edges = load_edges
+        self.lock = threading.Lock()
+        self.build_lock = threading.Lock()
+        self.graph = None
+        # Updates made during a build, None when no build is running
+        self.pending = None
+
+    def get(self):
+        with self.lock:
+            graph = self.graph
+            max_age = settings.FOLLOW_GRAPH_MAX_AGE
+            stale = (
+                graph is not None and max_age is not None and self.pending is None
+                and time.monotonic() - graph.built_at >= max_age
+            )
+        if graph is None:
+            with self.build_lock:
+                if self.graph is None:
+                    self.build()
+            return self.graph
+        if stale and self.build_lock.acquire(blocking=False):
+            threading.Thread(
+                target=self.build_in_background, name='follow-graph', daemon=True
+            ).start()
+        return graph
+
+    def build(self):
+        """
+        Builds a new graph, with build_lock held
+        """
+        with self.lock:
+            self.pending = []
+        try:
+            graph = FollowGraph.from_edges(self.load_edges())
+        except Exception:
+            with self.lock:
+                self.pending = None
+            raise
+        with self.lock:
+            for method, owner_id, followed_id in self.pending:
+                getattr(graph, method)(owner_id, followed_id)
+            self.graph, self.pending = graph, None
+
+    def build_in_background(self):
+        try:
+            self.build()
+        finally:
+            self.build_lock.release()
+            connections.close_all()
+
+    def update(self, method, owner_id, followed_id):
+        with self.lock:
+            if self.pending is not None:
+                self.pending.append((method, owner_id, followed_id))
+            if self.graph is not None:
+                getattr(self.graph, method)(owner_id, followed_id)
+
+    def add(self, owner_id, followed_id):
+        self.update('add', owner_id, followed_id)
+
+    def remove(self, owner_id, followed_id):
+        self.update('remove', owner_id, followed_id)
+
+    def reset(self):
+        with self.lock:
+            self.graph = None
@@ -1,5 +1,9 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_save, post_delete
 from django.contrib.auth.models import User
+from drf_api import cache as response_cache
+from profiles.models import owner_profile_tags
+from .graph import FollowGraphIndex
 
 
 class Follow(models.Model):
@@ -13,6 +17,59 @@ class Follow(models.Model):
     class Meta:
         ordering = ['-created_at']
         unique_together = ['owner', 'followed']
+        indexes = [models.Index(fields=['-created_at', '-id'])]
     
     def __str__(self):
         return f"{self.owner} following {self.followed}"
+
+
+def invalidate_follow(sender, instance, created=True, **kwargs):
+    """
+    Called by post_save and post_delete after a follow is saved or deleted.
+    Drops the cached responses showing the follower and followed profiles'
+    counts, and the lists filtered by who follows who.
+    """
+    if created:
+        response_cache.invalidate(
+            'profiles', 'posts',
+            *owner_profile_tags(instance.owner_id, instance.followed_id)
+        )
+
+
+post_save.connect(invalidate_follow, sender=Follow)
+post_delete.connect(invalidate_follow, sender=Follow)
+
+
+def follow_edges():
+    """
+    Returns every (owner id, followed id) pair, read in the order of the
+    unique (owner, followed) index
+    """
+    return Follow.objects.order_by('owner_id', 'followed_id').values_list(
+        'owner_id', 'followed_id').iterator(chunk_size=10000)
+
+
+# The process's index of who follows who, see followers/graph.py
+follow_graph = FollowGraphIndex(follow_edges)
+
+
+def add_to_follow_graph(sender, instance, created, using, **kwargs):
+    """
+    Called by post_save after a follow is saved.
+    Adds a new follow to the follow graph once the transaction commits.
+    """
+    if created:
+        transaction.on_commit(
+            lambda: follow_graph.add(instance.owner_id, instance.followed_id), using=using)
+
+
+def remove_from_follow_graph(sender, instance, using, **kwargs):
+    """
+    Called by post_delete after a follow is deleted.
+    """
+    transaction.on_commit(
+        lambda: follow_graph.remove(instance.owner_id, instance.followed_id), using=using)
+
+
+post_save.connect(add_to_follow_graph, sender=Follow)
+post_delete.connect(remove_from_follow_graph, sender=Follow)
@@ -1,5 +1,7 @@
 from django.db import IntegrityError
 from rest_framework import serializers
+from drf_api.bulk import BULK_MAX_ITEMS
+from profiles.models import Profile
 from .models import Follow
 
 
@@ -19,4 +21,34 @@ class FollowSerializer(serializers.ModelSerializer):
         except IntegrityError:
             raise serializers.ValidationError({
                 'detail': 'possible duplicate'
-            })
\ No newline at end of file
+            })
+
+class BulkFollowSerializer(serializers.Serializer):
+    """
+    Serializer for the list of user ids sent to the bulk follow endpoint
+    """
+    followed = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False,
+        max_length=BULK_MAX_ITEMS
+    )
+
+
+class FollowSuggestionSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the profile of a user suggested to follow.
+    mutual_count is the number of users the logged in user follows who
+    follow them, from the 'mutual_counts' lookup in the view's context.
+    """
+    owner = serializers.ReadOnlyField(source='owner.username')
+    mutual_count = serializers.SerializerMethodField()
+    followers_count = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Profile
+        fields = ['id', 'owner', 'name', 'image', 'mutual_count', 'followers_count']
+
+    def get_mutual_count(self, obj):
+        return self.context['mutual_counts'][obj.owner_id]
+
+    def get_followers_count(self, obj):
+        return self.context['follow_graph'].followers_count(obj.owner_id)
@@ -1,3 +1,163 @@
-from django.test import TestCase
+import random
+from unittest import mock
+from django.contrib.auth.models import User
+from django.db.models import Count
+from rest_framework import status
+from rest_framework.test import APITestCase
+from feed.models import FeedItem
+from posts.models import Post
+from .models import Follow, follow_edges, follow_graph
 
-# Create your tests here.
+
+class FollowBulkViewTests(APITestCase):
+    """
+    Class to contain the tests associated with the FollowBulk view
+    """
+    def setUp(self):
+        self.adam = User.objects.create_user(username='adam', password='pass')
+        self.brian = User.objects.create_user(username='brian', password='pass')
+        self.carol = User.objects.create_user(username='carol', password='pass')
+
+    def test_logged_in_user_can_follow_and_unfollow_many_users(self):
+        """
+        The context: Adam already follows Brian, and Carol has a post
+        The when: Adam follows Brian, Carol and a user that doesn't exist,
+            then unfollows Brian and Carol
+        The then: An outcome per user for each request, and Carol's post
+            added to then removed from Adam's feed
+        """
+        post = Post.objects.create(owner=self.carol, title='a title')
+        Follow.objects.create(owner=self.adam, followed=self.brian)
+        self.client.login(username='adam', password='pass')
+        response = self.client.post(
+            '/followers/bulk/',
+            {'followed': [self.brian.id, self.carol.id, 999]},
+            format='json'
+        )
+        self.assertEqual(
+            [result['status'] for result in response.data['results']],
+            ['duplicate', 'created', 'not_found']
+        )
+        self.assertTrue(FeedItem.objects.filter(owner=self.adam, post=post).exists())
+
+        response = self.client.delete(
+            '/followers/bulk/',
+            {'followed': [self.brian.id, self.carol.id]},
+            format='json'
+        )
+        self.assertEqual(
+            [result['status'] for result in response.data['results']],
+            ['deleted', 'deleted']
+        )
+        self.assertFalse(Follow.objects.exists())
+        self.assertFalse(FeedItem.objects.exists())
+
+
+class FollowSuggestionTests(APITestCase):
+    """
+    Class to contain the tests for the follow graph and the suggestions view
+    """
+    def setUp(self):
+        follow_graph.reset()
+        self.users = {
+            name: User.objects.create_user(username=name, password='pass')
+            for name in ['adam', 'brian', 'carol', 'dave', 'emma', 'fred']
+        }
+        for owner, followed in [
+                ('adam', 'brian'), ('adam', 'carol'), ('brian', 'dave'),
+                ('brian', 'emma'), ('brian', 'adam'), ('carol', 'dave'),
+                ('fred', 'emma')]:
+            Follow.objects.create(owner=self.users[owner], followed=self.users[followed])
+        self.client.login(username='adam', password='pass')
+
+    def suggestions(self):
+        response = self.client.get('/followers/suggestions/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [
+            (profile['owner'], profile['mutual_count'], profile['followers_count'])
+            for profile in response.data['results']
+        ]
+
+    def test_friends_of_friends_ranked_by_mutual_follows(self):
+        """
+        Context: Adam follows Brian and Carol, who both follow Dave,
+            and Brian follows Emma and Adam
+        When: Adam gets his suggestions
+        Then: Dave comes before Emma, and Adam and the users he already
+            follows aren't suggested
+        """
+        self.assertEqual(self.suggestions(), [('dave', 2, 2), ('emma', 1, 2)])
+
+    def test_graph_follows_follows_and_unfollows(self):
+        """
+        Context: Adam's suggestions have been worked out once
+        When: He follows Dave, then unfollows him again
+        Then: Dave leaves and comes back to his suggestions
+        """
+        self.suggestions()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/followers/', {'followed': self.users['dave'].id})
+        self.assertEqual(self.suggestions(), [('emma', 1, 2)])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f"/followers/{response.data['id']}/")
+        self.assertEqual(self.suggestions(), [('dave', 2, 2), ('emma', 1, 2)])
+
+    def test_follows_missing_from_graph_not_suggested(self):
+        """
+        Context: Adam's suggestions have been worked out once
+        When: He follows Dave through another process, which this
+            process's graph doesn't have yet
+        Then: Dave is still left out of his suggestions
+        """
+        self.suggestions()
+        Follow.objects.create(owner=self.users['adam'], followed=self.users['dave'])
+        self.assertNotIn(self.users['dave'].id, follow_graph.get().following[self.users['adam'].id])
+        self.assertEqual(self.suggestions(), [('emma', 1, 2)])
+
+    def test_suggestions_match_database_self_join(self):
+        """
+        Context: A random graph of 40 users
+        When: The suggestions of every user are worked out from the graph
+        Then: The mutual counts are the same as counting friends of friends
+            with a self join of Follow
+        """
+        Follow.objects.all().delete()
+        rng = random.Random(0)
+        users = [User.objects.create_user(username=f'user{index}') for index in range(40)]
+        Follow.objects.bulk_create([
+            Follow(owner=owner, followed=followed)
+            for owner in users for followed in rng.sample(users, 6) if followed != owner
+        ])
+        follow_graph.reset()
+        graph = follow_graph.get()
+        for user in users:
+            following = Follow.objects.filter(owner=user).values('followed_id')
+            expected = dict(Follow.objects.filter(owner_id__in=following).exclude(
+                followed_id__in=following).exclude(followed=user).order_by().values(
+                'followed_id').annotate(mutual=Count('id')).values_list('followed_id', 'mutual'))
+            self.assertEqual(dict(graph.suggestions(user.id, len(users))), expected)
+
+    def test_updates_during_build_applied(self):
+        """
+        Context: A follow is made while the graph is being built
+        When: The build finishes
+        Then: The new graph has the follow
+        """
+        def load_edges():
+            follow_graph.add(self.users['adam'].id, self.users['fred'].id)
+            return follow_edges()
+
+        with mock.patch.object(follow_graph, 'load_edges', load_edges):
+            graph = follow_graph.get()
+        self.assertIn(self.users['fred'].id, graph.following[self.users['adam'].id])
+        self.assertIsNone(follow_graph.pending)
+
+    def test_logged_out_user_can_not_get_suggestions(self):
+        """
+        Context: No user is logged in
+        When: HTTP get request to the suggestions
+        Then: The request is refused
+        """
+        self.client.logout()
+        response = self.client.get('/followers/suggestions/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
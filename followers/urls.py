@@ -3,5 +3,7 @@ from followers import views
 
 urlpatterns = [
     path('followers/', views.FollowList.as_view()),
+    path('followers/bulk/', views.FollowBulk.as_view()),
+    path('followers/suggestions/', views.FollowSuggestions.as_view()),
     path('followers/<int:pk>/', views.FollowDetail.as_view()),
 ]
\ No newline at end of file
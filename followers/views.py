@@ -1,12 +1,22 @@
-from rest_framework import generics, permissions
+from django.contrib.auth.models import User
+from rest_framework import permissions
+from rest_framework.response import Response
+from drf_api import generics
+from drf_api.bulk import BulkRelationView
+from drf_api.pagination import CreatedAtCursorPagination
 from drf_api.permissions import IsOwnerOrReadOnly
-from .models import Follow
-from .serializers import FollowSerializer
+from drf_api.values import ValuesListMixin
+from profiles.models import Profile
+from .models import Follow, follow_graph
+from .serializers import (
+    BulkFollowSerializer, FollowSerializer, FollowSuggestionSerializer
+)
 
 
-class FollowList(generics.ListCreateAPIView):
+class FollowList(ValuesListMixin, generics.ListCreateAPIView):
     serializer_class = FollowSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = CreatedAtCursorPagination
     queryset = Follow.objects.all()
 
     def perform_create(self, serializer):
@@ -17,3 +27,59 @@ class FollowDetail(generics.RetrieveDestroyAPIView):
     permission_classes = [IsOwnerOrReadOnly]
     serializer_class = FollowSerializer
     queryset = Follow.objects.all()
+
+
+class FollowBulk(BulkRelationView):
+    """
+    Follows (POST) or unfollows (DELETE) a list of users,
+    e.g. {"followed": [1, 2, 3]}
+    """
+    serializer_class = BulkFollowSerializer
+    bulk_field = 'followed'
+    relation_model = Follow
+    relation_field = 'followed'
+    target_model = User
+
+
+class FollowSuggestions(generics.GenericAPIView):
+    """
+    View to return the profiles of users followed by the users the logged
+    in user follows, the most followed by them first. Up to ?limit=
+    profiles are returned, 10 by default.
+    Worked out from the in-memory follow graph, see followers/graph.py.
+    The graph may not have the follows made through other processes in the
+    last FOLLOW_GRAPH_MAX_AGE seconds, so the users the logged in user
+    follows are read from the database and left out.
+    """
+    serializer_class = FollowSuggestionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    default_limit = 10
+    max_limit = 50
+
+    def get_limit(self):
+        try:
+            limit = int(self.request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            return self.default_limit
+        return min(max(limit, 1), self.max_limit)
+
+    def get(self, request):
+        graph = follow_graph.get()
+        followed_ids = Follow.objects.filter(owner=request.user).values_list(
+            'followed_id', flat=True)
+        suggestions = graph.suggestions(
+            request.user.pk, self.get_limit(), exclude=set(followed_ids))
+        mutual_counts = dict(suggestions)
+        profiles = Profile.objects.select_related('owner').in_bulk(
+            list(mutual_counts), field_name='owner_id')
+        serializer = self.get_serializer(
+            # A user deleted since the graph was built has no profile
+            [profiles[user_id] for user_id, _ in suggestions if user_id in profiles],
+            many=True,
+            context={
+                **self.get_serializer_context(),
+                'mutual_counts': mutual_counts,
+                'follow_graph': graph,
+            },
+        )
+        return Response({'results': serializer.data})
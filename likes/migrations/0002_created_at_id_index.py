@@ -0,0 +1,17 @@
+# Generated by Django 3.2.23 on 2026-10-18 16:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('likes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(fields=['-created_at', '-id'], name='likes_like_created_ad359b_idx'),
+        ),
+    ]
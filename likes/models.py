@@ -1,6 +1,10 @@
+from django.conf import settings
 from django.db import models
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
 from django.contrib.auth.models import User
-from posts.models import Post
+from drf_api import cache as response_cache
+from posts.models import Post, TrendingEpoch
 
 
 class Like(models.Model):
@@ -18,7 +22,52 @@ class Like(models.Model):
         """
         ordering = ['-created_at']
         unique_together = ['owner', 'post']
+        indexes = [models.Index(fields=['-created_at', '-id'])]
 
     def __str__(self):
         return f"{self.owner}'s like on {self.post}"
-    
\ No newline at end of file
+
+
+def increase_likes_count(sender, instance, created, **kwargs):
+    """
+    Called by post_save after a like is saved.
+    Adds one to the post's stored likes_count when the like is new,
+    and the like's weight to its trending_score.
+    F() makes the database do the sum so that simultaneous likes aren't lost.
+    """
+    if created:
+        Post.objects.filter(pk=instance.post_id).update(
+            likes_count=F('likes_count') + 1,
+            trending_score=TrendingEpoch.score_change(
+                settings.TRENDING_LIKE_WEIGHT, instance.created_at),
+        )
+
+
+def decrease_likes_count(sender, instance, **kwargs):
+    """
+    Called by post_delete after a like is deleted.
+    Takes one off the post's stored likes_count and the like's weight,
+    as of when it was made, off its trending_score.
+    """
+    Post.objects.filter(pk=instance.post_id).update(
+        likes_count=F('likes_count') - 1,
+        trending_score=TrendingEpoch.score_change(
+            -settings.TRENDING_LIKE_WEIGHT, instance.created_at),
+    )
+
+
+post_save.connect(increase_likes_count, sender=Like)
+post_delete.connect(decrease_likes_count, sender=Like)
+
+
+def invalidate_liked_post(sender, instance, created=True, **kwargs):
+    """
+    Called by post_save and post_delete after a like is saved or deleted.
+    Drops the cached responses showing the post's likes_count.
+    """
+    if created:
+        response_cache.invalidate('posts', f'post:{instance.post_id}')
+
+
+post_save.connect(invalidate_liked_post, sender=Like)
+post_delete.connect(invalidate_liked_post, sender=Like)
@@ -1,5 +1,6 @@
 from django.db import IntegrityError
 from rest_framework import serializers
+from drf_api.bulk import BULK_MAX_ITEMS
 from .models import Like
 
 
@@ -23,4 +24,13 @@ class LikeSerializer(serializers.ModelSerializer):
         except IntegrityError:
             raise serializers.ValidationError({
                 'detail': 'possible duplicate'
-            })
\ No newline at end of file
+            })
+
+class BulkLikeSerializer(serializers.Serializer):
+    """
+    Serializer for the list of post ids sent to the bulk like endpoint
+    """
+    posts = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False,
+        max_length=BULK_MAX_ITEMS
+    )
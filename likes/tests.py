@@ -1,3 +1,78 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from posts.models import Post
+from rest_framework import status
+from rest_framework.test import APITestCase
+from .models import Like
 
-# Create your tests here.
+
+class LikeBulkViewTests(APITestCase):
+    """
+    Class to contain the tests associated with the LikeBulk view
+    """
+    def setUp(self):
+        self.adam = User.objects.create_user(username='adam', password='pass')
+        self.posts = [
+            Post.objects.create(owner=self.adam, title=f'post {number}')
+            for number in range(3)
+        ]
+
+    def test_logged_in_user_can_like_many_posts(self):
+        """
+        The context: Adam has already liked the first post
+        The when: Adam likes all three posts and one that doesn't exist
+        The then: An outcome per post, and likes_count kept up to date
+        """
+        first, second, third = self.posts
+        Like.objects.create(owner=self.adam, post=first)
+        self.client.login(username='adam', password='pass')
+        response = self.client.post(
+            '/likes/bulk/',
+            {'posts': [first.id, second.id, third.id, 999]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual(
+            [result['status'] for result in results],
+            ['duplicate', 'created', 'created', 'not_found']
+        )
+        self.assertEqual(
+            results[1]['id'], Like.objects.get(owner=self.adam, post=second).id
+        )
+        self.assertEqual(Like.objects.filter(owner=self.adam).count(), 3)
+        second.refresh_from_db()
+        self.assertEqual(second.likes_count, 1)
+
+    def test_logged_in_user_can_unlike_many_posts(self):
+        """
+        The context: Adam has liked the first two posts
+        The when: Adam unlikes all three posts
+        The then: The two likes are deleted and the counters go back to 0
+        """
+        first, second, third = self.posts
+        Like.objects.create(owner=self.adam, post=first)
+        Like.objects.create(owner=self.adam, post=second)
+        self.client.login(username='adam', password='pass')
+        response = self.client.delete(
+            '/likes/bulk/', {'posts': [first.id, second.id, third.id]}, format='json'
+        )
+        self.assertEqual(
+            [result['status'] for result in response.data['results']],
+            ['deleted', 'deleted', 'not_found']
+        )
+        self.assertFalse(Like.objects.exists())
+        first.refresh_from_db()
+        self.assertEqual(first.likes_count, 0)
+
+    def test_too_many_posts_are_rejected(self):
+        self.client.login(username='adam', password='pass')
+        response = self.client.post(
+            '/likes/bulk/', {'posts': list(range(1, 102))}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_logged_out_user_can_not_bulk_like(self):
+        response = self.client.post(
+            '/likes/bulk/', {'posts': [self.posts[0].id]}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
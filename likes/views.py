@@ -1,12 +1,18 @@
-from rest_framework import generics, permissions
+from rest_framework import permissions
+from drf_api import generics
+from drf_api.bulk import BulkRelationView
+from drf_api.pagination import CreatedAtCursorPagination
 from drf_api.permissions import IsOwnerOrReadOnly
+from drf_api.values import ValuesListMixin
+from posts.models import Post
 from .models import Like
-from .serializers import LikeSerializer
+from .serializers import LikeSerializer, BulkLikeSerializer
 
 
-class LikeList(generics.ListCreateAPIView):
+class LikeList(ValuesListMixin, generics.ListCreateAPIView):
     serializer_class = LikeSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = CreatedAtCursorPagination
     queryset = Like.objects.all()
 
     def perform_create(self, serializer):
@@ -17,3 +23,15 @@ class LikeDetail(generics.RetrieveDestroyAPIView):
     permission_classes = [IsOwnerOrReadOnly]
     serializer_class = LikeSerializer
     queryset = Like.objects.all()
+
+
+class LikeBulk(BulkRelationView):
+    """
+    Likes (POST) or unlikes (DELETE) a list of posts,
+    e.g. {"posts": [1, 2, 3]}
+    """
+    serializer_class = BulkLikeSerializer
+    bulk_field = 'posts'
+    relation_model = Like
+    relation_field = 'post'
+    target_model = Post
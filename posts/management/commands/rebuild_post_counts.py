@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from comments.models import Comment
+from drf_api.aggregates import related_count
+from likes.models import Like
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    """
+    Recounts comments_count and likes_count for every post from the
+    Comment and Like tables, fixing any counters that have drifted.
+    Run with: python manage.py rebuild_post_counts
+    """
+    help = 'Rebuilds the stored comments_count and likes_count on every post'
+
+    def handle(self, *args, **options):
+        updated = Post.objects.update(
+            comments_count=related_count(Comment, 'post'),
+            likes_count=related_count(Like, 'post'),
+        )
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt counts for {updated} posts'))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from posts import search
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    """
+    Empties the full-text search index and adds every post to it again.
+    Needed after posts are loaded with bulk_create, which skips the signals.
+    Run with: python manage.py rebuild_search_index
+    """
+    help = 'Rebuilds the full-text search index of posts'
+
+    def handle(self, *args, **options):
+        backend = search.get_backend(connection)
+        if backend is None:
+            self.stdout.write(f'No search index is used on {connection.vendor}')
+            return
+        with transaction.atomic():
+            backend.drop_index()
+            backend.create_index()
+            search.index_posts(Post.objects.all())
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {Post.objects.count()} posts'))
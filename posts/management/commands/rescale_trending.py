@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from posts import trending
+
+
+class Command(BaseCommand):
+    """
+    Moves the trending epoch to now, scaling every post's trending_score
+    to match so the stored scores stay small. Meant to run every day or so.
+    --rebuild works out every score again from the posts, likes and
+    comments instead, fixing any scores that have drifted.
+    Run with: python manage.py rescale_trending
+    """
+    help = 'Rescales the stored trending scores of posts to a new epoch'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Work out every score again from the posts, likes and comments',
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            updated = trending.rebuild()
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt trending scores for {updated} posts'))
+        else:
+            updated, factor = trending.rescale()
+            self.stdout.write(self.style.SUCCESS(
+                f'Rescaled trending scores for {updated} posts by {factor:.6g}'))
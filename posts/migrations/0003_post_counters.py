@@ -0,0 +1,40 @@
+# Generated by Django 3.2.23 on 2026-10-18 16:49
+
+from django.db import migrations, models
+from drf_api.aggregates import related_count
+
+
+def count_existing(apps, schema_editor):
+    """
+    Fills in the new counter columns for posts that already exist
+    """
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('comments', 'Comment')
+    Like = apps.get_model('likes', 'Like')
+    Post.objects.update(
+        comments_count=related_count(Comment, 'post'),
+        likes_count=related_count(Like, 'post'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0002_post_image_filter'),
+        ('comments', '0001_initial'),
+        ('likes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.IntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='likes_count',
+            field=models.IntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(count_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.23 on 2026-10-18 16:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0003_post_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-created_at', '-id'], name='posts_post_created_a7e5d4_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations
+from posts import search
+
+
+def create_search_index(apps, schema_editor):
+    """
+    Creates the full-text index table and adds the existing posts to it
+    """
+    backend = search.get_backend(schema_editor.connection)
+    if backend is None:
+        return
+    backend.create_index()
+    Post = apps.get_model('posts', 'Post')
+    backend.index_posts(
+        Post.objects.values_list('id', 'title', 'content', 'owner__username').iterator()
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    backend = search.get_backend(schema_editor.connection)
+    if backend is not None:
+        backend.drop_index()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0004_created_at_id_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
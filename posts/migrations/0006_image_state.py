@@ -0,0 +1,23 @@
+# Generated by Django 3.2.23 on 2026-10-18 17:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_post_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_state',
+            field=models.CharField(choices=[('ready', 'Ready'), ('pending', 'Pending'), ('failed', 'Failed')], default='ready', max_length=8),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_upload',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
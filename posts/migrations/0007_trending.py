@@ -0,0 +1,63 @@
+# Generated by Django 3.2.23 on 2026-10-18 17:49
+
+from collections import defaultdict
+from django.db import migrations, models
+from django.utils import timezone
+
+# The trending settings when this migration was written, so it gives the
+# same scores whatever they are changed to later
+HALF_LIFE = 60 * 60 * 12
+POST_WEIGHT = 1
+LIKE_WEIGHT = 1
+COMMENT_WEIGHT = 2
+
+
+def score_existing(apps, schema_editor):
+    """
+    Starts the trending epoch and works out the score of existing posts
+    """
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('comments', 'Comment')
+    Like = apps.get_model('likes', 'Like')
+    TrendingEpoch = apps.get_model('posts', 'TrendingEpoch')
+    epoch = TrendingEpoch.objects.create(pk=1, started_at=timezone.now()).started_at
+    scores = defaultdict(float)
+    for queryset, weight in [
+            (Post.objects.values_list('id', 'created_at'), POST_WEIGHT),
+            (Like.objects.values_list('post_id', 'created_at'), LIKE_WEIGHT),
+            (Comment.objects.values_list('post_id', 'created_at'), COMMENT_WEIGHT)]:
+        for post_id, at in queryset.order_by().iterator():
+            # Every event is before the epoch, so this can't overflow
+            scores[post_id] += weight * 2 ** ((at - epoch).total_seconds() / HALF_LIFE)
+    Post.objects.bulk_update([
+        Post(pk=pk, trending_score=score) for pk, score in scores.items()
+    ], ['trending_score'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_image_state'),
+        ('comments', '0002_created_at_id_index'),
+        ('likes', '0002_created_at_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingEpoch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='trending_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-trending_score', '-id'], name='posts_post_trendin_7eedfa_idx'),
+        ),
+        migrations.RunPython(score_existing, migrations.RunPython.noop),
+    ]
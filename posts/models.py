@@ -1,5 +1,14 @@
+from django.conf import settings
 from django.db import models
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
 from django.contrib.auth.models import User
+from django.utils import timezone
+from drf_api import cache as response_cache
+from drf_api.media import IMAGE_READY, IMAGE_STATES
+from drf_api.storage import forget_image_url
+from profiles.models import owner_profile_tags
+from . import search
 
 
 class Post(models.Model):
@@ -26,12 +35,161 @@ class Post(models.Model):
     image = models.ImageField(
         upload_to='images/', default='../default_post_icuydr', blank=True
     )
+    # A new image is uploaded in the background, see drf_api/media.py.
+    # image_upload is the staged file of the upload in progress.
+    image_state = models.CharField(max_length=8, choices=IMAGE_STATES, default=IMAGE_READY)
+    image_upload = models.CharField(max_length=255, blank=True)
     image_filter = models.CharField(
         max_length=32, choices=image_filter_choices, default='normal'
     )
+    # The counts below are kept up to date by the Comment and Like signals
+    # so that lists don't need to count the related rows on every request.
+    # They can be rebuilt with the rebuild_post_counts management command.
+    comments_count = models.IntegerField(default=0, db_index=True)
+    likes_count = models.IntegerField(default=0, db_index=True)
+    # Time-decayed popularity, kept up to date by the Post, Like and Comment
+    # signals, see posts/trending.py
+    trending_score = models.FloatField(default=0)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id']),
+            models.Index(fields=['-trending_score', '-id']),
+        ]
+
+    # Only ever changed with update() and F(), see save()
+    counter_fields = ['comments_count', 'likes_count', 'trending_score']
 
     def __str__(self):
-        return f'{self.id} {self.title}'
\ No newline at end of file
+        return f'{self.id} {self.title}'
+
+    def save(self, *args, **kwargs):
+        """
+        Saving an existing post leaves out the counter fields, so the counts
+        read before a concurrent like or comment aren't written back over it
+        """
+        if (not self._state.adding and not args
+                and kwargs.get('update_fields') is None and not kwargs.get('force_insert')):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+# Largest power of two an event's weight is multiplied by. 2 ** 1024 is too
+# big for a float and this leaves room for adding up many events. It is
+# only reached if the epoch isn't moved on for 900 half lives.
+MAX_TRENDING_EXPONENT = 900
+
+
+def trending_weight(weight, at, epoch):
+    """
+    Returns the weight of an event which happened at the given time,
+    measured from the epoch, see posts/trending.py
+    """
+    exponent = (at - epoch).total_seconds() / settings.TRENDING_HALF_LIFE
+    return weight * 2.0 ** min(exponent, MAX_TRENDING_EXPONENT)
+
+
+class TrendingEpoch(models.Model):
+    """
+    The time trending scores are measured from, see posts/trending.py.
+    There is only one row, moved forward by the rescale_trending command.
+    """
+    started_at = models.DateTimeField()
+
+    @classmethod
+    def current(cls):
+        """
+        Returns the epoch's start. It is read from the database each time,
+        a lookup of the one row by primary key, so every process sees the
+        epoch as soon as rescale_trending moves it.
+        """
+        started_at = cls.objects.filter(pk=1).values_list('started_at', flat=True).first()
+        if started_at is None:
+            started_at = cls.objects.get_or_create(
+                pk=1, defaults={'started_at': timezone.now()})[0].started_at
+        return started_at
+
+    @classmethod
+    def score_change(cls, weight, at):
+        """
+        Returns the expression adding an event of the given weight,
+        which happened at the given time, to a post's trending_score
+        """
+        return F('trending_score') + trending_weight(weight, at, cls.current())
+
+def update_search_index(sender, instance, using, **kwargs):
+    """
+    Called by post_save after a post is saved.
+    Adds the post to the full-text search index or refreshes its entry.
+    """
+    search.index_posts(Post.objects.using(using).filter(pk=instance.pk))
+
+
+def remove_from_search_index(sender, instance, using, **kwargs):
+    """
+    Called by post_delete after a post is deleted.
+    """
+    search.remove_posts([instance.pk], using=using)
+
+
+def update_owner_in_search_index(sender, instance, created, using, update_fields=None, **kwargs):
+    """
+    Called by post_save after a user is saved.
+    Updates the username stored with their posts in the search index if it changed.
+    Saves that only touch other fields, such as last_login, are skipped.
+    """
+    if created or (update_fields is not None and 'username' not in update_fields):
+        return
+    search.rename_owner(instance.pk, instance.username, using=using)
+
+
+post_save.connect(update_search_index, sender=Post)
+post_delete.connect(remove_from_search_index, sender=Post)
+post_save.connect(update_owner_in_search_index, sender=User)
+
+
+def invalidate_saved_post(sender, instance, created, **kwargs):
+    """
+    Called by post_save after a post is saved.
+    Drops the cached responses showing the post, and the posts lists,
+    which an edited post may now be in, e.g. for a ?search=.
+    A new post also changes its owner's posts_count.
+    """
+    tags = [f'post:{instance.pk}', 'posts']
+    if created:
+        tags += ['profiles'] + owner_profile_tags(instance.owner_id)
+    response_cache.invalidate(*tags)
+
+
+def invalidate_deleted_post(sender, instance, **kwargs):
+    """
+    Called by post_delete after a post is deleted.
+    """
+    response_cache.invalidate(
+        f'post:{instance.pk}', 'posts', 'profiles',
+        *owner_profile_tags(instance.owner_id)
+    )
+
+
+post_save.connect(invalidate_saved_post, sender=Post)
+post_delete.connect(invalidate_deleted_post, sender=Post)
+post_save.connect(forget_image_url, sender=Post)
+post_delete.connect(forget_image_url, sender=Post)
+
+
+def add_to_trending(sender, instance, created, **kwargs):
+    """
+    Called by post_save after a post is saved.
+    Gives a new post its own weight in trending_score, so new posts
+    rank above old ones nobody has liked or commented on lately.
+    """
+    if created:
+        Post.objects.filter(pk=instance.pk).update(trending_score=TrendingEpoch.score_change(
+            settings.TRENDING_POST_WEIGHT, instance.created_at))
+
+
+post_save.connect(add_to_trending, sender=Post)
@@ -0,0 +1,221 @@
+"""
+Full-text search index for posts.
+
+Each post's title, content and owner username are copied into an index table,
+kept up to date by the signals in posts/models.py:
+- SQLite uses an FTS5 virtual table ranked with bm25()
+- PostgreSQL uses a tsvector column with a GIN index ranked with ts_rank()
+Other databases have no index, and PostSearchFilter falls back to the
+LIKE '%term%' lookups of DRF's SearchFilter.
+"""
+import re
+from django.conf import settings
+from django.db import connections
+from django.db.models import Case, IntegerField, When
+from rest_framework import filters
+from rest_framework.settings import api_settings
+
+SEARCH_TABLE = 'posts_post_fts'
+
+
+class SQLiteSearchBackend:
+    """
+    Search index stored in an FTS5 virtual table, where rowid is the post id
+    """
+    def __init__(self, connection):
+        self.connection = connection
+
+    def create_index(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} '
+                "USING fts5(title, content, username, tokenize='unicode61')"
+            )
+
+    def drop_index(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+    def index_posts(self, rows):
+        """
+        Adds or replaces the given (id, title, content, username) rows
+        """
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT OR REPLACE INTO {SEARCH_TABLE} '
+                '(rowid, title, content, username) VALUES (%s, %s, %s, %s)',
+                list(rows)
+            )
+
+    def remove_posts(self, ids):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [(pk,) for pk in ids]
+            )
+
+    def rename_owner(self, owner_id, username):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {SEARCH_TABLE} SET username = %s '
+                'WHERE rowid IN (SELECT id FROM posts_post WHERE owner_id = %s) '
+                'AND username != %s',
+                [username, owner_id, username]
+            )
+
+    def search(self, terms, limit):
+        """
+        Returns the ids of posts matching every term, best match first.
+        Each term is quoted so its characters can't be read as FTS5 syntax,
+        and matches the start of words, e.g. 'sun' finds 'sunset'.
+        Title matches count most, then username, then content.
+        """
+        query = ' '.join('"%s"*' % term.replace('"', '""') for term in terms)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s '
+                f'ORDER BY bm25({SEARCH_TABLE}, 10.0, 1.0, 5.0) LIMIT %s',
+                [query, limit]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PostgreSQLSearchBackend:
+    """
+    Search index stored as a weighted tsvector per post with a GIN index.
+    The 'simple' configuration is used so that usernames and words in any
+    language are indexed as written, without stemming.
+    """
+    document = (
+        "setweight(to_tsvector('simple', %s), 'A') || "
+        "setweight(to_tsvector('simple', %s), 'B') || "
+        "setweight(to_tsvector('simple', %s), 'C')"
+    )
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def create_index(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ('
+                'post_id bigint PRIMARY KEY REFERENCES posts_post (id) ON DELETE CASCADE, '
+                'username varchar(150) NOT NULL, '
+                'document tsvector NOT NULL)'
+            )
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {SEARCH_TABLE}_document '
+                f'ON {SEARCH_TABLE} USING GIN (document)'
+            )
+
+    def drop_index(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+    def index_posts(self, rows):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {SEARCH_TABLE} (post_id, username, document) '
+                f'VALUES (%s, %s, {self.document}) '
+                'ON CONFLICT (post_id) DO UPDATE SET '
+                'username = EXCLUDED.username, document = EXCLUDED.document',
+                [(pk, username, title, username, content)
+                 for pk, title, content, username in rows]
+            )
+
+    def remove_posts(self, ids):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {SEARCH_TABLE} WHERE post_id = ANY(%s)', [list(ids)]
+            )
+
+    def rename_owner(self, owner_id, username):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {SEARCH_TABLE} AS search SET username = %s, document = '
+                + self.document % ('post.title', '%s', 'post.content') +
+                ' FROM posts_post AS post WHERE search.post_id = post.id '
+                'AND post.owner_id = %s AND search.username <> %s',
+                [username, username, owner_id, username]
+            )
+
+    def search(self, terms, limit):
+        """
+        Returns the ids of posts matching every term, best match first.
+        Only the word characters of each term are used, each matching
+        the start of words, e.g. 'sun' finds 'sunset'.
+        """
+        words = [word for term in terms for word in re.findall(r'\w+', term)]
+        if not words:
+            return []
+        query = ' & '.join(f'{word}:*' for word in words)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT post_id FROM {SEARCH_TABLE}, '
+                "to_tsquery('simple', %s) AS query WHERE document @@ query "
+                'ORDER BY ts_rank(document, query) DESC LIMIT %s',
+                [query, limit]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+SEARCH_BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgreSQLSearchBackend,
+}
+
+
+def get_backend(connection):
+    """
+    Returns the search backend for the given database connection,
+    or None if the database isn't supported.
+    """
+    backend = SEARCH_BACKENDS.get(connection.vendor)
+    return backend(connection) if backend else None
+
+
+def index_posts(queryset):
+    """
+    Adds or updates the index rows for every post in the queryset
+    """
+    backend = get_backend(connections[queryset.db])
+    if backend:
+        backend.index_posts(
+            queryset.values_list('id', 'title', 'content', 'owner__username').iterator()
+        )
+
+
+def remove_posts(ids, using='default'):
+    backend = get_backend(connections[using])
+    if backend:
+        backend.remove_posts(ids)
+
+
+def rename_owner(owner_id, username, using='default'):
+    backend = get_backend(connections[using])
+    if backend:
+        backend.rename_owner(owner_id, username)
+
+
+class PostSearchFilter(filters.SearchFilter):
+    """
+    Search filter that looks the ?search= terms up in the full-text index
+    and returns the matching posts best match first, unless the request
+    also asks for an ?ordering=. At most settings.POST_SEARCH_MAX_RESULTS
+    posts are returned. Falls back to SearchFilter's search_fields lookups
+    on databases without an index.
+    """
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        backend = get_backend(connections[queryset.db])
+        if not terms or backend is None:
+            return super().filter_queryset(request, queryset, view)
+
+        ids = backend.search(terms, settings.POST_SEARCH_MAX_RESULTS)
+        queryset = queryset.filter(pk__in=ids)
+        if not ids or api_settings.ORDERING_PARAM in request.query_params:
+            return queryset
+        rank = Case(
+            *[When(pk=pk, then=position) for position, pk in enumerate(ids)],
+            output_field=IntegerField(),
+        )
+        return queryset.annotate(search_rank=rank).order_by('search_rank')
@@ -1,8 +1,10 @@
 from rest_framework import serializers
 from .models import Post
 from likes.models import Like
+from drf_api.images import PROBED_IMAGE_FIELD_MAPPING, validate_image_upload
+from drf_api.media import StagedImageSerializerMixin
 
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(StagedImageSerializerMixin, serializers.ModelSerializer):
     owner = serializers.ReadOnlyField(source='owner.username')
     is_owner = serializers.SerializerMethodField()
     profile_id = serializers.ReadOnlyField(source='owner.profile.id')
@@ -10,41 +12,37 @@ class PostSerializer(serializers.ModelSerializer):
     like_id = serializers.SerializerMethodField()
     comments_count = serializers.ReadOnlyField()
     likes_count = serializers.ReadOnlyField()
+    # Uploaded images are checked from their header only
+    serializer_field_mapping = PROBED_IMAGE_FIELD_MAPPING
 
     def validate_image(self, value):
         """
         A custom validation method for the image field 
         where value is the value saved in the image field.
-        Size is saved in bytes with the below calculation representing 2mbs
+        Size, width and height limits are checked by validate_image_upload
+        using only the image's header, see drf_api/images.py
         """
-        if value.size > 1024 * 1024 * 2:
-            raise serializers.ValidationError(
-                'Image size larger than 2MB!'
-            )
-        if value.image.width > 4096:
-            raise serializers.ValidationError(
-                'Image width larger tahn 4096px'
-            )
-        if value.image.height > 4096:
-            raise serializers.ValidationError(
-                'Image height larger tahn 4096px'
-            )
-        return value
-
+        return validate_image_upload(value)
 
     def get_is_owner(self, obj):
         request = self.context['request']
-        return request.user == obj.owner
+        return request.user.pk == obj.owner_id
     
     def get_like_id(self, obj):
         """
         A custom method to determine the like_id value
         It checks if the logged in user is the owner of a like object where
         the post is this post. If so like_id is given the id of this like object.
+        Uses the 'like_ids' lookup from the view's context when it has been provided.
         """
         user = self.context['request'].user
         if user.is_authenticated:
-            liked = Like.objects.filter(owner=user, post=obj). first()
+            like_ids = self.context.get('like_ids')
+            if like_ids is not None:
+                # Likes for the whole page were fetched in one query by the view
+                return like_ids.get(obj.id)
+            # Only model instances get here, the values() rows always come with like_ids
+            liked = Like.objects.filter(owner=user, post_id=obj.id).first()
             return liked.id if liked else None
         return None
 
@@ -52,6 +50,8 @@ class PostSerializer(serializers.ModelSerializer):
         model = Post
         fields = [
             'owner', 'created_at', 'updated_at', 'title', 'content', 
-            'image', 'is_owner', 'profile_id', 'profile_image', 'image_filter',
+            'image', 'image_state', 'is_owner', 'profile_id', 'profile_image', 'image_filter',
             'like_id', 'comments_count', 'likes_count', 'id'
-        ]
\ No newline at end of file
+        ]
+        # image_state is 'pending' while a new image uploads in the background
+        read_only_fields = ['image_state']
\ No newline at end of file
@@ -1,7 +1,31 @@
+import datetime
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+from django.conf import settings
 from django.contrib.auth.models import User
-from .models import Post
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import caches
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from PIL import Image
+from drf_api import cache as response_cache
+from drf_api.media import LocalRemoteStorage
+from . import trending
+from .models import MAX_TRENDING_EXPONENT, Post, TrendingEpoch
+from .serializers import PostSerializer
+from .views import PostDetail
+from comments.models import Comment
+from likes.models import Like
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.test import APIRequestFactory, APITestCase
 
 
 class PostListViewTests(APITestCase):
@@ -140,4 +164,766 @@ class PostDetailViewTests(APITestCase):
         count = Post.objects.count()
         self.assertEqual(count, 2)
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
-    
\ No newline at end of file
+    
+
+class PostLikeIdQueryTests(APITestCase):
+    """
+    Class to contain the tests checking like_id is resolved without
+    one query per post
+    """
+    def setUp(self):
+        self.adam = User.objects.create_user(username='adam', password='pass')
+
+    def create_liked_posts(self, number):
+        """
+        Creates the given number of posts, each one liked by adam
+        """
+        for index in range(number):
+            post = Post.objects.create(owner=self.adam, title=f'title {index}')
+            Like.objects.create(owner=self.adam, post=post)
+
+    def count_list_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/posts/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries)
+
+    def test_post_list_query_count_does_not_grow_with_page_size(self):
+        """
+        Context: Adam logged in, first with 2 liked posts then with 12
+        When: HTTP get request to list the posts
+        Then: The same number of queries is run for both page sizes
+        """
+        self.client.login(username='adam', password='pass')
+        self.create_liked_posts(2)
+        small_page = self.count_list_queries()
+        self.create_liked_posts(10)
+        large_page = self.count_list_queries()
+        self.assertEqual(small_page, large_page)
+
+    def test_post_list_returns_like_ids(self):
+        """
+        Context: Adam logged in and has liked one of two posts
+        When: HTTP get request to list the posts
+        Then: Only the liked post has the id of adams like as like_id
+        """
+        liked = Post.objects.create(owner=self.adam, title='liked')
+        Post.objects.create(owner=self.adam, title='not liked')
+        like = Like.objects.create(owner=self.adam, post=liked)
+        self.client.login(username='adam', password='pass')
+        response = self.client.get('/posts/')
+        like_ids = {
+            post['title']: post['like_id'] for post in response.data['results']
+        }
+        self.assertEqual(like_ids, {'liked': like.id, 'not liked': None})
+
+    def test_post_detail_returns_like_id(self):
+        """
+        Context: Adam logged in and has liked his post
+        When: HTTP get request to retrieve the post
+        Then: like_id is the id of adams like
+        """
+        post = Post.objects.create(owner=self.adam, title='liked')
+        like = Like.objects.create(owner=self.adam, post=post)
+        self.client.login(username='adam', password='pass')
+        response = self.client.get(f'/posts/{post.id}/')
+        self.assertEqual(response.data['like_id'], like.id)
+
+
+class PostCounterTests(APITestCase):
+    """
+    Class to contain the tests for the stored comments_count and likes_count
+    """
+    def setUp(self):
+        self.adam = User.objects.create_user(username='adam', password='pass')
+        self.post = Post.objects.create(owner=self.adam, title='a title')
+
+    def test_counts_follow_comments_and_likes(self):
+        """
+        Context: Adam comments on and likes his post, then removes both
+        When: The post is reloaded after each change
+        Then: The stored counts go up and back down again
+        """
+        comment = Comment.objects.create(
+            owner=self.adam, post=self.post, content='a comment')
+        like = Like.objects.create(owner=self.adam, post=self.post)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        self.assertEqual(self.post.likes_count, 1)
+        comment.delete()
+        like.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+        self.assertEqual(self.post.likes_count, 0)
+
+    def test_post_list_returns_stored_counts(self):
+        """
+        Context: Adams post has one comment and one like
+        When: HTTP get request to list the posts
+        Then: The counts are returned with the post
+        """
+        Comment.objects.create(owner=self.adam, post=self.post, content='a comment')
+        Like.objects.create(owner=self.adam, post=self.post)
+        response = self.client.get('/posts/')
+        post = response.data['results'][0]
+        self.assertEqual(post['comments_count'], 1)
+        self.assertEqual(post['likes_count'], 1)
+
+    def test_edit_keeps_counts_of_concurrent_likes(self):
+        """
+        Context: Adam gets his post, then Brian likes it, once before Adam's
+            edit is sent and once while the edit is being saved
+        When: Adam's edit is saved
+        Then: Both likes are still counted
+        """
+        brian = User.objects.create_user(username='brian', password='pass')
+        carol = User.objects.create_user(username='carol', password='pass')
+        self.client.login(username='adam', password='pass')
+        self.client.get(f'/posts/{self.post.id}/')
+        Like.objects.create(owner=brian, post=self.post)
+        update = PostSerializer.update
+
+        def like_then_update(serializer, instance, validated_data):
+            Like.objects.create(owner=carol, post=instance)
+            return update(serializer, instance, validated_data)
+
+        with mock.patch.object(PostSerializer, 'update', like_then_update):
+            response = self.client.put(f'/posts/{self.post.id}/', {'title': 'a new title'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.title, 'a new title')
+        self.assertEqual(self.post.likes_count, 2)
+
+    def test_rebuild_post_counts_fixes_drifted_counts(self):
+        """
+        Context: Adams post has one like but its stored counts are wrong
+        When: The rebuild_post_counts command is run
+        Then: The counts match the comments and likes in the DB again
+        """
+        Like.objects.create(owner=self.adam, post=self.post)
+        Post.objects.filter(pk=self.post.pk).update(comments_count=5, likes_count=0)
+        call_command('rebuild_post_counts', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+        self.assertEqual(self.post.likes_count, 1)
+
+
+class PostCursorPaginationTests(APITestCase):
+    """
+    Class to contain the tests for the opt in cursor pagination of the PostList view
+    """
+    def setUp(self):
+        adam = User.objects.create_user(username='adam', password='pass')
+        Post.objects.bulk_create(
+            [Post(owner=adam, title=f'title {index}') for index in range(35)]
+        )
+        # Give every post the same created_at so the pages rely on the id to break ties
+        Post.objects.update(created_at=timezone.now())
+
+    def test_cursor_pages_cover_every_post_once(self):
+        """
+        Context: 35 posts all created at the same time
+        When: HTTP get requests following the next links from /posts/?cursor=
+        Then: Two pages are returned with every post once, newest id first, and no count
+        """
+        response = self.client.get('/posts/?cursor=')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', response.data)
+        first_page = [post['id'] for post in response.data['results']]
+        self.assertEqual(len(first_page), 30)
+        response = self.client.get(response.data['next'])
+        second_page = [post['id'] for post in response.data['results']]
+        self.assertIsNone(response.data['next'])
+        all_ids = first_page + second_page
+        self.assertEqual(
+            all_ids, list(Post.objects.order_by('-id').values_list('id', flat=True)))
+
+    def test_page_numbers_still_used_without_cursor(self):
+        """
+        Context: 35 posts
+        When: HTTP get request to list the posts without a cursor
+        Then: The page number response with the total count is returned
+        """
+        response = self.client.get('/posts/')
+        self.assertEqual(response.data['count'], 35)
+        self.assertIn('page=2', response.data['next'])
+
+    def test_invalid_cursor_handled(self):
+        """
+        Context: As set-up
+        When: HTTP get request with a cursor that can't be decoded
+        Then: response status code 404
+        """
+        response = self.client.get('/posts/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class PostSearchTests(APITestCase):
+    """
+    Class to contain the tests for searching posts through the full-text index
+    """
+    def setUp(self):
+        self.adam = User.objects.create_user(username='adam', password='pass')
+        james = User.objects.create_user(username='james', password='pass')
+        Post.objects.create(owner=self.adam, title='Sunset at the beach')
+        Post.objects.create(
+            owner=james, title='Mountains', content='A sunset over the mountains')
+        Post.objects.create(owner=james, title='City lights')
+
+    def search_titles(self, terms):
+        response = self.client.get('/posts/', {'search': terms})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [post['title'] for post in response.data['results']]
+
+    def test_search_ranks_title_matches_first(self):
+        """
+        Context: 'sunset' is in one post title and another posts content
+        When: HTTP get request searching for sunset
+        Then: Both posts are returned with the title match first
+        """
+        self.assertEqual(
+            self.search_titles('sunset'), ['Sunset at the beach', 'Mountains'])
+
+    def test_search_matches_word_prefixes_and_usernames(self):
+        """
+        Context: As set-up
+        When: HTTP get requests searching for 'mount' and for 'james city'
+        Then: The posts containing those words are returned
+        """
+        self.assertEqual(self.search_titles('mount'), ['Mountains'])
+        self.assertEqual(self.search_titles('james city'), ['City lights'])
+
+    def test_search_index_follows_updates_and_deletes(self):
+        """
+        Context: Adam renames his post, then it is deleted
+        When: HTTP get requests searching for the old and new titles
+        Then: Only the current title is found and nothing once deleted
+        """
+        post = Post.objects.get(title='Sunset at the beach')
+        post.title = 'Sunrise'
+        post.save()
+        self.assertEqual(self.search_titles('beach'), [])
+        self.assertEqual(self.search_titles('sunrise'), ['Sunrise'])
+        post.delete()
+        self.assertEqual(self.search_titles('sunrise'), [])
+
+    def test_search_index_follows_username_changes(self):
+        """
+        Context: Adam changes his username
+        When: HTTP get request searching for the new username
+        Then: Adams post is found
+        """
+        self.adam.username = 'adamsmith'
+        self.adam.save()
+        self.assertEqual(self.search_titles('adamsmith'), ['Sunset at the beach'])
+
+    def test_search_terms_are_not_read_as_query_syntax(self):
+        """
+        Context: As set-up
+        When: HTTP get request searching with FTS operators and quotes
+        Then: The request doesn't error
+        """
+        self.assertEqual(self.search_titles('"sunset" OR NEAR('), [])
+
+
+class PostResponseCacheTests(APITestCase):
+    """
+    Class to contain the tests for the logged out response cache on the posts views
+    """
+    def setUp(self):
+        caches[settings.RESPONSE_CACHE_ALIAS].clear()
+        self.adam = User.objects.create_user(username='adam', password='pass')
+        self.post = Post.objects.create(owner=self.adam, title='a title')
+
+    def test_repeated_logged_out_request_served_from_cache(self):
+        """
+        Context: No logged in user
+        When: The same HTTP get request is sent twice, with the query in a different order
+        Then: The second response is the same and runs no queries
+        """
+        first = self.client.get('/posts/?ordering=-likes_count&page=1')
+        with self.assertNumQueries(0):
+            second = self.client.get('/posts/?page=1&ordering=-likes_count')
+        self.assertEqual(first.data, second.data)
+
+    def test_logged_in_request_not_served_from_cache(self):
+        """
+        Context: Adam logged in and the post detail has been cached for logged out users
+        When: HTTP get request to the post detail
+        Then: The response is built for adam with is_owner True
+        """
+        self.client.get(f'/posts/{self.post.id}/')
+        self.client.login(username='adam', password='pass')
+        response = self.client.get(f'/posts/{self.post.id}/')
+        self.assertTrue(response.data['is_owner'])
+
+    def test_cached_responses_dropped_on_writes(self):
+        """
+        Context: The posts list and post detail are cached
+        When: A comment and a like are added and the profile image is changed
+        Then: The next responses show the changes
+        """
+        self.client.get('/posts/')
+        self.client.get(f'/posts/{self.post.id}/')
+        Comment.objects.create(owner=self.adam, post=self.post, content='a comment')
+        Like.objects.create(owner=self.adam, post=self.post)
+        profile = self.adam.profile
+        profile.image = 'images/new'
+        profile.save()
+        listed = self.client.get('/posts/').data['results'][0]
+        self.assertEqual(listed['comments_count'], 1)
+        self.assertIn('images/new', listed['profile_image'])
+        detail = self.client.get(f'/posts/{self.post.id}/').data
+        self.assertEqual(detail['likes_count'], 1)
+
+    def test_edited_post_drops_cached_lists(self):
+        """
+        Context: A search of the posts list matching no posts is cached
+        When: The post is edited to match the search
+        Then: The next search finds it
+        """
+        self.client.get('/posts/?search=sunset')
+        self.post.title = 'a sunset'
+        self.post.save()
+        response = self.client.get('/posts/?search=sunset')
+        self.assertEqual(response.data['results'][0]['title'], 'a sunset')
+
+    def test_renamed_user_drops_cached_responses(self):
+        """
+        Context: The posts list and post detail are cached
+        When: Adam changes his username
+        Then: The next responses show the new username
+        """
+        self.client.get('/posts/')
+        self.client.get(f'/posts/{self.post.id}/')
+        self.adam.username = 'adrian'
+        self.adam.save()
+        self.assertEqual(self.client.get('/posts/').data['results'][0]['owner'], 'adrian')
+        self.assertEqual(self.client.get(f'/posts/{self.post.id}/').data['owner'], 'adrian')
+
+    def test_tags_get_new_versions_on_commit(self):
+        """
+        Context: A like made in a transaction
+        When: The transaction commits
+        Then: The tags it changed get another new version, dropping any
+        response cached from data read before the commit
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            Like.objects.create(owner=self.adam, post=self.post)
+            before_commit = response_cache.tag_versions(['posts', f'post:{self.post.id}'])
+        after_commit = response_cache.tag_versions(['posts', f'post:{self.post.id}'])
+        for tag, version in after_commit.items():
+            self.assertNotEqual(version, before_commit[tag])
+
+    def test_response_changed_while_built_not_stored(self):
+        """
+        Context: The post's owner changes their profile while the post
+        detail is being built for a logged out user
+        When: The post detail is requested again
+        Then: It is built again instead of coming from the cache
+        """
+        retrieve = PostDetail.retrieve
+
+        def retrieve_then_change_profile(view, request, *args, **kwargs):
+            response = retrieve(view, request, *args, **kwargs)
+            response_cache.invalidate(f'profile:{self.adam.profile.id}')
+            return response
+
+        with mock.patch.object(PostDetail, 'retrieve', retrieve_then_change_profile):
+            self.client.get(f'/posts/{self.post.id}/')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(f'/posts/{self.post.id}/')
+        self.assertGreater(len(queries), 0)
+
+    def test_comments_list_times_not_cached(self):
+        """
+        Context: The comments list for adams post has been requested
+        When: It is requested again three hours later
+        Then: It is built again, showing the comment's time as "3 hours ago"
+        """
+        comment = Comment.objects.create(owner=self.adam, post=self.post, content='a comment')
+        url = f'/comments/?post={self.post.id}'
+        self.assertEqual(self.client.get(url).data['results'][0]['created_at'], 'now')
+        # As if three hours went by, without any signal a cache could follow
+        Comment.objects.filter(pk=comment.pk).update(
+            created_at=comment.created_at - datetime.timedelta(hours=3))
+        response = self.client.get(url)
+        self.assertEqual(response.data['results'][0]['created_at'], '3\xa0hours ago')
+
+
+class PostConditionalGetTests(APITestCase):
+    """
+    Class to contain the tests for ETag and Last-Modified handling on the PostDetail view
+    """
+    def setUp(self):
+        caches[settings.RESPONSE_CACHE_ALIAS].clear()
+        self.adam = User.objects.create_user(username='adam', password='pass')
+        self.post = Post.objects.create(owner=self.adam, title='a title')
+        self.url = f'/posts/{self.post.id}/'
+
+    def test_unchanged_post_answered_with_304(self):
+        """
+        Context: The post has been fetched once
+        When: HTTP get request sending the ETag back in If-None-Match
+        Then: Response status 304 after a single query
+        """
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_new_like_changes_etag(self):
+        """
+        Context: The post has been fetched once
+        When: The post is liked and the ETag is sent back in If-None-Match
+        Then: The full post is returned with a new ETag
+        """
+        etag = self.client.get(self.url)['ETag']
+        Like.objects.create(owner=self.adam, post=self.post)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['likes_count'], 1)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_differs_between_users(self):
+        """
+        Context: The post has been fetched while logged out
+        When: Adam logs in and sends the ETag back in If-None-Match
+        Then: The full post is returned as is_owner is different for adam
+        """
+        etag = self.client.get(self.url)['ETag']
+        self.client.login(username='adam', password='pass')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['is_owner'])
+
+    def test_if_modified_since_alone_not_answered_with_304(self):
+        """
+        Context: The post has been fetched once, then liked, which leaves
+        its updated_at as it was
+        When: HTTP get request sending only If-Modified-Since
+        Then: The full post is returned, and no Last-Modified is sent
+        """
+        response = self.client.get(self.url)
+        self.assertNotIn('Last-Modified', response)
+        Like.objects.create(owner=self.adam, post=self.post)
+        response = self.client.get(
+            self.url, HTTP_IF_MODIFIED_SINCE=http_date(self.post.updated_at.timestamp() + 60))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['likes_count'], 1)
+
+    def test_missing_post_still_404(self):
+        """
+        Context: As set-up
+        When: HTTP get request for a post that doesn't exist with If-None-Match
+        Then: response status code 404
+        """
+        response = self.client.get('/posts/999/', HTTP_IF_NONE_MATCH='"abc"')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+def image_upload(width, height, image_format='PNG', name='image.png'):
+    content = BytesIO()
+    Image.new('RGB', (width, height)).save(content, image_format)
+    return SimpleUploadedFile(name, content.getvalue())
+
+
+def upload_callbacks(callbacks):
+    """
+    Returns the on_commit callbacks starting image uploads, leaving out
+    the response cache's
+    """
+    return [callback for callback in callbacks if 'upload_on_commit' in callback.__qualname__]
+
+
+class PostImageValidationTests(APITestCase):
+    """
+    Class to contain the tests for the header only validation of post images
+    """
+    def setUp(self):
+        self.adam = User.objects.create_user(username='adam', password='pass')
+        self.client.login(username='adam', password='pass')
+
+    def validate(self, image):
+        request = APIRequestFactory().post('/posts/')
+        request.user = self.adam
+        serializer = PostSerializer(
+            data={'title': 'a title', 'image': image}, context={'request': request})
+        serializer.is_valid()
+        return serializer
+
+    def test_valid_image_probed_from_header(self):
+        """
+        Context: A small JPEG
+        When: The post serializer validates it
+        Then: It is valid with its format and size read but its pixels not loaded
+        """
+        serializer = self.validate(image_upload(20, 10, 'JPEG', 'image.jpg'))
+        self.assertTrue(serializer.is_valid())
+        image = serializer.validated_data['image']
+        self.assertEqual(image.content_type, 'image/jpeg')
+        self.assertEqual(image.image.size, (20, 10))
+        # Pillow keeps the tiles to decode until the image is loaded
+        self.assertTrue(image.image.tile)
+
+    def test_malformed_image_rejected(self):
+        """
+        Context: As set-up
+        When: HTTP post request with a file that isn't an image
+        Then: Response status 400 with the invalid image message
+        """
+        response = self.client.post('/posts/', {
+            'title': 'a title',
+            'image': SimpleUploadedFile('image.png', b'\x89PNG not really'),
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Upload a valid image', response.data['image'][0])
+
+    def test_too_wide_image_rejected(self):
+        """
+        Context: As set-up
+        When: HTTP post request with an image 5000px wide
+        Then: Response status 400 with the width message
+        """
+        response = self.client.post(
+            '/posts/', {'title': 'a title', 'image': image_upload(5000, 10)})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['image'], ['Image width larger tahn 4096px'])
+
+    def test_oversized_upload_rejected_without_being_stored(self):
+        """
+        Context: As set-up
+        When: HTTP post request with a 3MB upload
+        Then: Response status 400 with the size message, and the upload
+        was replaced by a placeholder without its content
+        """
+        upload = SimpleUploadedFile('image.png', b'x' * (3 * 1024 * 1024))
+        response = self.client.post('/posts/', {'title': 'a title', 'image': upload})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['image'], ['Image size larger than 2MB!'])
+        self.assertEqual(Post.objects.count(), 0)
+
+
+class PostImageUploadTests(APITestCase):
+    """
+    Class to contain the tests for uploading post images in the background
+    """
+    def setUp(self):
+        caches[settings.RESPONSE_CACHE_ALIAS].clear()
+        roots = [tempfile.mkdtemp(), tempfile.mkdtemp()]
+        for root in roots:
+            self.addCleanup(shutil.rmtree, root)
+        media_settings = override_settings(
+            DEFAULT_FILE_STORAGE='drf_api.media.LocalRemoteStorage',
+            MEDIA_STAGING_ROOT=roots[0], MEDIA_REMOTE_ROOT=roots[1],
+            MEDIA_UPLOAD_WORKERS=0,
+        )
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.staging_root, self.remote_root = roots
+        self.adam = User.objects.create_user(username='adam', password='pass')
+        self.client.login(username='adam', password='pass')
+
+    def test_image_uploaded_after_response(self):
+        """
+        Context: As set-up
+        When: HTTP post request with an image, then the upload runs
+        Then: The response has the default image with image_state pending,
+        after the upload the post has the uploaded image and the staged file is gone
+        """
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(
+                '/posts/', {'title': 'a title', 'image': image_upload(20, 10)})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['image_state'], 'pending')
+        self.assertIn('default_post', response.data['image'])
+        callbacks = upload_callbacks(callbacks)
+        self.assertEqual(len(callbacks), 1)
+
+        callbacks[0]()
+        post = Post.objects.get()
+        self.assertEqual(post.image_state, 'ready')
+        self.assertEqual(post.image_upload, '')
+        self.assertTrue(post.image.name.startswith('images/image'))
+        self.assertTrue(default_storage.exists(post.image.name))
+        response = self.client.get(f'/posts/{post.id}/')
+        self.assertEqual(response.data['image_state'], 'ready')
+        self.assertTrue(response.data['image'].endswith(post.image.name))
+        self.assertFalse(any(files for _, _, files in os.walk(self.staging_root)))
+
+    def test_newer_upload_wins(self):
+        """
+        Context: A post
+        When: Two images are sent and the older upload finishes last
+        Then: The post keeps the newer image and the older upload is removed
+        """
+        post = Post.objects.create(owner=self.adam, title='a title')
+        with self.captureOnCommitCallbacks() as callbacks:
+            for name in ['first.png', 'second.png']:
+                self.client.put(f'/posts/{post.id}/', {
+                    'title': 'a title', 'image': image_upload(20, 10, name=name)})
+        callbacks = upload_callbacks(callbacks)
+        callbacks[1]()
+        callbacks[0]()
+        post.refresh_from_db()
+        self.assertEqual(post.image.name, 'images/second.png')
+        self.assertFalse(default_storage.exists('images/first.png'))
+
+    def test_finished_upload_changes_etag(self):
+        """
+        Context: A post was fetched while its image was still uploading
+        When: The upload finishes and the old ETag is sent in If-None-Match
+        Then: The post is returned in full with the uploaded image,
+        and its updated_at has moved on
+        """
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.post('/posts/', {'title': 'a title', 'image': image_upload(20, 10)})
+        post = Post.objects.get()
+        url = f'/posts/{post.id}/'
+        etag = self.client.get(url)['ETag']
+        upload_callbacks(callbacks)[0]()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['image_state'], 'ready')
+        self.assertGreater(Post.objects.get().updated_at, post.updated_at)
+
+    def test_failed_upload_marked(self):
+        """
+        Context: The remote store raises on save
+        When: HTTP post request with an image, then the upload runs
+        Then: The post keeps the default image with image_state failed
+        """
+        with mock.patch.object(LocalRemoteStorage, '_save', side_effect=OSError):
+            with self.assertLogs('drf_api.media', 'ERROR'):
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.client.post(
+                        '/posts/', {'title': 'a title', 'image': image_upload(20, 10)})
+        post = Post.objects.get()
+        self.assertEqual(post.image_state, 'failed')
+        self.assertEqual(post.image.name, '../default_post_icuydr')
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class PostTrendingTests(APITestCase):
+    """
+    Class to contain the tests for the trending score and /posts/trending/
+    """
+    def setUp(self):
+        self.adam = User.objects.create_user(username='adam', password='pass')
+        self.brian = User.objects.create_user(username='brian', password='pass')
+        self.now = timezone.now()
+        self.days_ago = self.now - datetime.timedelta(days=3)
+        with mock.patch('django.utils.timezone.now', return_value=self.days_ago):
+            self.old = Post.objects.create(owner=self.adam, title='old')
+            Like.objects.create(owner=self.adam, post=self.old)
+            Like.objects.create(owner=self.brian, post=self.old)
+            Comment.objects.create(owner=self.brian, post=self.old, content='a comment')
+        self.new = Post.objects.create(owner=self.adam, title='new')
+
+    def scores(self):
+        return dict(Post.objects.values_list('title', 'trending_score'))
+
+    def test_epoch_moved_by_another_process_is_read(self):
+        """
+        Context: The epoch has been read, and read again after the cache
+            is cleared
+        When: rescale moves it in another process, whose cache this
+            process doesn't share
+        Then: Each read is one query and the one after rescale gets the new epoch
+        """
+        epoch = TrendingEpoch.current()
+        response_cache.get_cache().clear()
+        with self.assertNumQueries(1):
+            self.assertEqual(TrendingEpoch.current(), epoch)
+        later = epoch + datetime.timedelta(hours=1)
+        with mock.patch('drf_api.cache.invalidate'):
+            trending.rescale(later)
+        with self.assertNumQueries(1):
+            self.assertEqual(TrendingEpoch.current(), later)
+
+    def test_event_long_after_epoch_does_not_overflow(self):
+        """
+        Context: The epoch hasn't moved for 2000 half lives
+        When: A like is made
+        Then: It is given the largest weight rather than failing
+        """
+        later = self.now + datetime.timedelta(seconds=settings.TRENDING_HALF_LIFE * 2000)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            Like.objects.create(owner=self.brian, post=self.new)
+        self.assertGreaterEqual(self.scores()['new'], 2 ** MAX_TRENDING_EXPONENT)
+
+    def test_recent_activity_ranks_first(self):
+        """
+        Context: An old post with more likes and comments than a new one
+        When: HTTP get request to the trending posts, and to the posts
+        ordered by likes_count
+        Then: The new post trends first, though it has fewer likes
+        """
+        Like.objects.create(owner=self.brian, post=self.new)
+        response = self.client.get('/posts/trending/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([post['title'] for post in response.data['results']], ['new', 'old'])
+        response = self.client.get('/posts/?ordering=-likes_count')
+        self.assertEqual([post['title'] for post in response.data['results']], ['old', 'new'])
+
+    def test_deleted_like_and_comment_taken_off(self):
+        """
+        Context: Likes and comments on the old post
+        When: They are deleted
+        Then: The old post's score is only its own decayed weight again
+        """
+        Like.objects.filter(post=self.old).delete()
+        Comment.objects.filter(post=self.old).delete()
+        self.assertAlmostEqual(
+            self.scores()['old'],
+            trending.compute_scores([(0, self.days_ago, 1)], TrendingEpoch.current())[0])
+
+    def test_rescale_keeps_order_and_matches_rebuild(self):
+        """
+        Context: Posts scored against the current epoch
+        When: The epoch is moved a half life on and a new like is made
+        Then: Every score halved, and they match scores worked out from scratch
+        """
+        before = self.scores()
+        later = TrendingEpoch.current() + datetime.timedelta(
+            seconds=settings.TRENDING_HALF_LIFE)
+        trending.rescale(later)
+        for title, score in self.scores().items():
+            self.assertAlmostEqual(score, before[title] / 2)
+        Like.objects.create(owner=self.brian, post=self.new)
+        rescaled = self.scores()
+        trending.rebuild(later)
+        for title, score in self.scores().items():
+            self.assertAlmostEqual(score, rescaled[title])
+
+    def test_rescale_trending_command_rebuilds_drifted_scores(self):
+        """
+        Context: Scores which have drifted from the likes and comments
+        When: The rescale_trending command is run with --rebuild
+        Then: The trending order is right again
+        """
+        Post.objects.filter(pk=self.new.pk).update(trending_score=0)
+        Post.objects.filter(pk=self.old.pk).update(trending_score=100)
+        call_command('rescale_trending', '--rebuild', stdout=StringIO())
+        scores = self.scores()
+        self.assertGreater(scores['new'], scores['old'])
+        call_command('rescale_trending', stdout=StringIO())
+        self.assertGreater(self.scores()['new'], scores['old'])
+
+    def test_trending_list_ordered_by_index(self):
+        """
+        Context: Posts with likes and comments
+        When: HTTP get request to the trending posts
+        Then: The posts are read by an ORDER BY on the stored score,
+        without counting likes or comments
+        """
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/posts/trending/')
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertIn('ORDER BY "posts_post"."trending_score" DESC', sql)
+        self.assertNotIn('likes_like', sql)
+        self.assertNotIn('comments_comment', sql)
+        if connection.vendor == 'sqlite':
+            plan = Post.objects.order_by('-trending_score', '-id')[:10].explain()
+            self.assertIn('posts_post_trendin', plan)
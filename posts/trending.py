@@ -0,0 +1,99 @@
+"""
+Trending score of posts, for /posts/trending/.
+
+A post's score adds up its events, the post itself, its likes and its
+comments, each event's weight halving every settings.TRENDING_HALF_LIFE
+seconds after it happened. Decaying every score as time passes would mean
+updating every post, so scores are stored as of a fixed time instead, the
+TrendingEpoch: an event at time t adds
+
+    weight * 2 ** ((t - epoch) / TRENDING_HALF_LIFE)
+
+which is the event's decayed weight multiplied by the same growing factor
+for every post. The order of the posts is the same as with decayed scores,
+so the trending list is an ORDER BY on the indexed trending_score column,
+and it only changes when an event does.
+
+The signals in posts, likes and comments models add each new event and
+take it off again when it is deleted. Stored scores grow as time passes,
+so the rescale_trending command should run every day or so: rescale moves
+the epoch to now and multiplies every score by the same factor, which
+keeps them small. rebuild works out every score again from the events.
+An event saved while rescale runs may be weighted against the old epoch;
+rescale_trending --rebuild corrects any drift.
+
+The epoch is read from the database for each event, see
+TrendingEpoch.current, so events are weighted against the epoch rescale
+and rebuild moved to in every process. Weights are capped at 2 ** MAX_TRENDING_EXPONENT, so events keep
+being scored, out of order, if the epoch isn't moved on for a long time.
+"""
+from collections import defaultdict
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from drf_api import cache as response_cache
+from comments.models import Comment
+from likes.models import Like
+from .models import Post, TrendingEpoch, trending_weight
+
+
+def compute_scores(events, epoch):
+    """
+    Returns {post id: score} for an iterable of (post id, time, weight)
+    """
+    scores = defaultdict(float)
+    for post_id, at, weight in events:
+        scores[post_id] += trending_weight(weight, at, epoch)
+    return scores
+
+
+def events():
+    """
+    Yields (post id, time, weight) for every post, like and comment
+    """
+    for queryset, weight in [
+            (Post.objects.values_list('id', 'created_at'), settings.TRENDING_POST_WEIGHT),
+            (Like.objects.values_list('post_id', 'created_at'), settings.TRENDING_LIKE_WEIGHT),
+            (Comment.objects.values_list('post_id', 'created_at'),
+             settings.TRENDING_COMMENT_WEIGHT)]:
+        for post_id, at in queryset.order_by().iterator():
+            yield post_id, at, weight
+
+
+def rescale(now=None):
+    """
+    Moves the epoch to now and scales every score to match.
+    Returns the number of posts updated and the factor they were scaled by.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        TrendingEpoch.current()
+        epoch = TrendingEpoch.objects.select_for_update().get(pk=1)
+        factor = 2 ** ((epoch.started_at - now).total_seconds() / settings.TRENDING_HALF_LIFE)
+        updated = Post.objects.exclude(trending_score=0).update(
+            trending_score=F('trending_score') * factor)
+        epoch.started_at = now
+        epoch.save()
+    return updated, factor
+
+
+def rebuild(now=None):
+    """
+    Moves the epoch to now and works out every post's score from its
+    events. Returns the number of posts updated.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        TrendingEpoch.current()
+        epoch = TrendingEpoch.objects.select_for_update().get(pk=1)
+        scores = compute_scores(events(), now)
+        posts = [
+            Post(pk=pk, trending_score=scores.get(pk, 0.0))
+            for pk in Post.objects.values_list('pk', flat=True)
+        ]
+        Post.objects.bulk_update(posts, ['trending_score'], batch_size=500)
+        epoch.started_at = now
+        epoch.save()
+    response_cache.invalidate('posts')
+    return len(posts)
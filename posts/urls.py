@@ -4,4 +4,7 @@ from posts import views
 urlpatterns = [
     path('posts/', views.PostList.as_view()),
     path('posts/<int:pk>/', views.PostDetail.as_view()),
+    path('posts/trending/', views.TrendingPostList.as_view()),
+    path('async/posts/', views.AsyncPostList.as_view()),
+    path('async/posts/<int:pk>/', views.AsyncPostDetail.as_view()),
 ]
\ No newline at end of file
@@ -1,26 +1,49 @@
-from django.db.models import Count
 from .models import Post
+from .search import PostSearchFilter
 from .serializers import PostSerializer
-from rest_framework import generics, permissions, filters
+from rest_framework import permissions, filters
 from django_filters.rest_framework import DjangoFilterBackend
+from drf_api import generics
+from drf_api.async_views import AsyncDetailView, AsyncListView
+from drf_api.cache import ResponseCacheMixin
+from drf_api.conditional import ConditionalGetMixin
+from drf_api.mixins import ViewerRelationMixin
+from drf_api.pagination import CreatedAtCursorPagination
 from drf_api.permissions import IsOwnerOrReadOnly
+from drf_api.values import ValuesListMixin
+from likes.models import Like
 
 
-class PostList(generics.ListCreateAPIView):
+class LikeIdMixin(ViewerRelationMixin):
+    """
+    Fetches the logged in user's likes for all the posts being serialized
+    in one query, which PostSerializer then uses to set like_id.
+    """
+    viewer_relation_model = Like
+    viewer_relation_field = 'post'
+    viewer_relation_key = 'id'
+    viewer_relation_context = 'like_ids'
+
+
+class PostList(
+        ValuesListMixin, ResponseCacheMixin, LikeIdMixin, generics.ListCreateAPIView):
     """
     View to return a list of all posts
     """
     serializer_class = PostSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    queryset = Post.objects.annotate(
-        comments_count=Count('comment', distinct=True),
-        # The above counts the number of times a relationship is found between the current post and an instance of comment.
-        likes_count=Count('likes', distinct=True)
-        # In the above likes is the related name given to the post field in the like model.
-    ).order_by('-created_at')
+    pagination_class = CreatedAtCursorPagination
+    # Above allows infinite scroll clients to page with ?cursor= instead of page numbers
+    cache_view_tags = ['posts']
+    cache_item_tags = ['post:{id}', 'profile:{profile_id}']
+    # Above tags cached responses so they are dropped when a post or profile shown changes
+    queryset = Post.objects.order_by('-created_at')
+    # The generic view joins the owner and their profile read by PostSerializer
+    # comments_count and likes_count are stored on the post, so no counting is needed here
     filter_backends = [
         filters.OrderingFilter,
-        filters.SearchFilter,
+        PostSearchFilter,
+        # Above searches the full-text index of title, content and owner username
         DjangoFilterBackend,
     ]
     filterset_fields = [
@@ -40,19 +63,52 @@ class PostList(generics.ListCreateAPIView):
         'owner__username',
         'title',
     ]
+    # Above is only used by databases without a full-text index, see posts/search.py
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
     
-class PostDetail(generics.RetrieveUpdateDestroyAPIView):
+class PostDetail(
+        ConditionalGetMixin, ResponseCacheMixin,
+        LikeIdMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     View to return a specific post where pk will be the id of the post
     """
     serializer_class = PostSerializer
     permission_classes = [IsOwnerOrReadOnly]
-    queryset = Post.objects.annotate(
-        comments_count=Count('comment', distinct=True),
-        # The above counts the number of times a relationship is found between the current post and an instance of comment.
-        likes_count=Count('likes', distinct=True)
-    ).order_by('-created_at')
+    cache_view_tags = ['post:{pk}']
+    cache_item_tags = ['profile:{profile_id}']
+    validator_fields = [
+        'updated_at', 'comments_count', 'likes_count', 'image', 'image_state',
+        'owner__username', 'owner__profile__image',
+    ]
+    # Above are used for the ETag so that unchanged posts can be answered with a 304
+    queryset = Post.objects.order_by('-created_at')
+
+
+class TrendingPostList(
+        ValuesListMixin, ResponseCacheMixin, LikeIdMixin, generics.ListAPIView):
+    """
+    View to return the posts with the most recent likes and comments first,
+    see posts/trending.py
+    """
+    serializer_class = PostSerializer
+    cache_view_tags = ['posts']
+    cache_item_tags = ['post:{id}', 'profile:{profile_id}']
+    queryset = Post.objects.order_by('-trending_score', '-id')
+    # Above reads the posts in the order of the trending_score index
+
+
+class AsyncPostList(AsyncListView):
+    """
+    Async view for GET requests to the posts list, see drf_api/async_views.py
+    """
+    view_class = PostList
+
+
+class AsyncPostDetail(AsyncDetailView):
+    """
+    Async view for GET requests to a post, see drf_api/async_views.py
+    """
+    view_class = PostDetail
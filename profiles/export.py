@@ -0,0 +1,98 @@
+"""
+Exports a user's profile, posts, comments, likes and follows
+as newline-delimited JSON, one object per line:
+{"type": "post", "data": {...}}
+
+Each type is read with QuerySet.iterator() and serialized a chunk of rows
+at a time by the same compiled serializers as the list views, so the data
+has the same fields as the API and memory use doesn't grow with the
+number of rows exported.
+"""
+from comments.models import Comment
+from comments.serializers import CommentSerializer
+from drf_api.renderers import FastJSONRenderer
+from drf_api.values import ValuesSerializerPlan
+from followers.models import Follow
+from followers.serializers import FollowSerializer
+from likes.models import Like
+from likes.serializers import LikeSerializer
+from posts.models import Post
+from posts.serializers import PostSerializer
+from .models import Profile
+from .serializers import ProfileSerializer
+
+EXPORT_CHUNK_SIZE = 500
+
+# (type, model, serializer) in the order they are exported
+EXPORTED_TYPES = [
+    ('post', Post, PostSerializer),
+    ('comment', Comment, CommentSerializer),
+    ('like', Like, LikeSerializer),
+    ('follow', Follow, FollowSerializer),
+]
+PLANS = {
+    serializer: ValuesSerializerPlan(serializer, model)
+    for _, model, serializer in EXPORTED_TYPES + [('profile', Profile, ProfileSerializer)]
+}
+
+
+class ExportRequest:
+    """
+    Stands in for the request in the serializer context when exporting
+    from the command line, with the user the export is made for.
+    """
+    def __init__(self, user):
+        self.user = user
+
+    def build_absolute_uri(self, location):
+        return location
+
+
+def chunks(rows, size):
+    """
+    Yields lists of up to size rows from the iterator
+    """
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def export_lines(profile_queryset, owner, request, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yields the export of the owner's data as lines of JSON bytes.
+    profile_queryset is the annotated queryset ProfileDetail reads from.
+    request is the request, or an ExportRequest, of the user exporting,
+    who sets is_owner, like_id and following_id.
+    """
+    encode = FastJSONRenderer().encode
+    viewer = request.user
+
+    def lines(record_type, serializer_class, rows, context=None):
+        serializer = serializer_class(context={'request': request, **(context or {})})
+        for data in PLANS[serializer_class].serialize(serializer, rows):
+            yield encode({'type': record_type, 'data': data}) + b'\n'
+
+    plan = PLANS[ProfileSerializer]
+    profile = profile_queryset.filter(owner=owner).values(*plan.keys)
+    following_ids = dict(Follow.objects.filter(
+        owner=viewer, followed=owner).values_list('followed_id', 'id')
+    ) if viewer.is_authenticated else {}
+    yield from lines('profile', ProfileSerializer, profile, {'following_ids': following_ids})
+
+    for record_type, model, serializer_class in EXPORTED_TYPES:
+        rows = model.objects.filter(owner=owner).order_by('id').values(
+            *PLANS[serializer_class].keys
+        ).iterator(chunk_size=chunk_size)
+        for chunk in chunks(rows, chunk_size):
+            context = {}
+            if model is Post:
+                # The exporting user's likes of this chunk of posts
+                context['like_ids'] = dict(Like.objects.filter(
+                    owner=viewer, post_id__in=[row['id'] for row in chunk]
+                ).values_list('post_id', 'id')) if viewer.is_authenticated else {}
+            yield from lines(record_type, serializer_class, chunk, context)
@@ -0,0 +1,167 @@
+"""
+Imports users, along with their profiles, from another system in bulk.
+
+Saving users one at a time makes one INSERT for the user and another for
+the profile made by create_profile, while bulk_create skips post_save and
+so would leave the users without profiles. import_users instead inserts
+each batch of users with one bulk_create and their profiles with another,
+inside the same transaction, so every imported user has exactly one profile.
+
+Each record is a dict with a username and, optionally, email, password,
+name and content. password is the user's already hashed password from the
+old system in Django's format, e.g. 'pbkdf2_sha256$...'; users without one
+get an unusable password and sign in after resetting it.
+Usernames which already exist are skipped, as are invalid records, which
+are reported with their position in the input.
+"""
+import time
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.contrib.auth.models import User
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.utils import timezone
+from drf_api import cache as response_cache
+from .models import Profile
+
+IMPORT_BATCH_SIZE = 1000
+# Most users imported by one request to the API
+IMPORT_MAX_REQUEST_USERS = 10000
+IMPORT_FIELDS = ['username', 'email', 'password', 'name', 'content']
+
+
+class ImportReport:
+    """
+    The outcome of an import: the number of users created, the usernames
+    skipped as they already existed, the invalid records and the time taken
+    """
+    def __init__(self):
+        self.created = 0
+        self.skipped = []
+        self.errors = []
+        self.seconds = 0.0
+
+    @property
+    def users_per_second(self):
+        return self.created / self.seconds if self.seconds else 0.0
+
+    def as_dict(self):
+        return {
+            'created': self.created,
+            'skipped': self.skipped,
+            'errors': self.errors,
+            'seconds': round(self.seconds, 3),
+            'users_per_second': round(self.users_per_second, 1),
+        }
+
+
+def clean_record(record):
+    """
+    Returns the record's values for IMPORT_FIELDS,
+    raising ValidationError with every problem found
+    """
+    if not isinstance(record, dict):
+        raise ValidationError('Each user must be an object.')
+    unknown = set(record) - set(IMPORT_FIELDS)
+    values = {field: record.get(field) or '' for field in IMPORT_FIELDS}
+    if any(not isinstance(value, str) for value in values.values()):
+        raise ValidationError('Every value must be a string.')
+
+    errors = [f'Unknown field {field}.' for field in sorted(unknown)]
+    username_field = User._meta.get_field('username')
+    if not values['username']:
+        errors.append('A username is required.')
+    elif len(values['username']) > username_field.max_length:
+        errors.append(f'username is longer than {username_field.max_length} characters.')
+    else:
+        try:
+            UnicodeUsernameValidator()(values['username'])
+        except ValidationError as error:
+            errors += error.messages
+    email_field = User._meta.get_field('email')
+    if len(values['email']) > email_field.max_length:
+        # validate_email allows longer addresses than the column holds
+        errors.append(f'email is longer than {email_field.max_length} characters.')
+    elif values['email']:
+        try:
+            validate_email(values['email'])
+        except ValidationError as error:
+            errors += error.messages
+    if values['password']:
+        try:
+            identify_hasher(values['password'])
+        except ValueError:
+            errors.append('password must be a hash in Django\'s format.')
+    if len(values['name']) > Profile._meta.get_field('name').max_length:
+        errors.append('name is too long.')
+    if errors:
+        raise ValidationError(errors)
+    return values
+
+
+def import_batch(batch, report):
+    """
+    Creates the users of a batch of (position, values) and their profiles
+    in one transaction
+    """
+    usernames = [values['username'] for _, values in batch]
+    # Every user of the batch gets the same date_joined, which tells them
+    # apart from users of the same name made by another request meanwhile
+    date_joined = timezone.now()
+    unusable = make_password(None)
+    with transaction.atomic():
+        existing = set(User.objects.filter(
+            username__in=usernames).values_list('username', flat=True))
+        new = [values for _, values in batch if values['username'] not in existing]
+        User.objects.bulk_create([
+            User(
+                username=values['username'], email=values['email'],
+                password=values['password'] or unusable, date_joined=date_joined,
+            )
+            for values in new
+        ], ignore_conflicts=True)
+        created = dict(User.objects.filter(
+            username__in=[values['username'] for values in new], date_joined=date_joined,
+        ).values_list('username', 'id'))
+        Profile.objects.bulk_create([
+            Profile(
+                owner_id=created[values['username']],
+                name=values['name'], content=values['content'],
+            )
+            for values in new if values['username'] in created
+        ])
+    report.created += len(created)
+    report.skipped += [username for username in usernames if username not in created]
+
+
+def import_users(records, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Imports an iterable of user records in transactions of batch_size users
+    and returns an ImportReport. Each batch is committed on its own, so an
+    error part way through keeps the users of the earlier batches.
+    """
+    report = ImportReport()
+    start = time.perf_counter()
+    seen = set()
+    batch = []
+    for position, record in enumerate(records):
+        try:
+            values = clean_record(record)
+            if values['username'] in seen:
+                raise ValidationError('The username appears earlier in the import.')
+        except ValidationError as error:
+            report.errors.append({'position': position, 'errors': error.messages})
+            continue
+        seen.add(values['username'])
+        batch.append((position, values))
+        if len(batch) == batch_size:
+            import_batch(batch, report)
+            batch = []
+    if batch:
+        import_batch(batch, report)
+    report.seconds = time.perf_counter() - start
+    if report.created:
+        # post_save wasn't sent, so the cached profile lists are dropped here
+        response_cache.invalidate('profiles')
+    return report
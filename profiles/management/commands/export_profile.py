@@ -0,0 +1,34 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from profiles.export import EXPORT_CHUNK_SIZE, ExportRequest, export_lines
+from profiles.views import ProfileExport
+
+
+class Command(BaseCommand):
+    """
+    Writes a user's profile, posts, comments, likes and follows as
+    newline-delimited JSON, the same as the profiles/<id>/export/ endpoint.
+    is_owner, like_id and following_id are given as seen by the user.
+    Run with: python manage.py export_profile adam --output adam.ndjson
+    """
+    help = "Exports a user's data as newline-delimited JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--output', help='File to write to, standard output by default')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            owner = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user called {options['username']}")
+
+        lines = export_lines(
+            ProfileExport.queryset, owner, ExportRequest(owner), options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'wb') as output:
+                output.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line.decode(), ending='')
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from drf_api.media import IMAGE_PENDING, finish_upload
+from posts.models import Post
+from profiles.models import Profile
+
+
+class Command(BaseCommand):
+    """
+    Uploads the staged post and profile images left pending,
+    e.g. by a worker process that stopped before finishing them.
+    Run with: python manage.py finish_image_uploads
+    """
+    help = 'Finishes image uploads left pending'
+
+    def handle(self, *args, **options):
+        for model in [Post, Profile]:
+            pending = model.objects.filter(image_state=IMAGE_PENDING).exclude(
+                image_upload='').values_list('pk', 'image_upload')
+            for pk, staged_name in pending:
+                finish_upload(model, pk, staged_name)
+            self.stdout.write(
+                f'Finished {len(pending)} {model._meta.verbose_name} uploads')
@@ -0,0 +1,48 @@
+import csv
+import json
+from django.core.management.base import BaseCommand, CommandError
+from profiles.importer import IMPORT_BATCH_SIZE, IMPORT_FIELDS, import_users
+
+
+class Command(BaseCommand):
+    """
+    Imports users and their profiles from a CSV file with a header row of
+    the fields in profiles/importer.py, other columns being ignored, or from
+    a .jsonl file with one user object per line, in transactions of
+    --batch-size users.
+    Run with: python manage.py import_users users.csv
+    """
+    help = 'Imports users and their profiles in bulk'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+
+    def read_records(self, source, path):
+        if path.endswith('.jsonl'):
+            for line in source:
+                if line.strip():
+                    yield json.loads(line)
+            return
+        reader = csv.DictReader(source)
+        missing = {'username'} - set(reader.fieldnames or [])
+        if missing:
+            raise CommandError(f'{path} has no username column')
+        for row in reader:
+            yield {field: value for field, value in row.items() if field in IMPORT_FIELDS}
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            with open(path, newline='', encoding='utf-8') as source:
+                report = import_users(self.read_records(source, path), options['batch_size'])
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+
+        for error in report.errors:
+            self.stderr.write(f"Record {error['position']}: {' '.join(error['errors'])}")
+        self.stdout.write(
+            f'Created {report.created} users and profiles in {report.seconds:.2f}s '
+            f'({report.users_per_second:.0f} users/s), skipped {len(report.skipped)} '
+            f'existing usernames, {len(report.errors)} invalid records'
+        )
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.23 on 2026-10-18 17:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0002_alter_profile_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='image_state',
+            field=models.CharField(choices=[('ready', 'Ready'), ('pending', 'Pending'), ('failed', 'Failed')], default='ready', max_length=8),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='image_upload',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
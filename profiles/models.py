@@ -1,6 +1,10 @@
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.contrib.auth.models import User
+from drf_api import cache as response_cache
+from drf_api.media import IMAGE_READY, IMAGE_STATES
+from drf_api.storage import forget_image_url
+from drf_api.user_cache import user_cache
 
 class Profile(models.Model):
     """ 
@@ -15,6 +19,10 @@ class Profile(models.Model):
     image = models.ImageField(
         upload_to='images/', default='../default_profile_yzfpjq'
         )
+    # A new image is uploaded in the background, see drf_api/media.py.
+    # image_upload is the staged file of the upload in progress.
+    image_state = models.CharField(max_length=8, choices=IMAGE_STATES, default=IMAGE_READY)
+    image_upload = models.CharField(max_length=255, blank=True)
     
     class Meta:
         """
@@ -50,3 +58,63 @@ post_save.connect(create_profile, sender=User)
 This uses the signal post_save running the given function when
 the given sender is saved.
 """
+
+
+def owner_profile_tags(*owner_ids):
+    """
+    Returns the response cache tags of the given users' profiles
+    """
+    profile_ids = Profile.objects.filter(owner_id__in=owner_ids).values_list('id', flat=True)
+    return [f'profile:{profile_id}' for profile_id in profile_ids]
+
+
+def invalidate_saved_profile(sender, instance, created, **kwargs):
+    """
+    Called by post_save after a profile is saved.
+    Drops the cached responses showing the profile, including posts and
+    comments showing its image. A new profile also changes the profiles list.
+    """
+    tags = [f'profile:{instance.pk}']
+    if created:
+        tags.append('profiles')
+    response_cache.invalidate(*tags)
+
+
+def invalidate_deleted_profile(sender, instance, **kwargs):
+    """
+    Called by post_delete after a profile is deleted.
+    """
+    response_cache.invalidate(f'profile:{instance.pk}', 'profiles')
+
+
+def invalidate_renamed_user(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Called by post_save after a user is saved.
+    Drops the cached responses showing the user's username: their profile,
+    posts and comments, and the lists which may be searched by username.
+    Saves that only touch other fields, such as last_login, are skipped.
+    """
+    if created or (update_fields is not None and 'username' not in update_fields):
+        return
+    response_cache.invalidate('posts', 'profiles', *owner_profile_tags(instance.pk))
+
+
+def invalidate_cached_user(sender, instance, **kwargs):
+    """
+    Called by post_save and post_delete after a user or profile is saved
+    or deleted, including when a password is changed.
+    Drops the user from the authentication cache so the next request
+    loads the new details.
+    """
+    user_cache.invalidate_user(instance.owner_id if sender is Profile else instance.pk)
+
+
+post_save.connect(invalidate_saved_profile, sender=Profile)
+post_delete.connect(invalidate_deleted_profile, sender=Profile)
+post_save.connect(invalidate_renamed_user, sender=User)
+post_save.connect(invalidate_cached_user, sender=User)
+post_delete.connect(invalidate_cached_user, sender=User)
+post_save.connect(invalidate_cached_user, sender=Profile)
+post_delete.connect(invalidate_cached_user, sender=Profile)
+post_save.connect(forget_image_url, sender=Profile)
+post_delete.connect(forget_image_url, sender=Profile)
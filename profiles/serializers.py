@@ -1,9 +1,12 @@
 from rest_framework import serializers
+from .importer import IMPORT_MAX_REQUEST_USERS
 from .models import Profile
 from followers.models import Follow
+from drf_api.images import PROBED_IMAGE_FIELD_MAPPING, validate_image_upload
+from drf_api.media import StagedImageSerializerMixin
 
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileSerializer(StagedImageSerializerMixin, serializers.ModelSerializer):
     owner = serializers.ReadOnlyField(source='owner.username')
     # Above overwrites owner to be username and not id (as it is in profile model)
     is_owner = serializers.SerializerMethodField()
@@ -14,13 +17,21 @@ class ProfileSerializer(serializers.ModelSerializer):
     posts_count = serializers.ReadOnlyField()
     followers_count = serializers.ReadOnlyField()
     following_count = serializers.ReadOnlyField()
+    # Uploaded images are checked from their header only
+    serializer_field_mapping = PROBED_IMAGE_FIELD_MAPPING
+
+    def validate_image(self, value):
+        """
+        Applies the same size, width and height limits as post images
+        """
+        return validate_image_upload(value)
 
     def get_is_owner(self, obj):
         """
         A custom method that is then used to determine the value of custom field is_owner
         """
         request = self.context['request']
-        return request.user == obj.owner
+        return request.user.pk == obj.owner_id
     
     def get_following_id(self, obj):
         """
@@ -28,10 +39,16 @@ class ProfileSerializer(serializers.ModelSerializer):
         It checks if the logged in user is the owner of a Follow object where
         the followed field is the owner of the profile being dealt with.
         If so following_id is given the id of this Follow object. If not it is given a value of none.
+        Uses the 'following_ids' lookup from the view's context when it has been provided.
         """
         user = self.context['request'].user
         if user.is_authenticated:
-            following = Follow.objects.filter(owner=user, followed=obj.owner).first()
+            following_ids = self.context.get('following_ids')
+            if following_ids is not None:
+                # Follows for the whole page were fetched in one query by the view
+                return following_ids.get(obj.owner_id)
+            # Only model instances get here, the values() rows always come with following_ids
+            following = Follow.objects.filter(owner=user, followed_id=obj.owner_id).first()
             return following.id if following else None
         return None
 
@@ -42,6 +59,20 @@ class ProfileSerializer(serializers.ModelSerializer):
         model = Profile
         fields = [
             'id', 'owner', 'created_at', 'updated_at', 'name',
-            'content', 'image', 'is_owner', 'following_id',
+            'content', 'image', 'image_state', 'is_owner', 'following_id',
             'posts_count', 'followers_count', 'following_count',
-        ]
\ No newline at end of file
+        ]
+        # image_state is 'pending' while a new image uploads in the background
+        read_only_fields = ['image_state']
+
+
+class UserImportSerializer(serializers.Serializer):
+    """
+    Serializer for the body of the user import endpoint:
+    {"users": [{"username": ..., "email": ..., ...}, ...]}
+    Each user is checked by profiles/importer.py.
+    """
+    users = serializers.ListField(
+        child=serializers.DictField(), allow_empty=False,
+        max_length=IMPORT_MAX_REQUEST_USERS,
+    )
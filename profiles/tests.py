@@ -1,3 +1,430 @@
-from django.test import TestCase
+import json
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APITestCase
+from comments.models import Comment
+from followers.models import Follow
+from likes.models import Like
+from posts.models import Post
+from .importer import import_users
+from .models import Profile
 
-# Create your tests here.
+
+class ProfileFollowingIdQueryTests(APITestCase):
+    """
+    Class to contain the tests checking following_id is resolved without
+    one query per profile
+    """
+    def setUp(self):
+        self.adam = User.objects.create_user(username='adam', password='pass')
+
+    def create_followed_users(self, number, start=0):
+        """
+        Creates the given number of users, each one followed by adam
+        """
+        for index in range(start, start + number):
+            user = User.objects.create_user(username=f'user{index}', password='pass')
+            Follow.objects.create(owner=self.adam, followed=user)
+
+    def count_list_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries)
+
+    def test_profile_list_query_count_does_not_grow_with_page_size(self):
+        """
+        Context: Adam logged in, first following 2 users then 12
+        When: HTTP get request to list the profiles
+        Then: The same number of queries is run for both page sizes
+        """
+        self.client.login(username='adam', password='pass')
+        self.create_followed_users(2)
+        small_page = self.count_list_queries('/profiles/')
+        self.create_followed_users(10, start=2)
+        large_page = self.count_list_queries('/profiles/')
+        self.assertEqual(small_page, large_page)
+
+    def test_filtered_profile_list_query_count_does_not_grow_with_page_size(self):
+        """
+        Context: Adam logged in, first following 2 users then 12
+        When: HTTP get request to list the profiles adam is following
+        Then: The same number of queries is run for both page sizes
+        """
+        self.client.login(username='adam', password='pass')
+        url = f'/profiles/?owner__followed__owner__profile={self.adam.profile.id}'
+        self.create_followed_users(2)
+        small_page = self.count_list_queries(url)
+        self.create_followed_users(10, start=2)
+        large_page = self.count_list_queries(url)
+        self.assertEqual(small_page, large_page)
+
+    def test_profile_list_returns_following_ids(self):
+        """
+        Context: Adam logged in and follows one of two other users
+        When: HTTP get request to list the profiles
+        Then: Only the followed users profile has a following_id
+        """
+        followed = User.objects.create_user(username='followed', password='pass')
+        User.objects.create_user(username='not_followed', password='pass')
+        follow = Follow.objects.create(owner=self.adam, followed=followed)
+        self.client.login(username='adam', password='pass')
+        response = self.client.get('/profiles/')
+        following_ids = {
+            profile['owner']: profile['following_id']
+            for profile in response.data['results']
+        }
+        self.assertEqual(following_ids, {
+            'adam': None, 'followed': follow.id, 'not_followed': None
+        })
+
+    def test_profile_detail_returns_following_id(self):
+        """
+        Context: Adam logged in and follows another user
+        When: HTTP get request to retrieve the followed users profile
+        Then: following_id is the id of adams follow
+        """
+        followed = User.objects.create_user(username='followed', password='pass')
+        follow = Follow.objects.create(owner=self.adam, followed=followed)
+        self.client.login(username='adam', password='pass')
+        profile = Profile.objects.get(owner=followed)
+        response = self.client.get(f'/profiles/{profile.id}/')
+        self.assertEqual(response.data['following_id'], follow.id)
+
+
+class ProfileCountTests(APITestCase):
+    """
+    Class to contain the tests for posts_count, followers_count and following_count
+    """
+    def setUp(self):
+        self.adam = User.objects.create_user(username='adam', password='pass')
+        self.james = User.objects.create_user(username='james', password='pass')
+        self.lucy = User.objects.create_user(username='lucy', password='pass')
+        Post.objects.create(owner=self.adam, title='first')
+        Post.objects.create(owner=self.adam, title='second')
+        Follow.objects.create(owner=self.james, followed=self.adam)
+        Follow.objects.create(owner=self.lucy, followed=self.adam)
+        Follow.objects.create(owner=self.adam, followed=self.lucy)
+
+    def test_profile_list_counts(self):
+        """
+        Context: Adam has two posts, two followers and follows lucy
+        When: HTTP get request to list the profiles
+        Then: Each profile has the right counts
+        """
+        response = self.client.get('/profiles/')
+        counts = {
+            profile['owner']: (
+                profile['posts_count'],
+                profile['followers_count'],
+                profile['following_count'],
+            )
+            for profile in response.data['results']
+        }
+        self.assertEqual(counts, {
+            'adam': (2, 2, 1), 'james': (0, 0, 1), 'lucy': (0, 1, 1),
+        })
+
+    def test_profile_list_ordered_by_followers_count(self):
+        """
+        Context: As set-up
+        When: HTTP get request to list the profiles ordered by followers_count
+        Then: The profiles are returned from most to least followed
+        """
+        response = self.client.get('/profiles/?ordering=-followers_count')
+        owners = [profile['owner'] for profile in response.data['results']]
+        self.assertEqual(owners, ['adam', 'lucy', 'james'])
+
+    def test_profile_detail_counts(self):
+        """
+        Context: As set-up
+        When: HTTP get request to retrieve adams profile
+        Then: The profile has the right counts
+        """
+        response = self.client.get(f'/profiles/{self.adam.profile.id}/')
+        self.assertEqual(response.data['posts_count'], 2)
+        self.assertEqual(response.data['followers_count'], 2)
+        self.assertEqual(response.data['following_count'], 1)
+
+
+class ProfileConditionalGetTests(APITestCase):
+    """
+    Class to contain the tests for ETag handling on the ProfileDetail view
+    """
+    def setUp(self):
+        self.adam = User.objects.create_user(username='adam', password='pass')
+        self.james = User.objects.create_user(username='james', password='pass')
+        self.url = f'/profiles/{self.james.profile.id}/'
+
+    def test_follow_changes_etag(self):
+        """
+        Context: Adam logged in and has fetched james profile
+        When: Adam follows james and sends the ETag back in If-None-Match
+        Then: The full profile is returned with adams following_id
+        """
+        self.client.login(username='adam', password='pass')
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(
+            self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code,
+            status.HTTP_304_NOT_MODIFIED)
+        follow = Follow.objects.create(owner=self.adam, followed=self.james)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['following_id'], follow.id)
+
+    def test_new_post_changes_etag_without_counting(self):
+        """
+        Context: Adam has fetched james profile
+        When: Adam sends the ETag back before and after james adds a post
+        Then: 304 without counting anything, then the profile with the new posts_count
+        """
+        self.client.login(username='adam', password='pass')
+        etag = self.client.get(self.url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertFalse([query for query in queries if 'COUNT' in query['sql']])
+        Post.objects.create(owner=self.james, title='a title')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['posts_count'], 1)
+
+    @override_settings(RESPONSE_CACHE_ENABLED=False)
+    def test_follow_changes_etag_without_shared_cache(self):
+        """
+        Context: The response cache is off, as with workers that don't share a cache
+        When: Brian follows james through another worker, which this one's
+        cache tags don't see
+        Then: The ETag still changes, worked out from the counts
+        """
+        self.client.login(username='adam', password='pass')
+        etag = self.client.get(self.url)['ETag']
+        brian = User.objects.create_user(username='brian', password='pass')
+        with mock.patch('drf_api.cache.invalidate'):
+            Follow.objects.create(owner=brian, followed=self.james)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['followers_count'], 1)
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class ProfileExportTests(APITestCase):
+    """
+    Class to contain the tests for the profile export endpoint and command
+    """
+    def setUp(self):
+        self.adam = User.objects.create_user(username='adam', password='pass')
+        self.james = User.objects.create_user(username='james', password='pass')
+        for number in range(3):
+            post = Post.objects.create(owner=self.adam, title=f'post {number}')
+        Comment.objects.create(owner=self.adam, post=post, content='a comment')
+        Like.objects.create(owner=self.adam, post=post)
+        Follow.objects.create(owner=self.adam, followed=self.james)
+
+    def export(self, profile):
+        response = self.client.get(f'/profiles/{profile.id}/export/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        content = b''.join(response.streaming_content)
+        return [json.loads(line) for line in content.splitlines()]
+
+    def test_owner_can_export_their_data(self):
+        """
+        The context: Adam has a profile, 3 posts, a comment, a like and a follow
+        The when: Adam exports his profile
+        The then: There is a line for each, with the same data as the list views
+        """
+        self.client.login(username='adam', password='pass')
+        records = self.export(self.adam.profile)
+        self.assertEqual(
+            [record['type'] for record in records],
+            ['profile', 'post', 'post', 'post', 'comment', 'like', 'follow']
+        )
+        posts = self.client.get('/posts/?owner__profile=%s' % self.adam.profile.id)
+        self.assertEqual(
+            [record['data'] for record in records if record['type'] == 'post'],
+            sorted(posts.data['results'], key=lambda post: post['id'])
+        )
+        self.assertEqual(records[0]['data']['posts_count'], 3)
+
+    def test_other_users_can_not_export(self):
+        self.client.login(username='james', password='pass')
+        response = self.client.get(f'/profiles/{self.adam.profile.id}/export/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_staff_can_export(self):
+        User.objects.create_user(username='staff', password='pass', is_staff=True)
+        self.client.login(username='staff', password='pass')
+        self.assertEqual(len(self.export(self.adam.profile)), 7)
+
+    def test_command_matches_endpoint(self):
+        self.client.login(username='adam', password='pass')
+        records = self.export(self.adam.profile)
+        output = StringIO()
+        call_command('export_profile', 'adam', '--chunk-size', '2', stdout=output)
+        self.assertEqual(
+            [json.loads(line) for line in output.getvalue().splitlines()], records)
+
+
+class ProfileImageValidationTests(APITestCase):
+    """
+    Class to contain the tests for profile image validation
+    """
+    def test_profile_image_limits_match_posts(self):
+        """
+        Context: Adam is logged in
+        When: HTTP put request with a profile image 5000px high
+        Then: Response status 400 with the height message
+        """
+        adam = User.objects.create_user(username='adam', password='pass')
+        self.client.login(username='adam', password='pass')
+        content = BytesIO()
+        Image.new('RGB', (10, 5000)).save(content, 'PNG')
+        response = self.client.put(f'/profiles/{adam.profile.id}/', {
+            'name': 'Adam', 'image': SimpleUploadedFile('image.png', content.getvalue()),
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['image'], ['Image height larger tahn 4096px'])
+
+
+@override_settings(
+    DEFAULT_FILE_STORAGE='drf_api.media.LocalRemoteStorage', MEDIA_UPLOAD_WORKERS=0)
+class ProfileImageUploadTests(APITestCase):
+    """
+    Class to contain the tests for uploading profile images in the background
+    """
+    def setUp(self):
+        roots = [tempfile.mkdtemp(), tempfile.mkdtemp()]
+        for root in roots:
+            self.addCleanup(shutil.rmtree, root)
+        media_settings = override_settings(
+            MEDIA_STAGING_ROOT=roots[0], MEDIA_REMOTE_ROOT=roots[1])
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.adam = User.objects.create_user(username='adam', password='pass')
+        self.client.login(username='adam', password='pass')
+
+    def test_pending_upload_finished_by_command(self):
+        """
+        Context: Adam sent a new profile image but the process stopped
+        before uploading it
+        When: finish_image_uploads is run
+        Then: The profile shows the uploaded image
+        """
+        content = BytesIO()
+        Image.new('RGB', (10, 10)).save(content, 'PNG')
+        url = f'/profiles/{self.adam.profile.id}/'
+        with self.captureOnCommitCallbacks():
+            response = self.client.put(url, {
+                'name': 'Adam', 'image': SimpleUploadedFile('avatar.png', content.getvalue()),
+            })
+        self.assertEqual(response.data['image_state'], 'pending')
+        self.assertEqual(self.client.get(url).data['image_state'], 'pending')
+
+        call_command('finish_image_uploads', stdout=StringIO())
+        response = self.client.get(url)
+        self.assertEqual(response.data['image_state'], 'ready')
+        self.assertTrue(response.data['image'].endswith('images/avatar.png'))
+
+
+class UserImportTests(APITestCase):
+    """
+    Class to contain the tests for importing users and profiles in bulk
+    """
+    def setUp(self):
+        User.objects.create_user(username='adam', password='pass')
+        self.password = User.objects.get(username='adam').password
+
+    def test_users_imported_with_profiles_in_batches(self):
+        """
+        Context: 6 users to import in batches of 4
+        When: import_users is run
+        Then: Each user has one profile with the imported name, the hashed
+        password works and the queries don't grow with the number of users
+        """
+        records = [
+            {'username': f'user{index}', 'password': self.password, 'name': f'User {index}'}
+            for index in range(6)
+        ]
+        with CaptureQueriesContext(connection) as six_users:
+            report = import_users(records, batch_size=4)
+        self.assertEqual(report.created, 6)
+        with CaptureQueriesContext(connection) as two_users:
+            import_users([{'username': 'one'}, {'username': 'two'}], batch_size=4)
+        self.assertEqual(len(six_users), 2 * len(two_users))
+        self.assertEqual(Profile.objects.get(owner__username='user5').name, 'User 5')
+        self.assertFalse(User.objects.filter(profile__isnull=True).exists())
+        self.assertTrue(self.client.login(username='user3', password='pass'))
+        self.assertFalse(User.objects.get(username='one').has_usable_password())
+
+    def test_existing_and_invalid_users_reported(self):
+        """
+        Context: As set-up
+        When: The import has an existing username, a repeated one and invalid records
+        Then: Only the valid new user is created and the others are reported
+        """
+        # A valid address, but longer than the 254 characters User.email holds
+        long_email = 'a' * 64 + '@' + '.'.join(['b' * 63] * 3) + '.com'
+        report = import_users([
+            {'username': 'adam'},
+            {'username': 'new', 'email': 'new@example.com'},
+            {'username': 'new'},
+            {'username': 'bad name!', 'email': 'not an email'},
+            {'username': 'hash', 'password': 'plain text'},
+            {'username': 'long', 'email': long_email},
+        ])
+        self.assertEqual(report.created, 1)
+        self.assertEqual(report.skipped, ['adam'])
+        self.assertEqual([error['position'] for error in report.errors], [2, 3, 4, 5])
+        self.assertEqual(len(report.errors[1]['errors']), 2)
+        self.assertEqual(report.errors[3]['errors'], ['email is longer than 254 characters.'])
+        self.assertEqual(User.objects.count(), 2)
+
+    def test_admin_import_endpoint(self):
+        """
+        Context: The profiles list is cached for logged out users
+        When: An admin posts users to profiles/import/
+        Then: The report is returned and the profiles list shows the new user
+        """
+        self.assertEqual(self.client.get('/profiles/').data['count'], 1)
+        User.objects.create_user(username='admin', password='pass', is_staff=True)
+        self.client.login(username='admin', password='pass')
+        response = self.client.post(
+            '/profiles/import/', {'users': [{'username': 'new'}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 1)
+        self.assertIn('users_per_second', response.data)
+        self.client.logout()
+        self.assertEqual(self.client.get('/profiles/').data['count'], 3)
+
+    def test_non_admin_can_not_import(self):
+        self.client.login(username='adam', password='pass')
+        response = self.client.post(
+            '/profiles/import/', {'users': [{'username': 'new'}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_command_imports_csv(self):
+        """
+        Context: A CSV file with two users and an extra column
+        When: import_users is run with it
+        Then: Both users are created and the throughput reported
+        """
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = f'{directory}/users.csv'
+        with open(path, 'w', newline='') as csv_file:
+            csv_file.write('username,email,name,old_id\njo,jo@example.com,Jo,1\nsam,,Sam,2\n')
+        output = StringIO()
+        call_command('import_users', path, stdout=output)
+        self.assertIn('Created 2 users and profiles', output.getvalue())
+        self.assertEqual(Profile.objects.get(owner__username='sam').name, 'Sam')
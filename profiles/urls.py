@@ -4,4 +4,8 @@ from profiles import views
 urlpatterns = [
     path('profiles/', views.ProfileList.as_view()),
     path('profiles/<int:pk>/', views.ProfileDetail.as_view()),
+    path('profiles/<int:pk>/export/', views.ProfileExport.as_view()),
+    path('profiles/import/', views.ProfileImport.as_view()),
+    path('async/profiles/', views.AsyncProfileList.as_view()),
+    path('async/profiles/<int:pk>/', views.AsyncProfileDetail.as_view()),
 ]
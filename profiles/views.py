@@ -1,24 +1,62 @@
-from django.db.models import Count
-from rest_framework import generics, filters
+from django.http import StreamingHttpResponse
+from rest_framework import filters, permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
+from .export import export_lines
+from .importer import import_users
 from .models import Profile
-from .serializers import ProfileSerializer
-from drf_api.permissions import IsOwnerOrReadOnly
+from .serializers import ProfileSerializer, UserImportSerializer
+from drf_api import generics
+from drf_api.aggregates import related_count
+from drf_api.async_views import AsyncDetailView, AsyncListView
+from drf_api.cache import ResponseCacheMixin
+from drf_api.conditional import ConditionalGetMixin
+from drf_api.mixins import ViewerRelationMixin
+from drf_api.permissions import IsOwnerOrReadOnly, IsOwnerOrStaff
+from drf_api.values import ValuesListMixin
+from followers.models import Follow
+from posts.models import Post
 
 
-class ProfileList(generics.ListAPIView):
+def profile_counts():
+    """
+    Returns the annotations for posts_count, followers_count and following_count.
+    Each count is a separate subquery matched on the profile owner, rather than
+    a Count() across three joins which multiplies posts x followers x following
+    rows for every profile before distinct collapses them again.
+    """
+    return {
+        'posts_count': related_count(Post, 'owner', 'owner'),
+        'followers_count': related_count(Follow, 'followed', 'owner'),
+        'following_count': related_count(Follow, 'owner', 'owner'),
+    }
+
+
+class FollowingIdMixin(ViewerRelationMixin):
+    """
+    Fetches the logged in user's follows for all the profiles being serialized
+    in one query, which ProfileSerializer then uses to set following_id.
+    """
+    viewer_relation_model = Follow
+    viewer_relation_field = 'followed'
+    viewer_relation_key = 'owner_id'
+    viewer_relation_context = 'following_ids'
+
+
+class ProfileList(
+        ValuesListMixin, ResponseCacheMixin, FollowingIdMixin, generics.ListAPIView):
     """
     View to return a list of all profiles.
     Extra fields also provided which count the number of posts created by the profile owner
     """
     serializer_class = ProfileSerializer
+    cache_view_tags = ['profiles']
+    cache_item_tags = ['profile:{id}']
     queryset = Profile.objects.annotate(
-        posts_count=Count('owner__post', distinct=True),
-        # the above is counting the number of links (through foreign keys, one-to-many relationships etc.) between owner of the profile and post instances across the DB.
-        # the __ denotes that the relationship is across more than one table jump
-        # distinct=True makes sure that only unique pairs are counted (important as there may be multiple paths between related pairs)
-        followers_count=Count('owner__followed', distinct=True),
-        following_count=Count('owner__following', distinct=True),
+        **profile_counts()
+        # the above counts the posts created by the profile owner, the users following them
+        # and the users they follow, see profile_counts
     ).order_by('-created_at')
     filter_backends = [
         filters.OrderingFilter,
@@ -39,14 +77,74 @@ class ProfileList(generics.ListAPIView):
     ]
 
 
-class ProfileDetail(generics.RetrieveUpdateAPIView):
+class ProfileDetail(
+        ConditionalGetMixin, ResponseCacheMixin,
+        FollowingIdMixin, generics.RetrieveUpdateAPIView):
     """
     View to return a specific profile where pk will be the id of the profile
     """
     serializer_class = ProfileSerializer
     permission_classes = [IsOwnerOrReadOnly]
+    cache_view_tags = ['profile:{pk}']
+    validator_fields = ['updated_at', 'owner__username', 'image', 'image_state']
+    validator_cache_tags = ['profile:{pk}']
+    validator_tag_fields = ['posts_count', 'followers_count', 'following_count']
+    validator_queryset = Profile.objects.all()
+    # Above leaves the counts out of the ETag query. Posts and follows give
+    # the profile's cache tag a new version, which is part of the ETag instead,
+    # unless the response cache is off, see ConditionalGetMixin.
     queryset = Profile.objects.annotate(
-        posts_count=Count('owner__post', distinct=True),
-        followers_count=Count('owner__followed', distinct=True),
-        following_count=Count('owner__following', distinct=True),
+        **profile_counts()
     )
+
+
+class ProfileExport(generics.GenericAPIView):
+    """
+    View to download everything the profile owner has made: their profile,
+    posts, comments, likes and follows, as newline-delimited JSON.
+    Only the profile owner and staff users can export a profile.
+    The response is streamed while the rows are read, see profiles/export.py.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsOwnerOrStaff]
+    queryset = Profile.objects.annotate(**profile_counts()).select_related('owner')
+
+    def get(self, request, *args, **kwargs):
+        profile = self.get_object()
+        response = StreamingHttpResponse(
+            export_lines(self.get_queryset(), profile.owner, request),
+            content_type='application/x-ndjson',
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{profile.owner.username}.ndjson"'
+        )
+        return response
+
+
+class ProfileImport(APIView):
+    """
+    Admin only view creating users and their profiles in bulk, e.g. when
+    moving accounts from another system, see profiles/importer.py.
+    The response reports the users created, skipped and invalid
+    and the import's throughput.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request):
+        serializer = UserImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        report = import_users(serializer.validated_data['users'])
+        return Response(report.as_dict())
+
+
+class AsyncProfileList(AsyncListView):
+    """
+    Async view for GET requests to the profiles list, see drf_api/async_views.py
+    """
+    view_class = ProfileList
+
+
+class AsyncProfileDetail(AsyncDetailView):
+    """
+    Async view for GET requests to a profile, see drf_api/async_views.py
+    """
+    view_class = ProfileDetail